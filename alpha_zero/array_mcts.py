@@ -0,0 +1,347 @@
+"""
+MCTS with the search tree stored in preallocated arrays.
+
+`ArrayMCTSBot` plays like open_spiel's `MCTSBot` (same UCT/PUCT values,
+tie breaking, solver backup and use of `random_state`), but instead of a
+`SearchNode` object per node the tree is a structure of arrays
+(`ArrayTree`) which is reused by every search of the bot. Children of a
+node are stored contiguously, so a child is selected by one vectorized
+UCT over a slice and a whole visit path is backed up with fancy indexing.
+
+Usage
+=====
+    python array_mcts.py --game ttt --simulations 500 --positions 10   # benchmark against MCTSBot
+"""
+import argparse
+import gc
+import math
+import random
+import time
+import tracemalloc
+
+import numpy as np
+import pyspiel
+from open_spiel.python.algorithms import mcts
+
+from search import bot_kwargs
+
+# initial capacity is bounded, the tree grows when needed
+_MAX_INITIAL_NODES = 1 << 20
+
+
+class ArrayTree:
+    """
+    Search tree as a structure of arrays, node 0 is the root.
+
+    Children of node `i` are the nodes `first_child[i]` ... `first_child[i] + num_children[i] - 1`,
+    `player[i]` is the player who chose `action[i]` and `outcome[i]` holds
+    the proven returns if `solved[i]`.
+    """
+
+    FIELDS = {
+        "action": np.int32,
+        "player": np.int32,
+        "prior": np.float64,
+        "explore_count": np.int32,
+        "total_reward": np.float64,
+        "first_child": np.int32,
+        "num_children": np.int32,
+        "solved": np.bool_,
+    }
+
+    def __init__(self, capacity: int, num_players: int) -> None:
+        self.num_players = num_players
+        self.capacity = 0
+        self.size = 0
+        for field, dtype in self.FIELDS.items():
+            setattr(self, field, np.zeros(0, dtype=dtype))
+        self.outcome = np.zeros((0, num_players), dtype=np.float64)
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in self.FIELDS) + self.outcome.nbytes
+
+    def _grow(self, capacity: int) -> None:
+        for field in list(self.FIELDS) + ["outcome"]:
+            old = getattr(self, field)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, field, new)
+        self.capacity = capacity
+
+    def reset(self, player: int) -> int:
+        """Clear the tree, returns the new root."""
+        self.size = 0
+        return self.add_children(None, [(pyspiel.INVALID_ACTION, 1.0)], player)
+
+    def add_children(self, node, actions_priors, player: int) -> int:
+        """Append children with (action, prior) to `node`, returns the first one."""
+        start, end = self.size, self.size + len(actions_priors)
+        if end > self.capacity:
+            self._grow(max(end, 2 * self.capacity))
+        actions, priors = zip(*actions_priors)
+        self.action[start:end] = actions
+        self.prior[start:end] = priors
+        self.player[start:end] = player
+        self.explore_count[start:end] = 0
+        self.total_reward[start:end] = 0
+        self.num_children[start:end] = 0
+        self.solved[start:end] = False
+        if node is not None:
+            self.first_child[node] = start
+            self.num_children[node] = end - start
+        self.size = end
+        return start
+
+    def children(self, node: int) -> slice:
+        start = self.first_child[node]
+        return slice(start, start + self.num_children[node])
+
+    def set_outcome(self, node: int, returns) -> None:
+        self.outcome[node] = returns
+        self.solved[node] = True
+
+
+class ArrayMCTSBot(mcts.MCTSBot):
+    """
+    `MCTSBot` with the tree in an `ArrayTree`.
+
+    Arguments
+    =========
+        capacity: initial number of nodes (default `max_simulations + 1`), doubled when full
+        other arguments as `MCTSBot`, `child_selection_fn` is `SearchNode.uct_value` or `SearchNode.puct_value`
+    """
+
+    def __init__(self, game, uct_c, max_simulations, evaluator, capacity: int = None, **kwargs) -> None:
+        super().__init__(game, uct_c, max_simulations, evaluator, **kwargs)
+        if self._child_selection_fn is mcts.SearchNode.uct_value:
+            self._puct = False
+        elif self._child_selection_fn is mcts.SearchNode.puct_value:
+            self._puct = True
+        else:
+            raise ValueError(f"Unsupported child selection {self._child_selection_fn}")
+
+        if capacity is None:
+            capacity = min(1 + max_simulations, _MAX_INITIAL_NODES)
+        self.tree = ArrayTree(capacity, game.num_players())
+
+    @classmethod
+    def from_bot(cls, bot: mcts.MCTSBot, **kwargs):
+        """Create an array bot with the same game, evaluator and settings as `bot`."""
+        return cls(**bot_kwargs(bot), **kwargs)
+
+    def _select(self, node: int) -> int:
+        # vectorized `SearchNode.uct_value` (or `puct_value`) over all children
+        t = self.tree
+        start = t.first_child[node]
+        end = start + t.num_children[node]
+        count = t.explore_count[start:end]
+        visited = np.maximum(count, 1)  # unvisited children are handled below
+        mean = t.total_reward[start:end] / visited
+        parent_count = t.explore_count[node]
+        if self._puct:
+            values = mean + self.uct_c * t.prior[start:end] * math.sqrt(parent_count) / (count + 1)
+        else:
+            values = mean + self.uct_c * np.sqrt(math.log(parent_count) / visited)
+            values[count == 0] = np.inf
+        solved = t.solved[start:end]
+        if solved.any():
+            values[solved] = t.outcome[start:end][solved, t.player[start]]
+        return int(start + values.argmax())
+
+    def _apply_tree_policy(self, root, state):
+        t = self.tree
+        visit_path = [root]
+        working_state = state.clone()
+        node = root
+        while (not working_state.is_terminal() and t.explore_count[node] > 0) or (
+                working_state.is_chance_node() and self.dont_return_chance_node):
+            if not t.num_children[node]:
+                legal_actions = self.evaluator.prior(working_state)
+                if node == root and self._dirichlet_noise:
+                    epsilon, alpha = self._dirichlet_noise
+                    noise = self._random_state.dirichlet([alpha] * len(legal_actions))
+                    legal_actions = [(a, (1 - epsilon) * p + epsilon * n) for (a, p), n in zip(legal_actions, noise)]
+                self._random_state.shuffle(legal_actions)
+                t.add_children(node, legal_actions, working_state.current_player())
+
+            if working_state.is_chance_node():
+                action_list, prob_list = zip(*working_state.chance_outcomes())
+                action = self._random_state.choice(action_list, p=prob_list)
+                children = t.children(node)
+                node = children.start + int(np.flatnonzero(t.action[children] == action)[0])
+            else:
+                node = self._select(node)
+            working_state.apply_action(int(t.action[node]))
+            visit_path.append(node)
+        return visit_path, working_state
+
+    def _backpropagate(self, visit_path, returns, solved) -> None:
+        t = self.tree
+        path = np.array(visit_path)
+        # chance nodes are credited with the return of the closest decision node above
+        players = t.player[path]
+        chance = players == pyspiel.PlayerId.CHANCE
+        if chance.any():
+            decision = np.maximum.accumulate(np.where(chance, 0, np.arange(len(path))))
+            players = players[decision]
+        t.explore_count[path] += 1
+        t.total_reward[path] += np.asarray(returns, dtype=np.float64)[players]
+
+        if not solved:
+            return
+        for node in reversed(visit_path):
+            if not t.num_children[node]:
+                continue
+            children = t.children(node)
+            known = t.solved[children]
+            player = t.player[children.start]
+            if player == pyspiel.PlayerId.CHANCE:
+                # only back up chance nodes if all have the same outcome
+                outcomes = t.outcome[children]
+                if not (known.all() and (outcomes == outcomes[0]).all()):
+                    return
+                t.set_outcome(node, outcomes[0])
+            else:
+                # best proven child, if it wins or all children are proven
+                if not known.any():
+                    return
+                values = np.where(known, t.outcome[children, player], -np.inf)
+                best = int(np.argmax(values))
+                if not (known.all() or values[best] == self.max_utility):
+                    return
+                t.set_outcome(node, t.outcome[children.start + best])
+
+    def mcts_search(self, state) -> int:
+        """As `MCTSBot.mcts_search`, but returns the root id in `self.tree`."""
+        t = self.tree
+        root = t.reset(state.current_player())
+        for _ in range(self.max_simulations):
+            visit_path, working_state = self._apply_tree_policy(root, state)
+            if working_state.is_terminal():
+                returns = working_state.returns()
+                t.set_outcome(visit_path[-1], returns)
+                solved = self.solve
+            else:
+                returns = self.evaluator.evaluate(working_state)
+                solved = False
+            self._backpropagate(visit_path, returns, solved)
+            if t.solved[root]:
+                break
+        return root
+
+    def best_child(self, node: int) -> int:
+        """As `SearchNode.best_child`: proven value, then visits, then total reward."""
+        t = self.tree
+        children = range(*t.children(node).indices(t.size))
+        return max(children, key=lambda c: (
+            t.outcome[c, t.player[c]] if t.solved[c] else 0, t.explore_count[c], t.total_reward[c]
+        ))
+
+    def step_with_policy(self, state):
+        if state.is_chance_node():
+            return [(pyspiel.INVALID_ACTION, 1.0)], pyspiel.INVALID_ACTION
+
+        t1 = time.time()
+        root = self.mcts_search(state)
+        mcts_action = int(self.tree.action[self.best_child(root)])
+        if self.verbose:
+            seconds = time.time() - t1
+            sims = self.tree.explore_count[root]
+            print(f"Finished {sims} sims in {seconds:.3f} secs, {sims / seconds:.1f} sims/s, {len(self.tree)} nodes")
+
+        policy = [(action, (1.0 if action == mcts_action else 0.0)) for action in state.legal_actions()]
+        return policy, mcts_action
+
+
+################################################################################
+##                            BENCHMARK
+################################################################################
+
+def _positions(game, count: int, seed: int) -> list:
+    """States after a random number of random moves."""
+    rng = np.random.RandomState(seed)
+    positions = []
+    while len(positions) < count:
+        state = game.new_initial_state()
+        for _ in range(rng.randint(0, game.max_game_length() // 2)):
+            if state.is_terminal():
+                break
+            state.apply_action(rng.choice(state.legal_actions()))
+        if not state.is_terminal():
+            positions.append(state)
+    return positions
+
+
+def _search(bot, state, seed: int):
+    """Return (action, simulations) of one search."""
+    random.seed(seed)  # chance inside the games (fruit of snakes)
+    root = bot.mcts_search(state)
+    if isinstance(bot, ArrayMCTSBot):
+        return int(bot.tree.action[bot.best_child(root)]), int(bot.tree.explore_count[root])
+    return root.best_child().action, root.explore_count
+
+
+def benchmark(game, bot_cls, positions, simulations: int, uct_c: float, seed: int) -> dict:
+    """Search all `positions` with a fresh bot, returns speed, peak memory and chosen actions."""
+    def make_bot():
+        evaluator = mcts.RandomRolloutEvaluator(1, np.random.RandomState(seed))
+        return bot_cls(game, uct_c, simulations, evaluator, solve=True, random_state=np.random.RandomState(seed))
+
+    bot = make_bot()
+    collections = sum(s["collections"] for s in gc.get_stats())
+    start = time.perf_counter()
+    results = [_search(bot, state, seed + i) for i, state in enumerate(positions)]
+    seconds = time.perf_counter() - start
+    collections = sum(s["collections"] for s in gc.get_stats()) - collections
+
+    # peak includes the tree allocated by the bot
+    tracemalloc.start()
+    bot = make_bot()
+    for i, state in enumerate(positions):
+        _search(bot, state, seed + i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sims = sum(n for _, n in results)
+    return {
+        "bot": bot_cls.__name__,
+        "sims/s": sims / seconds,
+        "peak_kib": peak / 1024,
+        "gc_runs": collections,
+        "actions": [a for a, _ in results],
+    }
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--game", type=str, default="ttt", metavar="NAME", help="Registered pyspiel game")
+    parser.add_argument("--simulations", type=int, default=500, metavar="N", help="Simulations per search")
+    parser.add_argument("--positions", type=int, default=10, metavar="N", help="Number of searched positions")
+    parser.add_argument("--uct-c", type=float, default=1.4, metavar="F", help="Exploration constant")
+    parser.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of positions and bots")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    import games  # registers the games
+
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    game = pyspiel.load_game(args.game)
+    positions = _positions(game, args.positions, args.seed)
+    rows = [
+        benchmark(game, bot_cls, positions, args.simulations, args.uct_c, args.seed)
+        for bot_cls in (mcts.MCTSBot, ArrayMCTSBot)
+    ]
+    for row in rows:
+        print(f"{row['bot']:>14}: {row['sims/s']:9.1f} sims/s, peak {row['peak_kib']:9.1f} KiB, {row['gc_runs']} gc runs")
+    same = sum(a == b for a, b in zip(rows[0]["actions"], rows[1]["actions"]))
+    print(f"same action in {same}/{len(positions)} positions")
+
+
+if __name__ == "__main__":
+    main()
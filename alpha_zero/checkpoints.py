@@ -0,0 +1,228 @@
+"""
+Local content-addressed store of checkpoints.
+
+Files are stored once, under the sha256 of their contents, and each
+(run id, checkpoint number) pair refers to them through a small manifest.
+Checkpoints are downloaded from W&B (or copied from a local folder
+standing in for W&B) only when the manifest is missing, and are
+hardlinked into the destination folder. Checkpoint `LATEST` (-1) is
+overwritten while a run trains, so it has no manifest and is downloaded
+every time (unchanged files are still stored once).
+
+Layout
+======
+    ROOT/objects/ab/abcdef...            file contents, named by sha256
+    ROOT/refs/<run id>/<checkpoint>.json  {file name: sha256}
+
+Usage
+=====
+    python checkpoints.py --id miba/pv056-tic-tac-toe/r3foj5me --logs logs-ttt/ --checkpoint 30 --dest ttt-cnn-50
+    python checkpoints.py --offline logs --id ttt-cnn-50 --logs . --checkpoint 30 --dest ttt-cnn-50 --refresh
+
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+
+CHECKPOINT_SUFFIXES = [".index", ".meta", ".data-00000-of-00001"]
+DEFAULT_ROOT = os.path.join("~", ".cache", "rl-games", "checkpoints")
+LATEST = -1  # the last checkpoint of a run, never cached
+
+
+def file_digest(path: str) -> str:
+    """Return sha256 of the file contents (read through mmap)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+
+def _temp_path(dst: str) -> str:
+    """Reserve a unique temporary file next to `dst`, concurrent fetches stage the same files."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst) or ".", prefix=os.path.basename(dst) + ".", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+
+def _link_or_copy(src: str, dst: str, link: bool = True) -> None:
+    tmp = _temp_path(dst)
+    try:
+        if link:
+            try:
+                os.remove(tmp)
+                os.link(src, tmp)
+            except OSError:  # e.g. different file systems
+                link = False
+        if not link:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+################################################################################
+##                            SOURCES
+################################################################################
+
+class WandbSource:
+    """Download run files from W&B."""
+
+    def fetch(self, run_id: str, name: str, root: str) -> str:
+        import wandb
+
+        f = wandb.restore(name, run_path=run_id, root=root, replace=True)
+        f.close()
+        return f.name
+
+
+class LocalSource:
+    """Copy run files from `directory/<run id>/<name>` (offline W&B stand-in)."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def fetch(self, run_id: str, name: str, root: str) -> str:
+        src = os.path.join(self.directory, run_id, name)
+        if not os.path.exists(src):
+            raise FileNotFoundError(f"{src=} not found in the local run store")
+        dst = os.path.join(root, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # a copy, the store makes its objects read-only and must not touch the user's files
+        _link_or_copy(src, dst, link=False)
+        return dst
+
+
+################################################################################
+##                            STORE
+################################################################################
+
+class CheckpointStore:
+    def __init__(self, root: str = DEFAULT_ROOT) -> None:
+        self.root = os.path.expanduser(root)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _ref_path(self, run_id: str, chkt: int) -> str:
+        return os.path.join(self.root, "refs", run_id, f"{chkt}.json")
+
+    def lookup(self, run_id: str, chkt: int):
+        """Return the manifest of a stored checkpoint, or None."""
+        ref = self._ref_path(run_id, chkt)
+        if not os.path.exists(ref):
+            return None
+        with open(ref, "r") as f:
+            manifest = json.load(f)
+        if not all(os.path.exists(self._object_path(d)) for d in manifest.values()):
+            logging.warning(f"Checkpoint {run_id}:{chkt} has missing objects, ignoring")
+            return None
+        return manifest
+
+    def add(self, run_id: str, chkt: int, files: dict) -> dict:
+        """
+        Store `files` (name -> path) as checkpoint `chkt` of `run_id`.
+
+        The files are hardlinked into the store and made read-only, pass
+        copies owned by the store (as `fetch` does), not the user's files.
+        No manifest is written for `LATEST`, its contents change.
+        """
+        manifest = {}
+        for name, path in files.items():
+            digest = file_digest(path)
+            obj = self._object_path(digest)
+            if not os.path.exists(obj):
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                _link_or_copy(path, obj)
+                os.chmod(obj, 0o444)  # objects are shared by hardlinks, never modify them
+            manifest[name] = digest
+
+        if chkt == LATEST:
+            return manifest
+        ref = self._ref_path(run_id, chkt)
+        os.makedirs(os.path.dirname(ref), exist_ok=True)
+        tmp = _temp_path(ref)
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, ref)
+        return manifest
+
+    def materialize(self, manifest: dict, dest: str) -> None:
+        """Hardlink stored files into `dest`, replacing any that differ."""
+        os.makedirs(dest, exist_ok=True)
+        for name, digest in manifest.items():
+            obj = self._object_path(digest)
+            target = os.path.join(dest, name)
+            if os.path.exists(target):
+                if os.path.samefile(target, obj) or file_digest(target) == digest:
+                    continue
+                logging.warning(f"Replacing stale {target=}")
+            _link_or_copy(obj, target)
+
+    def fetch(self, run_id: str, logs: str, chkt: int, dest: str, source=None, refresh: bool = False) -> dict:
+        """
+        Make `config.json` and checkpoint `chkt` of run `run_id` available in `dest`.
+
+        Arguments
+        =========
+            run_id: W&B run path (entity/project/id)
+            logs: folder within the run where the checkpoints were saved
+            chkt: checkpoint number
+            dest: folder to put the files into
+            source: where to download missing checkpoints from (default W&B)
+            refresh: ignore the stored manifest and download again (always for `LATEST`)
+
+        Returns
+        =======
+            manifest of the checkpoint (file name -> sha256)
+        """
+        manifest = None if refresh or chkt == LATEST else self.lookup(run_id, chkt)
+        if manifest is None:
+            source = source or WandbSource()
+            names = ["config.json"] + [f"checkpoint-{chkt}{suffix}" for suffix in CHECKPOINT_SUFFIXES]
+            os.makedirs(self.root, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.root) as tmp:
+                files = {
+                    name: source.fetch(run_id, os.path.join(logs, name), tmp)
+                    for name in names
+                }
+                logging.info(f"Storing checkpoint {run_id}:{chkt} in {self.root}")
+                manifest = self.add(run_id, chkt, files)
+        self.materialize(manifest, dest)
+        return manifest
+
+
+################################################################################
+##                            MAIN
+################################################################################
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--id", type=str, required=True, metavar="PATH", help="w&b id of the run")
+    parser.add_argument("--logs", type=str, default="./logs", metavar="DIR", help="Directory with stored checkpoints on w&b")
+    parser.add_argument("--checkpoint", type=int, default=LATEST, metavar="N", help="which checkpoint")
+    parser.add_argument("--dest", type=str, required=True, metavar="DIR", help="Folder to put the checkpoint into")
+    parser.add_argument("--cache", type=str, default=DEFAULT_ROOT, metavar="DIR", help="Local checkpoint store")
+    parser.add_argument("--offline", type=str, default=None, metavar="DIR", help="Local folder used instead of w&b (DIR/<id>/<logs>/...)")
+    parser.add_argument("--refresh", action='store_true', help="Download the checkpoint even if it is stored locally", default=False)
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    logging.basicConfig(level=logging.INFO)
+    source = LocalSource(args.offline) if args.offline else WandbSource()
+    manifest = CheckpointStore(args.cache).fetch(args.id, args.logs, args.checkpoint, args.dest, source=source,
+                                                 refresh=args.refresh)
+    print(f"Checkpoint {args.id}:{args.checkpoint} in {args.dest}: {sorted(manifest)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,6 @@ import json
 import logging
 import os
 import random
-import shutil
 from dataclasses import dataclass
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2' # disable tf logs and warnings
@@ -25,10 +24,17 @@ import pyspiel
 import tqdm
 from azero import load_mcts_bot, load_trained_bot
 
-import wandb
+from checkpoints import DEFAULT_ROOT, CheckpointStore, LocalSource, WandbSource
 from games import SNAKES_NAME, TTT_NAME
+from array_mcts import ArrayMCTSBot
+from nim import PerfectNimBot, optimal_moves
+from numpy_model import ensure_exported, load_numpy_bot
+from opening_book import BookBot, OpeningBook
+from rollouts import VectorRolloutEvaluator
+from search import AnytimeMCTSBot, ReusingMCTSBot
 
 MCTS_SIMULS = [0, 5, 10, 15, 20, 50, 120, 250, 500]
+TIME_BUDGETS_MS = [10, 50, 200]
 RANDOM_PLAYER = lambda state: random.choice(state.legal_actions())
 
 
@@ -37,20 +43,34 @@ RANDOM_PLAYER = lambda state: random.choice(state.legal_actions())
 ##                            HELPERS
 ################################################################################
 
-def _restore_checkpoint_files(path: str, chkt: int, run_path: str, move_path: str):
-    chkt_path = os.path.join(path, f"checkpoint-{chkt}")
+def _restore_checkpoint_files(args):
+    store = CheckpointStore(args.cache)
+    source = LocalSource(args.offline) if args.offline else WandbSource()
+    store.fetch(args.id, args.logs, args.checkpoint, args.runname, source=source, refresh=args.refresh)
 
-    if os.path.exists(move_path):
-        logging.warn(f"Destination folder {move_path=} exists, skipping...")
-        return
 
-    wandb.restore(os.path.join(path, "config.json"), run_path=run_path)
-    for suffix in [".index", ".meta", ".data-00000-of-00001"]:
-        wandb.restore(chkt_path + suffix, run_path=run_path)
+def play_game(game, players, fruits: list = None):
+    """
+    Play one game, `players[i]` maps a state to the action of player `i`.
 
-    dir_path = os.path.dirname(chkt_path)
-    logging.info(f"Moving loaded files from {dir_path=} to {move_path=}")
-    shutil.move(dir_path, move_path)
+    If `fruits` is a list, the fruit of Snakes before the first and after
+    every move is appended to it, so that `games.Replay` rebuilds the game.
+    """
+    state = game.new_initial_state()
+    actions = []
+    record = fruits is not None and hasattr(state, "fruit")
+    if record:
+        fruits.append(state.fruit)
+
+    for p in itertools.cycle(players):
+        if state.is_terminal():
+            break
+        action = p(state)
+        state.apply_action(action)
+        actions.append(action)
+        if record:
+            fruits.append(state.fruit)
+    return state, actions
 
 
 """(Unused) config to initialise a MCTS agent (from azero)."""
@@ -73,6 +93,14 @@ class Result:
     result_from_player: int
     score_diff_from_player: int
     moves: list
+    budget_ms: float = None  # budget mode, `mcts_simuls` is None there
+    mcts_simuls_mean: float = None
+    player_simuls_mean: float = None
+    mcts_reused: float = None
+    player_book_hits: int = None
+    opponent: str = "mcts"
+    player_optimal: float = None
+    fruits: list = None  # Snakes only, see `play_game`
 
 
 ################################################################################
@@ -97,9 +125,29 @@ def make_parser():
     parser.add_argument("--logs", type=str, default="./logs", metavar="DIR", help="Directory with stored checkpoints on w&b")
     parser.add_argument("--id", type=str, default=None, metavar="PATH", help="w&b id of the run")
     parser.add_argument("--checkpoint", type=int, default=-1, metavar="N", help="which checkpoint")
+    parser.add_argument("--cache", type=str, default=DEFAULT_ROOT, metavar="DIR", help="Local checkpoint store")
+    parser.add_argument("--offline", type=str, default=None, metavar="DIR", help="Local folder used instead of w&b (DIR/<id>/<logs>/...)")
+    parser.add_argument("--refresh", action='store_true', help="Download the checkpoint even if it is stored locally", default=False)
+
+    parser.add_argument("--numpy", action='store_true', help="Run the trained network in NumPy instead of TensorFlow", default=False)
+    parser.add_argument("--model", type=str, default=None, metavar="FILE", help="Exported float .npz model to use, implies --numpy")
 
     parser.add_argument("--games", type=int, default=20, metavar="N", help="Number of games")
     parser.add_argument("--mcts-rate", type=float, default=1.4, metavar="F", help="MCTS exploration constant")
+    parser.add_argument("--time-budgets", type=float, nargs="*", default=None, metavar="MS",
+                        help=f"Give every bot a time per move instead of fixed simulations (no value: {TIME_BUDGETS_MS})")
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument("--array-mcts", action='store_true', default=False,
+                        help="MCTS opponents keep their tree in preallocated arrays (same play, no per-node objects)")
+    search.add_argument("--reuse-tree", action='store_true', default=False,
+                        help="All searching bots keep the subtree of the played moves for their next move")
+    parser.add_argument("--max-nodes", type=int, default=100_000, metavar="N", help="Nodes retained with --reuse-tree")
+    parser.add_argument("--rollouts", type=int, default=None, metavar="K",
+                        help="MCTS opponents average K random playouts per leaf, played as one vectorized batch")
+    parser.add_argument("--book", type=str, default=None, metavar="FILE",
+                        help="Opening book (see opening_book.py) the evaluated bot plays from before searching")
+    parser.add_argument("--perfect", action='store_true', default=False,
+                        help="With --cards, play only against the perfect (nim-sum) Nim bot instead of MCTS")
 
     return parser
 
@@ -121,24 +169,129 @@ def load_game(args):
     return pyspiel.load_game(name), name
 
 
-def load_player_fn(args):
+def load_player_bot(args):
+    """Return the evaluated bot, or None for the random player."""
     if args.random:
         if args.runname is None:
             args.runname = "random"
-        return RANDOM_PLAYER
+        return None
     else:
         assert args.runname is not None
         assert args.logs is not None
         assert args.id is not None
-        _restore_checkpoint_files(args.logs, args.checkpoint, args.id, args.runname)
+        _restore_checkpoint_files(args)
 
         with open(os.path.join(args.runname, "config.json"), "r") as f:
             cfg = json.load(f)
             print("Loaded config:", cfg)
             # assume correct game name there
 
-        bot, _ = load_trained_bot(cfg, args.runname, args.checkpoint, is_eval=True)
-        return bot.step
+        if args.numpy or args.model:
+            model_path = args.model or ensure_exported(cfg, args.runname, args.checkpoint)
+            bot, _ = load_numpy_bot(cfg, model_path, is_eval=True)
+        else:
+            bot, _ = load_trained_bot(cfg, args.runname, args.checkpoint, is_eval=True)
+        return bot
+
+
+def load_player_fn(args):
+    bot = load_player_bot(args)
+    if bot is not None and args.reuse_tree:
+        bot = ReusingMCTSBot.from_bot(bot, max_nodes=args.max_nodes)
+    return RANDOM_PLAYER if bot is None else bot.step
+
+
+def load_mcts_opponent(args, game_name, max_simulations: int):
+    mcts_cfg = dict(game=game_name, uct_c=args.mcts_rate, max_simulations=max_simulations)
+    mcts_bot = load_mcts_bot(_MCTS_UNUSED_CFG | mcts_cfg, is_eval=True)
+    if args.rollouts:
+        mcts_bot.evaluator = VectorRolloutEvaluator(args.rollouts)
+    return mcts_bot
+
+
+def with_book(args, player_fn):
+    """Return (`player_fn` playing from `--book` first, the `BookBot` or None)."""
+    if args.book is None:
+        return player_fn, None
+    book_bot = BookBot(OpeningBook.load(args.book), player_fn)
+    return book_bot.step, book_bot
+
+
+def _score_diff(state, player_first: bool) -> int:
+    try:
+        p1, p2 = state._game._scores
+    except AttributeError:
+        p1 = p2 = 0
+    return p1 - p2 if player_first else p2 - p1
+
+
+def _optimal_rate(game_name, game, actions, player: int):
+    """Fraction of perfect moves of `player` in a Nim game (None for other games)."""
+    if game_name != "nim":
+        return None
+    optimal, total = optimal_moves(game, actions, player)
+    return optimal / total if total else None
+
+
+def _mean_simulations(bot, since: int, attr: str = "simulations"):
+    simulations = getattr(bot, attr)[since:]
+    return sum(simulations) / len(simulations) if simulations else 0
+
+
+def evaluate_time_budgets(args, game, game_name, player_bot, budgets_ms) -> list[Result]:
+    """
+    Play the evaluated bot against MCTS, both searching for a fixed time per move.
+
+    The number of simulations fitting into the budget is recorded for both
+    (`player_simuls_mean` and `mcts_simuls_mean` are means per move of a game).
+    """
+    results = []
+    if args.reuse_tree:
+        make_bot = lambda bot, budget: ReusingMCTSBot.from_bot(bot, budget, max_nodes=args.max_nodes)
+    else:
+        make_bot = AnytimeMCTSBot.from_bot
+
+    for budget_ms in tqdm.tqdm(budgets_ms, desc="budget", leave=None):
+        mcts_bot = make_bot(load_mcts_opponent(args, game_name, 1), budget_ms / 1000)
+        bot = None if player_bot is None else make_bot(player_bot, budget_ms / 1000)
+        player_fn, book_bot = with_book(args, RANDOM_PLAYER if bot is None else bot.step)
+
+        for i in tqdm.trange(args.games, leave=None, desc=f"{args.runname} vs. mcts({budget_ms} ms)"):
+            since = len(mcts_bot.simulations), 0 if bot is None else len(bot.simulations)
+            hits = 0 if book_bot is None else book_bot.hits
+            players = [player_fn, mcts_bot.step] if i % 2 == 0 else [mcts_bot.step, player_fn]
+            fruits = []
+            state, actions = play_game(game, players, fruits)
+            res = Result(
+                args.runname, None, args.mcts_rate, i % 2 == 0,
+                state.returns()[i % 2], _score_diff(state, i % 2 == 0), actions,
+                budget_ms=budget_ms,
+                mcts_simuls_mean=_mean_simulations(mcts_bot, since[0]),
+                player_simuls_mean=None if bot is None else _mean_simulations(bot, since[1]),
+                mcts_reused=_mean_simulations(mcts_bot, since[0], "reused") if args.reuse_tree else None,
+                player_book_hits=None if book_bot is None else book_bot.hits - hits,
+                player_optimal=_optimal_rate(game_name, game, actions, i % 2),
+                fruits=fruits or None,
+            )
+            results.append(res)
+    return results
+
+
+def evaluate_perfect(args, game, player_fn, book_bot) -> list[Result]:
+    """Play the evaluated bot against the perfect Nim bot, recording how many of its moves were perfect."""
+    perfect_fn = PerfectNimBot.from_game(game).step
+    results = []
+    for i in tqdm.trange(args.games, leave=None, desc=f"{args.runname} vs. perfect"):
+        hits = 0 if book_bot is None else book_bot.hits
+        players = [player_fn, perfect_fn] if i % 2 == 0 else [perfect_fn, player_fn]
+        state, actions = play_game(game, players)
+        res = Result(
+            args.runname, None, args.mcts_rate, i % 2 == 0, state.returns()[i % 2], 0, actions,
+            player_book_hits=None if book_bot is None else book_bot.hits - hits,
+            opponent="perfect", player_optimal=_optimal_rate("nim", game, actions, i % 2),
+        )
+        results.append(res)
+    return results
 
 
 def main(arguments=None, namespace=None):
@@ -148,35 +301,46 @@ def main(arguments=None, namespace=None):
     random.seed(0)
     results: list[Result] = []
     game, game_name = load_game(args)
-    player_fn = load_player_fn(args)
+    if args.perfect and game_name != "nim":
+        parser.error("--perfect needs --cards")
+    if args.perfect:
+        player_fn, book_bot = with_book(args, load_player_fn(args))
+        results = evaluate_perfect(args, game, player_fn, book_bot)
+        mcts_simuls_list = []
+    elif args.time_budgets is not None:
+        budgets = args.time_budgets or TIME_BUDGETS_MS
+        results = evaluate_time_budgets(args, game, game_name, load_player_bot(args), budgets)
+        mcts_simuls_list = []
+    else:
+        player_fn, book_bot = with_book(args, load_player_fn(args))
+        mcts_simuls_list = MCTS_SIMULS
 
-    for mcts_simuls in tqdm.tqdm(MCTS_SIMULS, desc="mcts", leave=None):
+    for mcts_simuls in tqdm.tqdm(mcts_simuls_list, desc="mcts", leave=None):
         if mcts_simuls == 0:
             mcts_fn = RANDOM_PLAYER
         else:
-            mcts_cfg = dict(game=game_name, uct_c=args.mcts_rate, max_simulations=mcts_simuls)
-            mcts_bot = load_mcts_bot(_MCTS_UNUSED_CFG | mcts_cfg, is_eval=True)
+            mcts_bot = load_mcts_opponent(args, game_name, mcts_simuls)
+            if args.array_mcts:
+                mcts_bot = ArrayMCTSBot.from_bot(mcts_bot)
+            elif args.reuse_tree:
+                mcts_bot = ReusingMCTSBot.from_bot(mcts_bot, max_nodes=args.max_nodes)
             mcts_fn = mcts_bot.step
 
         for i in tqdm.trange(args.games, leave=None, desc=f"{args.runname} vs. mcts({mcts_simuls})"):
-            state = game.new_initial_state()
+            since = len(mcts_bot.reused) if mcts_simuls and args.reuse_tree else None
+            hits = 0 if book_bot is None else book_bot.hits
             players = [player_fn, mcts_fn] if i % 2 == 0 else [mcts_fn, player_fn]
-            actions = []
-
-            for p in itertools.cycle(players):
-                if state.is_terminal():
-                    break
-                action = p(state)
-                state.apply_action(action)
-                actions.append(action)
-
+            fruits = []
+            state, actions = play_game(game, players, fruits)
             player_res = state.returns()[i % 2]
-            try:
-                p1, p2 = state._game._scores
-            except AttributeError:
-                p1 = p2 = 0
-            score_diff = p1 - p2 if i % 2 == 0 else p2 - p1
-            res = Result(args.runname, mcts_simuls, args.mcts_rate, i % 2 == 0, player_res, score_diff, actions)
+            score_diff = _score_diff(state, i % 2 == 0)
+            res = Result(args.runname, mcts_simuls, args.mcts_rate, i % 2 == 0, player_res, score_diff, actions,
+                         fruits=fruits or None)
+            if since is not None:
+                res.mcts_reused = _mean_simulations(mcts_bot, since, "reused")
+            if book_bot is not None:
+                res.player_book_hits = book_bot.hits - hits
+            res.player_optimal = _optimal_rate(game_name, game, actions, i % 2)
             results.append(res)
 
     df = pd.DataFrame([vars(x) for x in results])
@@ -17,3 +17,17 @@ python evaluate.py --snakes --trained --path eval/snakes/mlp-mid.csv --runname s
 python evaluate.py --cards --random --path eval/nim/random.csv
 python evaluate.py --cards --trained --path eval/nim/mlp-big.csv --runname nim-mlp-big-50 --logs "logs-nim/" --id "miba/pv056-nim/hlg1za2b" --checkpoint "-1"
 python evaluate.py --cards --trained --path eval/nim/mlp-mid.csv --runname nim-mlp-mid-20 --logs "logs-nim/" --id "miba/pv056-nim/07glb1q9" --checkpoint "-1"
+python evaluate.py --cards --random --perfect --path eval/nim/random-perfect.csv
+python evaluate.py --cards --trained --perfect --path eval/nim/mlp-big-perfect.csv --runname nim-mlp-big-50 --logs "logs-nim/" --id "miba/pv056-nim/hlg1za2b" --checkpoint "-1"
+
+mkdir -p eval/budget
+python evaluate.py --ttt --trained --path eval/budget/ttt-cnn.csv --runname ttt-cnn-50 --logs "logs-ttt/" --id "miba/pv056-tic-tac-toe/r3foj5me" --checkpoint "-1" --time-budgets 10 50 200
+python evaluate.py --snakes --trained --path eval/budget/snake-cnn.csv --runname snake-cnn-50 --logs "logs-snake/" --id "miba/pv056-snakes/bcru9zz4" --checkpoint "-1" --time-budgets 10 50 200
+
+mkdir -p eval/reuse
+python evaluate.py --ttt --trained --path eval/reuse/ttt-cnn.csv --runname ttt-cnn-50 --logs "logs-ttt/" --id "miba/pv056-tic-tac-toe/r3foj5me" --checkpoint "-1" --reuse-tree
+python evaluate.py --snakes --trained --path eval/reuse/snake-cnn.csv --runname snake-cnn-50 --logs "logs-snake/" --id "miba/pv056-snakes/bcru9zz4" --checkpoint "-1" --reuse-tree
+
+mkdir -p eval/book
+python opening_book.py build --game ttt --plies 3 --simulations 20000 --out eval/book/ttt-book.npz
+python evaluate.py --ttt --trained --path eval/book/ttt-cnn.csv --runname ttt-cnn-50 --logs "logs-ttt/" --id "miba/pv056-tic-tac-toe/r3foj5me" --checkpoint "-1" --book eval/book/ttt-book.npz
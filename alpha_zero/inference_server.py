@@ -0,0 +1,325 @@
+"""
+Batched inference shared by many MCTS processes.
+
+One server process holds the network (an exported `.npz` model, see
+`numpy_model.py`). Every client owns a slot in shared memory: it writes
+its observations there, puts its id into the request queue and waits.
+The server collects requests until `max_batch` rows are queued or
+`max_wait` seconds passed since the first one, runs one forward pass,
+and writes the results back into the slots.
+
+`RemoteModel` (the client) has the same `inference` method as
+`NumpyModel`, so it can be used by `NumpyEvaluator` and `load_numpy_bot`.
+Clients raise if the server process dies instead of waiting forever.
+
+While training, `serve_azero` makes the actors and evaluators of `azero`
+share one `AzeroInferenceServer`, which holds the TF model and loads the
+checkpoints the learner broadcasts (`train.py --inference-server`).
+
+Usage
+=====
+    server = InferenceServer("ttt-mlp-big-50/checkpoint--1.npz", max_clients=16)
+    server.start()
+    model = server.connect()  # in each worker process
+    ...
+    server.stop()
+"""
+import contextlib
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+_POLL = 1.0  # seconds between checks whether the server is alive
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # a dead child which was not joined yet is a zombie
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+class RemoteModel:
+    """Client of `InferenceServer`, use `InferenceServer.connect` to create one."""
+
+    def __init__(self, server: "InferenceServer", client_id: int) -> None:
+        self._server = server
+        self.client_id = client_id
+        self.meta = server.meta
+
+    def inference(self, observation, legals_mask):
+        """Return (value of shape (B, 1), policy of shape (B, num_actions))."""
+        s = self._server
+        observation = np.asarray(observation, dtype=np.float32).reshape(len(observation), -1)
+        rows = len(observation)
+        if rows > s.max_rows:
+            raise ValueError(f"At most {s.max_rows} rows per request, got {rows}")
+        obs, mask, value, policy = s._slot(self.client_id)
+        obs[:rows] = observation
+        mask[:rows] = legals_mask
+        s._rows[self.client_id] = rows
+        s._requests.put(self.client_id)
+        while not s._ready[self.client_id].acquire(timeout=_POLL):
+            if not s.alive:
+                raise RuntimeError("Inference server died")
+        return value[:rows].copy(), policy[:rows].copy()
+
+    def load_checkpoint(self, path: str) -> None:
+        """Make the server load checkpoint `path` (of `AzeroInferenceServer` only)."""
+        self._server._requests.put(path)
+
+
+class InferenceServer:
+    """
+    Batch inference requests of up to `max_clients` clients.
+
+    Arguments
+    =========
+        model_path: exported float model (`.npz`)
+        max_clients: number of client slots
+        max_batch: rows evaluated in one forward pass at most
+        max_wait: seconds to wait for more requests after the first one
+        max_rows: rows of one request at most (1 for MCTS leaves)
+        ctx: multiprocessing context of the processes using the server
+    """
+
+    def __init__(self, model_path: str, max_clients: int, max_batch: int = 64, max_wait: float = 0.002,
+                 max_rows: int = 1, ctx=multiprocessing) -> None:
+        from numpy_model import load_model
+
+        self.model_path = model_path
+        self._allocate(load_model(model_path).meta, max_clients, max_batch, max_wait, max_rows, ctx)
+
+    def _allocate(self, meta: dict, max_clients: int, max_batch: int, max_wait: float, max_rows: int, ctx) -> None:
+        self.meta = meta
+        self.obs_size = int(np.prod(self.meta["observation_shape"]))
+        self.num_actions = self.meta["output_size"]
+        self.max_clients = max_clients
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+
+        self._ctx = ctx
+        rows = max_clients * max_rows
+        self._obs = ctx.RawArray("f", rows * self.obs_size)
+        self._mask = ctx.RawArray("f", rows * self.num_actions)
+        self._value = ctx.RawArray("f", rows)
+        self._policy = ctx.RawArray("f", rows * self.num_actions)
+        self._rows = ctx.RawArray("i", max_clients)
+        self._ready = [ctx.Semaphore(0) for _ in range(max_clients)]
+        self._requests = ctx.Queue()
+        self._clients = ctx.Value("i", 0)
+        # served rows and forward passes
+        self._served = ctx.RawValue("q", 0)
+        self._batches = ctx.RawValue("q", 0)
+        # pid of the server process, -1 once it has exited
+        self._pid = ctx.RawValue("i", 0)
+        self._deferred = []
+        self._process = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_process"] = None
+        state["_ctx"] = None
+        return state
+
+    def _slot(self, client_id: int):
+        r = self.max_rows
+        obs = np.frombuffer(self._obs, dtype=np.float32).reshape(self.max_clients, r, self.obs_size)
+        mask = np.frombuffer(self._mask, dtype=np.float32).reshape(self.max_clients, r, self.num_actions)
+        value = np.frombuffer(self._value, dtype=np.float32).reshape(self.max_clients, r, 1)
+        policy = np.frombuffer(self._policy, dtype=np.float32).reshape(self.max_clients, r, self.num_actions)
+        return obs[client_id], mask[client_id], value[client_id], policy[client_id]
+
+    def connect(self) -> RemoteModel:
+        """Allocate a slot for the calling process and return its client."""
+        with self._clients.get_lock():
+            client_id = self._clients.value
+            if client_id >= self.max_clients:
+                raise RuntimeError(f"All {self.max_clients} client slots are taken")
+            self._clients.value += 1
+        return RemoteModel(self, client_id)
+
+    @property
+    def alive(self) -> bool:
+        """False once the server process has exited (True before it started)."""
+        pid = self._pid.value
+        return pid == 0 or pid > 0 and _pid_alive(pid)
+
+    @property
+    def stats(self) -> dict:
+        batches = self._batches.value
+        return {
+            "rows": self._served.value,
+            "batches": batches,
+            "mean_batch": self._served.value / batches if batches else 0,
+        }
+
+    def start(self) -> None:
+        self._process = self._ctx.Process(target=self._serve, daemon=True)
+        self._process.start()
+
+    def stop(self) -> None:
+        self._requests.put(None)
+        if self._process is not None:
+            self._process.join(timeout=5)
+            self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _load_model(self):
+        """Create the served model, called in the server process."""
+        from numpy_model import load_model
+
+        return load_model(self.model_path)
+
+    def _load_checkpoint(self, model, path: str) -> None:
+        raise ValueError(f"{type(self).__name__} serves a fixed model, cannot load {path}")
+
+    def _collect(self, model):
+        """Return ids of clients in the next batch, None when stopped; loads requested checkpoints."""
+        while True:
+            first = self._deferred.pop() if self._deferred else self._requests.get()
+            if not isinstance(first, str):
+                break
+            self._load_checkpoint(model, first)
+        if first is None:
+            return None
+        clients, rows = [first], self._rows[first]
+        deadline = time.perf_counter() + self.max_wait
+        # every connected client waits for at most one request
+        while rows < self.max_batch and len(clients) < self._clients.value:
+            try:
+                client = self._requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if client is None or isinstance(client, str):
+                # stop or load a checkpoint after this batch, before later requests
+                self._deferred.append(client)
+                break
+            clients.append(client)
+            rows += self._rows[client]
+        return clients
+
+    def _serve(self) -> None:
+        self._pid.value = os.getpid()
+        try:
+            self._serve_requests(self._load_model())
+        finally:
+            self._pid.value = -1
+
+    def _serve_requests(self, model) -> None:
+        obs, mask, value, policy = (
+            np.frombuffer(raw, dtype=np.float32).reshape(self.max_clients, self.max_rows, -1)
+            for raw in (self._obs, self._mask, self._value, self._policy)
+        )
+        while (clients := self._collect(model)) is not None:
+            counts = [self._rows[c] for c in clients]
+            batch_value, batch_policy = model.inference(
+                np.concatenate([obs[c, :n] for c, n in zip(clients, counts)]),
+                np.concatenate([mask[c, :n] for c, n in zip(clients, counts)]),
+            )
+            offset = 0
+            for client, n in zip(clients, counts):
+                value[client, :n] = batch_value[offset:offset + n]
+                policy[client, :n] = batch_policy[offset:offset + n]
+                offset += n
+                self._ready[client].release()
+            self._served.value += offset
+            self._batches.value += 1
+
+
+class AzeroInferenceServer(InferenceServer):
+    """
+    Serve the TF model of an `azero` training.
+
+    The model is built by `build_model(config)` in the server process and
+    loads the checkpoints its clients ask for; every client forwards the same
+    broadcast of the learner, so each saved checkpoint is loaded once.
+
+    Arguments
+    =========
+        config: `azero.Config` with `observation_shape` and `output_size` set
+        build_model: `azero` model factory (`_init_model_from_config`)
+        max_clients, max_batch, max_wait, ctx: as `InferenceServer`
+    """
+
+    def __init__(self, config, build_model, max_clients: int, max_batch: int = 64, max_wait: float = 0.002,
+                 ctx=multiprocessing) -> None:
+        self.config = config
+        self._build_model = build_model
+        self._loaded = None
+        meta = dict(observation_shape=list(config.observation_shape), output_size=config.output_size)
+        self._allocate(meta, max_clients, max_batch, max_wait, 1, ctx)
+
+    def _load_model(self):
+        return self._build_model(self.config)
+
+    def _load_checkpoint(self, model, path: str) -> None:
+        # the learner overwrites `checkpoint--1`, the path alone does not identify the weights
+        try:
+            key = (path, os.stat(path + ".index").st_mtime_ns)
+        except OSError:
+            key = None
+        if key is None or key != self._loaded:
+            model.load_checkpoint(path)
+            self._loaded = key
+
+
+@contextlib.contextmanager
+def serve_azero(config, max_batch: int = 64, max_wait: float = 0.002):
+    """
+    Evaluate the networks of all `azero` actors and evaluators in one server.
+
+    `azero` builds the model of every process with `_init_model_from_config`;
+    while the hooks are active, the forked actors and evaluators get a
+    `RemoteModel` of an `AzeroInferenceServer` instead, the learner (the
+    calling process) keeps its own model.
+
+    Arguments
+    =========
+        config: `azero.Config` of the training
+        max_batch: rows evaluated in one forward pass at most
+        max_wait: seconds to wait for more requests after the first one
+    """
+    import azero
+    import pyspiel
+
+    module = sys.modules[azero.alpha_zero.__module__]
+    original = module._init_model_from_config
+    game = pyspiel.load_game(config.game)
+    config = config._replace(observation_shape=game.observation_tensor_shape(),
+                             output_size=game.num_distinct_actions())
+    # the actors and evaluators are forked and inherit the server
+    server = AzeroInferenceServer(config, original, config.actors + config.evaluators, max_batch, max_wait,
+                                  ctx=multiprocessing.get_context("fork"))
+    learner = os.getpid()
+
+    def init_model(config):
+        return original(config) if os.getpid() == learner else server.connect()
+
+    module._init_model_from_config = init_model
+    server.start()
+    try:
+        yield server
+    finally:
+        module._init_model_from_config = original
+        print(f"inference server: {server.stats}")
+        server.stop()
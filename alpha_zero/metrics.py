@@ -0,0 +1,262 @@
+"""
+Buffered metrics and artifacts, stored locally and optionally synced to W&B.
+
+`Run.log` only appends to an in-memory queue; a background thread writes
+the queued rows into an append-only `metrics.jsonl`. Saved files are
+hardlinked (or copied) into the run folder under their relative paths,
+so the folder has the same layout as the files of a W&B run and
+`checkpoints.LocalSource` can read checkpoints from it.
+
+Layout
+======
+    ROOT/<run id>/run.json        project, name, config, status
+    ROOT/<run id>/metrics.jsonl   one {"_step", "_time", ...} row per `log`
+    ROOT/<run id>/<saved files>
+    ROOT/<run id>/sync.json       what was already pushed to W&B
+
+Usage
+=====
+    python metrics.py sync --root ./runs            # push all local runs to W&B
+    python metrics.py sync --root ./runs --run ID   # only one run
+
+"""
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+
+from checkpoints import _link_or_copy, file_digest
+
+DEFAULT_ROOT = os.path.join(".", "runs")
+
+
+def _write_json(path: str, data) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class Run:
+    """
+    Local run, a stand-in for `wandb.init(...)`.
+
+    Arguments
+    =========
+        root: folder with all local runs
+        project: W&B project to sync into
+        name: run name
+        config: run config
+        flush_every: seconds between writes of queued rows
+        upstream: also push rows and files to W&B from the flusher thread
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, project: str = None, name: str = None, config: dict = None,
+                 flush_every: float = 5.0, upstream: bool = False) -> None:
+        self.id = secrets.token_hex(4)
+        self.dir = os.path.join(root, self.id)
+        os.makedirs(self.dir)
+        self.project = project
+        self.name = name
+        self.config = dict(config or {})
+        self.flush_every = flush_every
+        self._step = 0
+        self._saved = set()
+        self._queue = queue.SimpleQueue()
+        self._closed = threading.Event()
+        self._write_info("running")
+
+        self._upstream = None
+        if upstream:
+            import wandb
+
+            self._upstream = wandb.init(project=project, name=name, config=self.config)
+
+        self._metrics = open(os.path.join(self.dir, "metrics.jsonl"), "a")
+        self._thread = threading.Thread(target=self._flusher, name="metrics-flusher", daemon=True)
+        self._thread.start()
+
+    def _write_info(self, status: str) -> None:
+        info = dict(id=self.id, project=self.project, name=self.name, config=self.config, status=status)
+        _write_json(os.path.join(self.dir, "run.json"), info)
+
+    def log(self, data: dict, step: int = None) -> None:
+        """Queue one row of scalars (as `wandb.log`)."""
+        if step is None:
+            step = self._step
+        self._step = step + 1
+        self._queue.put(("log", dict(data, _step=step, _time=time.time())))
+
+    def save(self, pattern: str) -> None:
+        """Store files matching `pattern` (relative to the working directory) at the next flush."""
+        self._queue.put(("save", pattern))
+
+    def finish(self) -> None:
+        """Flush everything and stop the flusher thread."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        self._metrics.close()
+        self._write_info("finished")
+        if self._upstream is not None:
+            self._upstream.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def _store(self, pattern: str) -> list:
+        stored = []
+        for path in glob.glob(pattern, recursive=True):
+            if not os.path.isfile(path):
+                continue
+            rel = os.path.normpath(os.path.relpath(path))
+            if rel.startswith(".."):
+                rel = os.path.basename(path)
+            target = os.path.join(self.dir, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _link_or_copy(path, target)
+            stored.append(rel)
+        return stored
+
+    def _flush(self) -> None:
+        rows, patterns = [], []
+        while True:
+            try:
+                kind, item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            (rows if kind == "log" else patterns).append(item)
+
+        for row in rows:
+            self._metrics.write(json.dumps(row, default=float) + "\n")
+        if rows:
+            self._metrics.flush()
+        for pattern in patterns:
+            self._saved.update(self._store(pattern))
+
+        if self._upstream is not None:
+            try:
+                for row in rows:
+                    self._upstream.log({k: v for k, v in row.items() if not k.startswith("_")}, step=row["_step"])
+                for pattern in patterns:
+                    self._upstream.save(pattern)
+            except Exception as e:  # keep training, `sync` can push later
+                logging.warning(f"W&B upload failed, keeping local copy only: {e}")
+
+    def _flusher(self) -> None:
+        while not self._closed.wait(self.flush_every):
+            self._flush()
+        self._flush()
+
+
+################################################################################
+##                            WANDB STAND-IN
+################################################################################
+
+@contextlib.contextmanager
+def patch_wandb(run: Run):
+    """Redirect `wandb.log`/`wandb.save` (e.g. called inside azero) to `run`."""
+    try:
+        import wandb
+    except ImportError:
+        yield run
+        return
+
+    original = wandb.log, wandb.save
+    wandb.log = lambda data, step=None, **kwargs: run.log(data, step)
+    wandb.save = lambda pattern, *args, **kwargs: run.save(pattern)
+    try:
+        yield run
+    finally:
+        wandb.log, wandb.save = original
+
+
+################################################################################
+##                            SYNC
+################################################################################
+
+def sync_run(run_dir: str) -> str:
+    """
+    Push the rows and files of a local run to W&B, skipping what was pushed before.
+
+    Returns
+    =======
+        W&B path of the run (entity/project/id)
+    """
+    import wandb
+
+    info = _read_json(os.path.join(run_dir, "run.json"))
+    state_path = os.path.join(run_dir, "sync.json")
+    state = _read_json(state_path, {"rows": 0, "files": {}, "path": None})
+
+    run = wandb.init(
+        project=info["project"], name=info["name"], config=info["config"],
+        id=info["id"], resume="allow", dir=run_dir,
+    )
+    try:
+        rows = 0
+        metrics = os.path.join(run_dir, "metrics.jsonl")
+        if os.path.exists(metrics):
+            with open(metrics, "r") as f:
+                for rows, line in enumerate(f, start=1):
+                    if rows > state["rows"]:
+                        row = json.loads(line)
+                        run.log({k: v for k, v in row.items() if not k.startswith("_")}, step=row["_step"])
+
+        skip = {"run.json", "metrics.jsonl", "sync.json", "wandb"}
+        files = dict(state["files"])
+        for dirpath, dirnames, filenames in os.walk(run_dir):
+            if dirpath == run_dir:
+                dirnames[:] = [d for d in dirnames if d not in skip]
+                filenames = [f for f in filenames if f not in skip and not f.endswith(".tmp")]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, run_dir)
+                digest = file_digest(path)
+                if files.get(rel) != digest:
+                    run.save(path, base_path=run_dir, policy="now")
+                    files[rel] = digest
+        state = {"rows": rows, "files": files, "path": run.path}
+    finally:
+        run.finish()
+    _write_json(state_path, state)
+    return state["path"]
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync = commands.add_parser("sync", help="Push local runs to W&B")
+    sync.add_argument("--root", type=str, default=DEFAULT_ROOT, metavar="DIR", help="Folder with local runs")
+    sync.add_argument("--run", type=str, nargs="*", default=None, metavar="ID", help="Runs to sync (default all)")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    runs = args.run or sorted(
+        d for d in os.listdir(args.root) if os.path.exists(os.path.join(args.root, d, "run.json"))
+    )
+    for run_id in runs:
+        print(f"{run_id} -> {sync_run(os.path.join(args.root, run_id))}")
+
+
+if __name__ == "__main__":
+    main()
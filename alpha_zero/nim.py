@@ -0,0 +1,173 @@
+"""
+Perfect play of Nim (open_spiel `nim`) by the nim-sum.
+
+A position of normal Nim is lost for the player to move iff the xor of
+the pile sizes (nim-sum) is zero, a winning move makes it zero. Misère
+Nim is played the same way until a move would leave only piles of size
+at most one, then an odd number of single stones is left instead. A
+move is optimal if it keeps a won position won (every move of a lost
+position is optimal).
+
+Usage
+=====
+    python nim.py                              # check against exhaustive search
+    python nim.py --pile-sizes "3;4;5" --normal
+
+"""
+import argparse
+import functools
+import itertools
+import time
+
+import pyspiel
+
+
+def piles(state) -> list[int]:
+    """Pile sizes of a pyspiel nim state, from its string `(player): sizes...`."""
+    return [int(size) for size in str(state).split(":", 1)[1].split()]
+
+
+def is_misere(game) -> bool:
+    return bool(game.get_parameters().get("is_misere", True))
+
+
+def encode(pile: int, take: int, num_piles: int) -> int:
+    """Action taking `take` stones from pile `pile` (0-based)."""
+    return (take - 1) * num_piles + pile
+
+
+def decode(action: int, num_piles: int) -> tuple[int, int]:
+    """Inverse of `encode`, (pile, take)."""
+    return action % num_piles, action // num_piles + 1
+
+
+def is_winning(sizes, misere: bool) -> bool:
+    """Whether the player to move wins with perfect play."""
+    nim_sum = functools.reduce(int.__xor__, sizes, 0)
+    if misere and all(size <= 1 for size in sizes):
+        # the player taking the last stone loses
+        return nim_sum == 0
+    return nim_sum != 0
+
+
+def winning_move(sizes, misere: bool):
+    """Return (pile, take) winning the position in O(piles), None if the position is lost."""
+    nim_sum = functools.reduce(int.__xor__, sizes, 0)
+    big = [i for i, size in enumerate(sizes) if size > 1]
+    if misere and len(big) <= 1:
+        ones = sum(size == 1 for size in sizes)
+        if not big:
+            # an odd number of single stones wins: take one of them
+            return (sizes.index(1), 1) if ones % 2 == 0 and ones else None
+        # reduce the only big pile to 0 or 1 stones, leaving an odd number of single stones
+        i = big[0]
+        return i, sizes[i] - (ones % 2 == 0)
+    if nim_sum == 0:
+        return None
+    i = next(i for i, size in enumerate(sizes) if size ^ nim_sum < size)
+    return i, sizes[i] - (sizes[i] ^ nim_sum)
+
+
+def is_optimal(sizes, pile: int, take: int, misere: bool) -> bool:
+    """Whether taking `take` stones from `pile` is a perfect move."""
+    after = list(sizes)
+    after[pile] -= take
+    return not is_winning(sizes, misere) or not is_winning(after, misere)
+
+
+class PerfectNimBot:
+    """Play the winning move if there is one, otherwise take one stone of the largest pile."""
+
+    def __init__(self, misere: bool = True) -> None:
+        self.misere = misere
+
+    @classmethod
+    def from_game(cls, game) -> "PerfectNimBot":
+        return cls(is_misere(game))
+
+    def step(self, state) -> int:
+        sizes = piles(state)
+        move = winning_move(sizes, self.misere)
+        if move is None:
+            move = max(range(len(sizes)), key=sizes.__getitem__), 1
+        return encode(*move, len(sizes))
+
+
+def optimal_moves(game, actions, player: int) -> tuple[int, int]:
+    """Return (optimal moves, all moves) of `player` in a played game."""
+    misere = is_misere(game)
+    state = game.new_initial_state()
+    optimal = total = 0
+    for action in actions:
+        if state.current_player() == player:
+            sizes = piles(state)
+            optimal += is_optimal(sizes, *decode(action, len(sizes)), misere)
+            total += 1
+        state.apply_action(action)
+    return optimal, total
+
+
+################################################################################
+##                            CHECK
+################################################################################
+
+def _solve(sizes: tuple, misere: bool, cache: dict) -> bool:
+    """Whether the player to move wins, by exhaustive search."""
+    if sizes not in cache:
+        if not any(sizes):
+            # the previous player took the last stone
+            cache[sizes] = misere
+        else:
+            cache[sizes] = any(
+                not _solve(sizes[:i] + (size - take,) + sizes[i + 1:], misere, cache)
+                for i, size in enumerate(sizes) for take in range(1, size + 1)
+            )
+    return cache[sizes]
+
+
+def check(pile_sizes: list[int], misere: bool) -> int:
+    """Compare `is_winning` and `winning_move` to exhaustive search on all positions, return their count."""
+    cache = {}
+    positions = list(itertools.product(*(range(size + 1) for size in pile_sizes)))
+    for sizes in positions:
+        won = _solve(sizes, misere, cache)
+        assert is_winning(sizes, misere) == won, sizes
+        move = winning_move(list(sizes), misere)
+        assert (move is not None) == (won and any(sizes)), sizes
+        if move is not None:
+            pile, take = move
+            after = sizes[:pile] + (sizes[pile] - take,) + sizes[pile + 1:]
+            assert 1 <= take <= sizes[pile] and not _solve(after, misere, cache), sizes
+    return len(positions)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--pile-sizes", type=str, default="1;3;5;7", metavar="A;B;..", help="Initial piles")
+    parser.add_argument("--normal", action="store_true", default=False, help="Normal play instead of misère")
+    parser.add_argument("--games", type=int, default=1000, metavar="N", help="Timed games of the bot against itself")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    pile_sizes = [int(size) for size in args.pile_sizes.split(";")]
+    misere = not args.normal
+    print(f"{check(pile_sizes, misere)} positions agree with exhaustive search")
+
+    game = pyspiel.load_game("nim", {"is_misere": misere, "pile_sizes": args.pile_sizes})
+    bot = PerfectNimBot.from_game(game)
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(args.games):
+        state = game.new_initial_state()
+        while not state.is_terminal():
+            state.apply_action(bot.step(state))
+            moves += 1
+    seconds = time.perf_counter() - start
+    first = "first" if is_winning(pile_sizes, misere) else "second"
+    print(f"{moves / seconds:,.0f} moves/s, the {first} player wins: returns {state.returns()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+TensorFlow-free inference of trained AlphaZero networks.
+
+A checkpoint of an `mlp`, `conv2d` or `resnet` model is exported once
+(this step needs TensorFlow) into a flat `.npz` file, which `NumpyModel`
+evaluates with a batched forward pass in pure NumPy. Batch normalisation
+is folded into the preceding convolution when loading.
+
+Usage
+=====
+    python numpy_model.py export --path ttt-mlp-big-50 --checkpoint -1
+    python numpy_model.py play --model ttt-mlp-big-50/checkpoint--1.npz --human-first
+
+"""
+import argparse
+import collections
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_META = "__meta__"
+_BN_EPSILON = 1e-3  # keras default
+_SKIP_VARIABLES = ("Adam", "power", "global_step", "Momentum")
+
+Layer = collections.namedtuple("Layer", ["name", "kernel", "bias"])
+
+
+################################################################################
+##                            EXPORT
+################################################################################
+
+def checkpoint_prefix(path: str, checkpoint: int) -> str:
+    return os.path.join(path, f"checkpoint-{checkpoint}")
+
+
+def export_checkpoint(cfg: dict, path: str, checkpoint: int, out: str = None) -> str:
+    """
+    Convert a TensorFlow checkpoint into a `.npz` file.
+
+    Arguments
+    =========
+        cfg: config of the run (`config.json`)
+        path: folder with the checkpoint files
+        checkpoint: checkpoint number
+        out: where to write (default next to the checkpoint)
+
+    Returns
+    =======
+        path of the written `.npz` file
+    """
+    import tensorflow as tf
+
+    prefix = checkpoint_prefix(path, checkpoint)
+    out = out or prefix + ".npz"
+    reader = tf.train.load_checkpoint(prefix)
+    weights = {
+        name: reader.get_tensor(name)
+        for name in reader.get_variable_to_shape_map()
+        if not any(skip in name for skip in _SKIP_VARIABLES)
+    }
+    meta = {
+        "nn_model": cfg["nn_model"],
+        "nn_depth": cfg["nn_depth"],
+        "nn_width": cfg["nn_width"],
+        "observation_shape": list(cfg["observation_shape"]),
+        "output_size": cfg["output_size"],
+    }
+    np.savez(out, **{_META: np.array(json.dumps(meta))}, **weights)
+    return out
+
+
+def ensure_exported(cfg: dict, path: str, checkpoint: int) -> str:
+    """Export the checkpoint unless an up-to-date `.npz` already exists."""
+    prefix = checkpoint_prefix(path, checkpoint)
+    out = prefix + ".npz"
+    if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(prefix + ".index"):
+        export_checkpoint(cfg, path, checkpoint, out)
+    return out
+
+
+################################################################################
+##                            MODEL
+################################################################################
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _conv2d(x, kernel, bias):
+    """Stride 1, `same` padding, channels last (as keras `Conv2D`)."""
+    kh, kw = kernel.shape[:2]
+    x = np.pad(x, ((0, 0), ((kh - 1) // 2, kh // 2), ((kw - 1) // 2, kw // 2), (0, 0)))
+    windows = sliding_window_view(x, (kh, kw), axis=(1, 2))  # (B, H, W, C, kh, kw)
+    return np.tensordot(windows, kernel.transpose(2, 0, 1, 3), axes=([3, 4, 5], [0, 1, 2])) + bias
+
+
+class NumpyModel:
+    """
+    Pure NumPy twin of the azero (open_spiel) policy/value network.
+
+    `inference` has the same signature and outputs as the TensorFlow model,
+    so the model can be used wherever the original one is.
+    """
+
+    def __init__(self, weights: dict, meta: dict) -> None:
+        self.meta = meta
+        self.model_type = meta["nn_model"]
+        self.depth = meta["nn_depth"]
+        self.observation_shape = tuple(meta["observation_shape"])
+        self.output_size = meta["output_size"]
+        self._weights = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+        self.params = self._build()
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyModel":
+        with np.load(path) as data:
+            meta = json.loads(str(data[_META]))
+            weights = {k: data[k] for k in data.files if k != _META}
+        return cls(weights, meta)
+
+    def _get(self, layer: str, param: str):
+        suffix = f"{layer}/{param}"
+        matches = [k for k in self._weights if k == suffix or k.endswith("/" + suffix)]
+        if len(matches) != 1:
+            raise KeyError(f"Expected exactly one variable {suffix}, found {matches}")
+        return self._weights[matches[0]]
+
+    def _dense(self, name):
+        return Layer(name, self._get(name, "kernel"), self._get(name, "bias"))
+
+    def _conv_bn(self, conv, bn):
+        _, kernel, bias = self._dense(conv)
+        scale = self._get(bn, "gamma") / np.sqrt(self._get(bn, "moving_variance") + _BN_EPSILON)
+        return Layer(conv, kernel * scale, (bias - self._get(bn, "moving_mean")) * scale + self._get(bn, "beta"))
+
+    def _dense_op(self, x, layer: Layer):
+        return x @ layer.kernel + layer.bias
+
+    def _conv_op(self, x, layer: Layer):
+        return _conv2d(x, layer.kernel, layer.bias)
+
+    def _build(self) -> dict:
+        params = {}
+        if self.model_type == "mlp":
+            params["torso"] = [self._dense(f"torso_{i}_dense") for i in range(self.depth)]
+            params["policy_head"] = self._dense("policy_dense")
+        else:
+            if self.model_type == "conv2d":
+                params["torso"] = [
+                    self._conv_bn(f"torso_{i}_conv", f"torso_{i}_batch_norm") for i in range(self.depth)
+                ]
+            elif self.model_type == "resnet":
+                params["torso_in"] = self._conv_bn("torso_in_conv", "torso_in_batch_norm")
+                params["torso"] = [
+                    (self._conv_bn(f"torso_{i}_res_conv1", f"torso_{i}_res_batch_norm1"),
+                     self._conv_bn(f"torso_{i}_res_conv2", f"torso_{i}_res_batch_norm2"))
+                    for i in range(self.depth)
+                ]
+            else:
+                raise ValueError(f"Unknown model type {self.model_type=}")
+            params["policy_head"] = self._conv_bn("policy_conv", "policy_batch_norm")
+            params["value_head"] = self._conv_bn("value_conv", "value_batch_norm")
+        params["policy"] = self._dense("policy")
+        params["value_dense"] = self._dense("value_dense")
+        params["value"] = self._dense("value")
+        return params
+
+    def _torso(self, x):
+        p = self.params
+        if self.model_type == "mlp":
+            for layer in p["torso"]:
+                x = _relu(self._dense_op(x, layer))
+            return x
+
+        x = x.reshape(-1, *self.observation_shape)  # keras Reshape: last axis = channels
+        if self.model_type == "conv2d":
+            for layer in p["torso"]:
+                x = _relu(self._conv_op(x, layer))
+            return x
+
+        x = _relu(self._conv_op(x, p["torso_in"]))
+        for conv1, conv2 in p["torso"]:
+            y = _relu(self._conv_op(x, conv1))
+            x = _relu(self._conv_op(y, conv2) + x)
+        return x
+
+    def forward(self, observation):
+        """Return (value, policy logits) for a batch of flat observations."""
+        p = self.params
+        x = np.asarray(observation, dtype=np.float32).reshape(len(observation), -1)
+        torso = self._torso(x)
+
+        if self.model_type == "mlp":
+            policy_head = _relu(self._dense_op(torso, p["policy_head"]))
+            value_head = torso
+        else:
+            batch = len(torso)
+            policy_head = _relu(self._conv_op(torso, p["policy_head"])).reshape(batch, -1)
+            value_head = _relu(self._conv_op(torso, p["value_head"])).reshape(batch, -1)
+
+        logits = self._dense_op(policy_head, p["policy"])
+        value = _relu(self._dense_op(value_head, p["value_dense"]))
+        value = np.tanh(self._dense_op(value, p["value"]))
+        return value, logits
+
+    def inference(self, observation, legals_mask):
+        """Return (value of shape (B, 1), policy of shape (B, num_actions))."""
+        value, logits = self.forward(observation)
+        logits = np.where(np.asarray(legals_mask, dtype=bool), logits, -1e32)
+        logits -= logits.max(axis=1, keepdims=True)
+        policy = np.exp(logits)
+        policy /= policy.sum(axis=1, keepdims=True)
+        return value, policy
+
+
+def load_model(path: str) -> NumpyModel:
+    """Load an exported model."""
+    return NumpyModel.load(path)
+
+
+################################################################################
+##                            MCTS
+################################################################################
+
+def _mcts():
+    # imported lazily, so that exporting does not need open_spiel
+    from open_spiel.python.algorithms import mcts
+
+    return mcts
+
+
+class NumpyEvaluator:
+    """MCTS leaf evaluator (as `AlphaZeroEvaluator`) backed by `NumpyModel`."""
+
+    def __init__(self, model: NumpyModel, cache_size: int = 2**16) -> None:
+        self._model = model
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+
+    def _inference(self, state):
+        obs = np.expand_dims(state.observation_tensor(), 0)
+        mask = np.expand_dims(state.legal_actions_mask(), 0)
+        key = obs.tobytes() + mask.tobytes()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value, policy = self._model.inference(obs, mask)
+        result = self._cache[key] = (value[0, 0], policy[0])
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def evaluate(self, state):
+        value, _ = self._inference(state)
+        return np.array([value, -value])
+
+    def prior(self, state):
+        if state.is_chance_node():
+            return state.chance_outcomes()
+        _, policy = self._inference(state)
+        return [(action, policy[action]) for action in state.legal_actions()]
+
+
+def load_numpy_bot(cfg: dict, model_path, is_eval: bool = True):
+    """
+    Create a MCTS bot guided by an exported network.
+
+    Counterpart of `azero.load_trained_bot`, returns (bot, model).
+    `model_path` may also be a loaded model (e.g. `inference_server.RemoteModel`).
+    """
+    import pyspiel
+
+    mcts = _mcts()
+    model = load_model(model_path) if isinstance(model_path, str) else model_path
+    game = pyspiel.load_game(cfg["game"])
+    noise = None if is_eval else (cfg["policy_epsilon"], cfg["policy_alpha"])
+    bot = mcts.MCTSBot(
+        game,
+        cfg["uct_c"],
+        cfg["max_simulations"],
+        NumpyEvaluator(model),
+        solve=False,
+        dirichlet_noise=noise,
+        child_selection_fn=mcts.SearchNode.puct_value,
+        verbose=False,
+        dont_return_chance_node=True,
+    )
+    return bot, model
+
+
+################################################################################
+##                            MAIN
+################################################################################
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Convert a checkpoint into .npz")
+    export.add_argument("--path", type=str, required=True, metavar="DIR", help="Folder with config.json and checkpoints")
+    export.add_argument("--checkpoint", type=int, default=-1, metavar="N", help="which checkpoint")
+    export.add_argument("--out", type=str, default=None, metavar="FILE", help="Output file")
+
+    play = commands.add_parser("play", help="Play against an exported bot in pygame")
+    play.add_argument("--model", type=str, required=True, metavar="FILE", help="Exported .npz model")
+    play.add_argument("--config", type=str, default=None, metavar="FILE", help="config.json (default next to model)")
+    play.add_argument("--human-first", action='store_true', help="Human plays first", default=False)
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+
+    if args.command == "export":
+        with open(os.path.join(args.path, "config.json"), "r") as f:
+            cfg = json.load(f)
+        print("Exported to", export_checkpoint(cfg, args.path, args.checkpoint, args.out))
+        return
+
+    import games
+
+    config = args.config or os.path.join(os.path.dirname(args.model), "config.json")
+    with open(config, "r") as f:
+        cfg = json.load(f)
+    bot, _ = load_numpy_bot(cfg, args.model)
+    play_pygame = {games.TTT_NAME: games.tic_tac_toe.play_pygame, games.SNAKES_NAME: games.snakes.play_pygame}[cfg["game"]]
+    players = [None, bot.step] if args.human_first else [bot.step, None]
+    play_pygame(cfg["game"], *players)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Opening book for (generalized) Tic-Tac-Toe.
+
+All positions of the first `plies` moves are enumerated up to the
+symmetries of the board (8 for square boards, 4 otherwise), every one is
+searched deeply once by MCTS-Solver and the best move is stored. A
+position is keyed by its packed state (`TTT.pack`) in the canonical
+orientation, the one with the smallest packed board.
+
+`BookBot` plays from the book and falls back to another bot outside it,
+counting hits and misses.
+
+Usage
+=====
+    python opening_book.py build --game ttt --plies 3 --simulations 20000 --out ttt-book.npz
+    python opening_book.py show --book ttt-book.npz
+
+"""
+import argparse
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import pyspiel
+import tqdm
+from open_spiel.python.algorithms import mcts
+
+from games._bits import pack2
+from games.tic_tac_toe import TTT  # also registers the games
+
+_META = "__meta__"
+
+
+################################################################################
+##                            SYMMETRIES
+################################################################################
+
+def symmetries(rows: int, cols: int) -> np.ndarray:
+    """
+    Return cell permutations of the board symmetries, shape (S, rows * cols).
+
+    The transformed board is `board.flat[perm]`, so cell `i` of the
+    transformed board is cell `perm[i]` of the original one.
+    """
+    cells = np.arange(rows * cols).reshape(rows, cols)
+    transforms = [cells, np.flipud(cells), np.fliplr(cells), np.rot90(cells, 2)]
+    if rows == cols:
+        transforms += [cells.T, np.rot90(cells, 1), np.rot90(cells, 3), np.rot90(cells, 2).T]
+    return np.stack([t.reshape(-1) for t in transforms])
+
+
+def canonical(game: TTT, perms: np.ndarray):
+    """
+    Return (key, symmetry) of the game: its packed state in the canonical
+    orientation, and the index of the permutation giving it.
+    """
+    packed = game.pack()
+    board_bytes = -(-game._rows * game._cols // 4)
+    boards = pack2(game.board.reshape(-1)[perms])
+    sym = min(range(len(perms)), key=lambda s: boards[s].tobytes())
+    return packed[:-board_bytes] + boards[sym].tobytes(), sym
+
+
+################################################################################
+##                            BOOK
+################################################################################
+
+class OpeningBook:
+    """
+    Best moves of canonical positions.
+
+    Arguments
+    =========
+        keys: (N, packed size) uint8, canonical packed states
+        actions: best action of every position (in its canonical orientation)
+        values: value of the best action for the player to move
+        visits: simulations spent on the position (0 if the value is exact)
+        meta: game name and size, search settings
+    """
+
+    def __init__(self, keys, actions, values, visits, meta: dict) -> None:
+        self.keys = np.asarray(keys, dtype=np.uint8)
+        self.actions = np.asarray(actions, dtype=np.int16)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.visits = np.asarray(visits, dtype=np.int32)
+        self.meta = meta
+        self.rows, self.cols = meta["rows"], meta["cols"]
+        self._perms = symmetries(self.rows, self.cols)
+        self._index = { key.tobytes(): i for i, key in enumerate(self.keys) }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, **{_META: np.array(json.dumps(self.meta))},
+            keys=self.keys, actions=self.actions, values=self.values, visits=self.visits,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "OpeningBook":
+        with np.load(path) as data:
+            meta = json.loads(str(data[_META]))
+            return cls(data["keys"], data["actions"], data["values"], data["visits"], meta)
+
+    def lookup(self, state):
+        """Return the book action of a pyspiel state, None if not in the book."""
+        game = getattr(state, "_game", None)
+        if not isinstance(game, TTT) or (game._rows, game._cols) != (self.rows, self.cols):
+            return None
+        key, sym = canonical(game, self._perms)
+        i = self._index.get(key)
+        if i is None:
+            return None
+        return int(self._perms[sym][self.actions[i]])
+
+
+class BookBot:
+    """Play from `book` while possible, otherwise call `fallback(state)`."""
+
+    def __init__(self, book: OpeningBook, fallback) -> None:
+        self.book = book
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def step(self, state):
+        action = self.book.lookup(state)
+        if action is None:
+            self.misses += 1
+            return self.fallback(state)
+        self.hits += 1
+        return action
+
+
+################################################################################
+##                            BUILD
+################################################################################
+
+def opening_positions(game, plies: int, perms: np.ndarray) -> list:
+    """Canonical keys of all non-terminal positions after fewer than `plies` moves."""
+    positions = []
+    level = { canonical(game.new_initial_state()._game, perms)[0]: game.new_initial_state() }
+    for ply in range(plies):
+        positions += level
+        if ply + 1 == plies:
+            break
+        children = {}
+        for state in level.values():
+            for action in state.legal_actions():
+                child = state.child(action)
+                if not child.is_terminal():
+                    key, _ = canonical(child._game, perms)
+                    children.setdefault(key, child)
+        level = children
+    return positions
+
+
+def _search(args):
+    game_name, key, simulations, uct_c, seed = args
+    game = pyspiel.load_game(game_name)
+    state = game.unpack_state(bytes([False]) + key)
+    rng = np.random.RandomState(seed)
+    bot = mcts.MCTSBot(game, uct_c, simulations, mcts.RandomRolloutEvaluator(1, rng), solve=True, random_state=rng)
+    root = bot.mcts_search(state)
+    best = root.best_child()
+    player = state.current_player()
+    if best.outcome is not None:
+        return best.action, best.outcome[player], 0
+    return best.action, best.total_reward / best.explore_count, root.explore_count
+
+
+def build_book(game_name: str, plies: int, simulations: int, uct_c: float = 1.4, workers: int = 1,
+               seed: int = 0) -> OpeningBook:
+    """Search every canonical position of the first `plies` moves of the game."""
+    game = pyspiel.load_game(game_name)
+    engine = game.new_initial_state()._game
+    perms = symmetries(engine._rows, engine._cols)
+    keys = opening_positions(game, plies, perms)
+    tasks = [(game_name, key, simulations, uct_c, seed + i) for i, key in enumerate(keys)]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            results = list(tqdm.tqdm(pool.imap(_search, tasks), total=len(tasks), desc="book"))
+    else:
+        results = [_search(task) for task in tqdm.tqdm(tasks, desc="book")]
+    actions, values, visits = zip(*results)
+
+    meta = dict(
+        game=game_name, rows=engine._rows, cols=engine._cols, to_connect=engine.to_connect,
+        plies=plies, simulations=simulations, uct_c=uct_c, seconds=time.perf_counter() - start,
+    )
+    keys = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), -1)
+    return OpeningBook(keys, actions, values, visits, meta)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Search the openings and write a book")
+    build.add_argument("--game", type=str, default="ttt", metavar="NAME", help="Registered TTT game")
+    build.add_argument("--plies", type=int, default=3, metavar="N", help="Book covers positions before move N")
+    build.add_argument("--simulations", type=int, default=20000, metavar="N", help="MCTS simulations per position")
+    build.add_argument("--uct-c", type=float, default=1.4, metavar="F", help="Exploration constant")
+    build.add_argument("--workers", type=int, default=1, metavar="N", help="Parallel searches")
+    build.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of the searches")
+    build.add_argument("--out", type=str, required=True, metavar="FILE", help="Output .npz book")
+
+    show = commands.add_parser("show", help="Print a book")
+    show.add_argument("--book", type=str, required=True, metavar="FILE", help="Book .npz file")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    if args.command == "build":
+        book = build_book(args.game, args.plies, args.simulations, args.uct_c, args.workers, args.seed)
+        book.save(args.out)
+        print(f"{len(book)} positions in {book.meta['seconds']:.1f} s -> {args.out}")
+        return
+
+    book = OpeningBook.load(args.book)
+    print(book.meta)
+    game = pyspiel.load_game(book.meta["game"])
+    for key, action, value, visits in zip(book.keys, book.actions, book.values, book.visits):
+        state = game.unpack_state(bytes([False]) + key.tobytes())
+        print(state._game.to_str())
+        print(f"best {state.action2pos(int(action))}, value {value:+.3f}, {'exact' if visits == 0 else f'{visits} sims'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Accuracy report of post-training int8 quantization of exported networks.
+
+Weights of every dense and convolutional layer are quantized symmetrically
+to int8 with one scale per output channel. Inputs of every layer are
+quantized with a static scale calibrated on recorded observations (see
+`trajectories.py`). Products are accumulated exactly (as in int32), so the
+results equal those of an int8 kernel.
+
+The report compares the quantized model with the float one: accuracy on
+held-out observations, size of the weights, and strength in games where
+MCTS guided by the int8 model plays MCTS guided by the float model.
+
+It does not make MCTS faster: NumPy's integer matrix products (int8 into
+int32, int16, int32) are 4 to 70 times slower than float BLAS on layers
+of these networks, at batch 1 as at batch 64. The quantized model is
+therefore simulated with float products and only lives in this report,
+no int8 model is saved for playing.
+
+Usage
+=====
+    python quantize.py --model ttt-mlp-big-50/checkpoint--1.npz --calibration trajectories/ttt \\
+        --games 40 --path eval/ttt/int8.csv
+
+"""
+import argparse
+import collections
+import json
+import os
+
+import numpy as np
+
+from numpy_model import Layer, NumpyModel, _conv2d, load_numpy_bot
+
+_QMAX = 127
+
+QLayer = collections.namedtuple("QLayer", ["name", "kernel", "w_scale", "bias", "x_scale"])
+
+
+def _quantize(x, scale):
+    """Round `x / scale` to int8 range (kept in a float array)."""
+    return np.clip(np.rint(x / scale), -_QMAX, _QMAX)
+
+
+def _exact_dtype(reduction: int):
+    # float32 holds every partial sum of int8 products exactly below 2**24
+    return np.float32 if reduction * _QMAX ** 2 < 2 ** 24 else np.float64
+
+
+def _iter_layers(params):
+    if isinstance(params, Layer):
+        yield params
+    elif isinstance(params, dict):
+        for value in params.values():
+            yield from _iter_layers(value)
+    elif isinstance(params, (list, tuple)):
+        for value in params:
+            yield from _iter_layers(value)
+
+
+class _Calibrator(NumpyModel):
+    """Float model which records input ranges of every layer."""
+
+    def __init__(self, model: NumpyModel, percentile: float) -> None:
+        self.percentile = percentile
+        self.ranges = {}
+        super().__init__(model._weights, model.meta)
+
+    def _record(self, x, layer):
+        self.ranges[layer.name] = max(float(np.percentile(np.abs(x), self.percentile)), 1e-8)
+
+    def _dense_op(self, x, layer):
+        self._record(x, layer)
+        return super()._dense_op(x, layer)
+
+    def _conv_op(self, x, layer):
+        self._record(x, layer)
+        return super()._conv_op(x, layer)
+
+
+class QuantizedModel(NumpyModel):
+    """`NumpyModel` with int8 weights and activations (simulated, see module docs)."""
+
+    def __init__(self, layers: dict, meta: dict) -> None:
+        self.layers = layers
+        self._kernels = {}
+        for layer in layers.values():
+            reduction = int(np.prod(layer.kernel.shape[:-1]))
+            self._kernels[layer.name] = layer.kernel.astype(_exact_dtype(reduction))
+        super().__init__({}, meta)
+
+    @classmethod
+    def from_float(cls, model: NumpyModel, observations, percentile: float = 99.99) -> "QuantizedModel":
+        """
+        Quantize `model`, calibrating activation scales on `observations`.
+
+        Arguments
+        =========
+            model: float model
+            observations: (N, obs_size) observations to calibrate on
+            percentile: percentile of absolute activations mapped to 127
+        """
+        calibrator = _Calibrator(model, percentile)
+        calibrator.forward(observations)
+
+        layers = {}
+        for layer in _iter_layers(calibrator.params):
+            axes = tuple(range(layer.kernel.ndim - 1))
+            w_scale = np.abs(layer.kernel).max(axis=axes) / _QMAX
+            w_scale[w_scale == 0] = 1
+            kernel = _quantize(layer.kernel, w_scale).astype(np.int8)
+            x_scale = np.float32(calibrator.ranges[layer.name] / _QMAX)
+            layers[layer.name] = QLayer(layer.name, kernel, w_scale.astype(np.float32), layer.bias, x_scale)
+        return cls(layers, model.meta)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(layer.kernel.nbytes + layer.w_scale.nbytes + layer.bias.nbytes for layer in self.layers.values())
+
+    def _dense(self, name):
+        return self.layers[name]
+
+    def _conv_bn(self, conv, bn):
+        return self.layers[conv]
+
+    def _dense_op(self, x, layer: QLayer):
+        kernel = self._kernels[layer.name]
+        acc = _quantize(x, layer.x_scale).astype(kernel.dtype) @ kernel
+        return (acc * (layer.x_scale * layer.w_scale) + layer.bias).astype(np.float32)
+
+    def _conv_op(self, x, layer: QLayer):
+        kernel = self._kernels[layer.name]
+        acc = _conv2d(_quantize(x, layer.x_scale).astype(kernel.dtype), kernel, 0)
+        return (acc * (layer.x_scale * layer.w_scale) + layer.bias).astype(np.float32)
+
+
+################################################################################
+##                            REPORT
+################################################################################
+
+def accuracy_report(float_model: NumpyModel, int8_model: NumpyModel, observations, legals_mask) -> dict:
+    """Compare outputs of both models on held-out observations."""
+    value_f, policy_f = float_model.inference(observations, legals_mask)
+    value_q, policy_q = int8_model.inference(observations, legals_mask)
+    return {
+        "value_mae": float(np.abs(value_f - value_q).mean()),
+        "value_max_error": float(np.abs(value_f - value_q).max()),
+        "policy_tv_distance": float(0.5 * np.abs(policy_f - policy_q).sum(axis=1).mean()),
+        "policy_top1_agreement": float((policy_f.argmax(axis=1) == policy_q.argmax(axis=1)).mean()),
+    }
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument("--model", type=str, required=True, metavar="FILE", help="Exported float model (.npz)")
+    parser.add_argument("--config", type=str, default=None, metavar="FILE", help="config.json (default next to model)")
+    parser.add_argument("--calibration", type=str, required=True, metavar="DIR", help="Trajectory store with recorded observations")
+    parser.add_argument("--calibration-size", type=int, default=2048, metavar="N", help="Observations to calibrate on")
+    parser.add_argument("--percentile", type=float, default=99.99, metavar="F", help="Percentile of activations mapped to 127")
+
+    parser.add_argument("--games", type=int, default=20, metavar="N", help="Games of int8 vs float MCTS")
+    parser.add_argument("--path", type=str, default=None, metavar="PATH", help="Where to save played games (.csv)")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+
+    from trajectories import TrajectoryReader
+
+    rng = np.random.default_rng(0)
+    reader = TrajectoryReader(args.calibration)
+    data = reader.sample(2 * args.calibration_size, rng)
+    calibration, held_out = slice(0, args.calibration_size), slice(args.calibration_size, None)
+
+    float_model = NumpyModel.load(args.model)
+    int8_model = QuantizedModel.from_float(float_model, data["observation"][calibration], args.percentile)
+
+    obs, mask = data["observation"][held_out], data["legals_mask"][held_out]
+    report = accuracy_report(float_model, int8_model, obs, mask)
+    report["float_weights_bytes"] = sum(l.kernel.nbytes + l.bias.nbytes for l in _iter_layers(float_model.params))
+    report["int8_weights_bytes"] = int8_model.nbytes
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.6g}")
+
+    if args.games > 0:
+        import pandas as pd
+        import pyspiel
+        import tqdm
+
+        import games  # registers the games
+        from evaluate import Result, play_game
+
+        config = args.config or os.path.join(os.path.dirname(args.model), "config.json")
+        with open(config, "r") as f:
+            cfg = json.load(f)
+        game = pyspiel.load_game(cfg["game"])
+        int8_fn = load_numpy_bot(cfg, int8_model)[0].step
+        float_fn = load_numpy_bot(cfg, float_model)[0].step
+
+        results = []
+        for i in tqdm.trange(args.games, desc="int8 vs. float"):
+            players = [int8_fn, float_fn] if i % 2 == 0 else [float_fn, int8_fn]
+            state, actions = play_game(game, players)
+            player_res = state.returns()[i % 2]
+            results.append(Result("int8", cfg["max_simulations"], cfg["uct_c"], i % 2 == 0, player_res, 0, actions))
+
+        df = pd.DataFrame([vars(x) for x in results])
+        print(df.result_from_player.value_counts().rename({1: "int8 wins", 0: "draws", -1: "float wins"}))
+        if args.path:
+            df.to_csv(args.path)
+
+
+if __name__ == "__main__":
+    main()
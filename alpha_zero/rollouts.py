@@ -0,0 +1,87 @@
+"""
+Leaf evaluation by many random playouts at once.
+
+`VectorRolloutEvaluator` replaces open_spiel's `RandomRolloutEvaluator`:
+states with `rollout_returns` (TTT and Snakes) play all `n_rollouts`
+playouts as one vectorized batch on copies of the position, other games
+fall back to scalar playouts.
+
+Usage
+=====
+    python rollouts.py --game ttt --rollouts 16   # noise and cost of one leaf value
+"""
+import argparse
+import time
+
+import numpy as np
+import pyspiel
+from open_spiel.python.algorithms import mcts
+
+
+class VectorRolloutEvaluator(mcts.RandomRolloutEvaluator):
+    """Mean returns of `n_rollouts` random playouts, played together when the state supports it."""
+
+    def __init__(self, n_rollouts: int = 16, random_state=None, max_length: int = None) -> None:
+        super().__init__(n_rollouts, random_state, max_length)
+
+    def evaluate(self, state):
+        if self.max_length is None and hasattr(state, "rollout_returns"):
+            return state.rollout_returns(self.n_rollouts, self._random_state).mean(axis=0)
+        return super().evaluate(state)
+
+
+################################################################################
+##                            BENCHMARK
+################################################################################
+
+def _positions(game, count: int, rng) -> list:
+    positions = []
+    while len(positions) < count:
+        state = game.new_initial_state()
+        for _ in range(rng.randint(0, game.max_game_length() // 2)):
+            if state.is_terminal():
+                break
+            state.apply_action(rng.choice(state.legal_actions()))
+        if not state.is_terminal():
+            positions.append(state)
+    return positions
+
+
+def leaf_noise(game, evaluator, positions, repeats: int) -> tuple[float, float]:
+    """Return (mean std of the value of player 0 over `repeats` evaluations, seconds per evaluation)."""
+    stds = []
+    start = time.perf_counter()
+    for state in positions:
+        values = [evaluator.evaluate(state)[0] for _ in range(repeats)]
+        stds.append(np.std(values))
+    seconds = (time.perf_counter() - start) / (len(positions) * repeats)
+    return float(np.mean(stds)), seconds
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--game", type=str, default="ttt", metavar="NAME", help="Registered pyspiel game")
+    parser.add_argument("--rollouts", type=int, nargs="+", default=[4, 16, 64], metavar="K", help="Playouts per leaf")
+    parser.add_argument("--positions", type=int, default=20, metavar="N", help="Number of evaluated positions")
+    parser.add_argument("--repeats", type=int, default=50, metavar="N", help="Evaluations of every position")
+    parser.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of positions and playouts")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    import games  # registers the games
+
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    game = pyspiel.load_game(args.game)
+    rng = np.random.RandomState(args.seed)
+    positions = _positions(game, args.positions, rng)
+
+    evaluators = [("scalar x1", mcts.RandomRolloutEvaluator(1, rng))]
+    evaluators += [(f"vector x{k}", VectorRolloutEvaluator(k, rng)) for k in args.rollouts]
+    for name, evaluator in evaluators:
+        std, seconds = leaf_noise(game, evaluator, positions, args.repeats)
+        print(f"{name:>10}: value std {std:.3f}, {seconds * 1e6:8.1f} us per leaf")
+
+
+if __name__ == "__main__":
+    main()
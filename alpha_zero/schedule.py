@@ -0,0 +1,288 @@
+"""
+Local scheduler of experiment jobs (trainings, evaluations, ...).
+
+Jobs are commands with the CPUs and memory they need and the jobs they
+have to wait for. Every job whose dependencies finished is started as
+soon as its CPUs and memory are free (jobs with the longest chain of
+dependents first), so independent jobs run side by side without
+oversubscribing the machine. Failed jobs are retried, jobs depending on
+a job which failed for good are skipped. The wall time of every job is
+written to a report.
+
+The experiments file is JSON, commands run in its folder:
+
+    {
+      "dirs": ["eval/ttt"],
+      "jobs": [
+        {"name": "train-ttt", "cmd": ["python", "train.py", "--ttt"], "cpus": 7, "memory_mb": 4000},
+        {"name": "eval-ttt", "cmd": ["python", "evaluate.py", "--ttt"], "after": ["train-ttt"]}
+      ]
+    }
+
+Usage
+=====
+    python schedule.py experiments.json --dry-run
+    python schedule.py experiments.json --cpus 16 --retries 2 --report eval/schedule.csv
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+@dataclass
+class Job:
+    name: str
+    cmd: list
+    cpus: int = 1
+    memory_mb: int = 1000
+    after: list = field(default_factory=list)
+    cwd: str = None
+    env: dict = None
+
+
+@dataclass
+class JobResult:
+    name: str
+    status: str = "pending"  # pending, running, done, failed, skipped
+    attempts: int = 0
+    returncode: int = None
+    seconds: float = None  # wall time of the last attempt
+    started: float = None  # seconds since the start of the schedule
+    log: str = None
+
+
+################################################################################
+##                            EXPERIMENTS
+################################################################################
+
+def load_experiments(path: str, create_dirs: bool = True) -> list[Job]:
+    """Read jobs from an experiments file and create its `dirs`, relative folders are relative to the file."""
+    with open(path, "r") as f:
+        spec = json.load(f)
+    root = os.path.dirname(os.path.abspath(path))
+    for d in spec.get("dirs", []) if create_dirs else []:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    jobs = []
+    for job in spec["jobs"]:
+        job = Job(**job)
+        job.cwd = os.path.join(root, job.cwd or "")
+        jobs.append(job)
+    return jobs
+
+
+def depths(jobs: list[Job]) -> dict:
+    """
+    Length of the longest chain of jobs depending on each job (0 for no dependents).
+
+    Raises `ValueError` for duplicate names, unknown dependencies and cycles.
+    """
+    by_name = {}
+    for job in jobs:
+        if job.name in by_name:
+            raise ValueError(f"Duplicate job {job.name}")
+        by_name[job.name] = job
+    dependents = { name: [] for name in by_name }
+    for job in jobs:
+        for dep in job.after:
+            if dep not in by_name:
+                raise ValueError(f"Job {job.name} depends on unknown job {dep}")
+            dependents[dep].append(job.name)
+
+    result, visiting = {}, set()
+
+    def depth(name):
+        if name in result:
+            return result[name]
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through {name}")
+        visiting.add(name)
+        result[name] = max((1 + depth(d) for d in dependents[name]), default=0)
+        return result[name]
+
+    for name in by_name:
+        depth(name)
+    return result
+
+
+def total_memory_mb() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2**20
+
+
+################################################################################
+##                            SCHEDULER
+################################################################################
+
+class Scheduler:
+    """
+    Run jobs respecting dependencies and resource limits.
+
+    Arguments
+    =========
+        jobs: jobs to run
+        cpus: CPUs available to the jobs (a job needing more runs alone)
+        memory_mb: memory available to the jobs
+        retries: how many times a failed job is run again
+        log_dir: folder for the output of every attempt, None to inherit the terminal
+        poll: seconds between checks of running jobs
+    """
+
+    def __init__(self, jobs: list[Job], cpus: int = None, memory_mb: int = None, retries: int = 1,
+                 log_dir: str = None, poll: float = 0.5) -> None:
+        self.jobs = { job.name: job for job in jobs }
+        self.priority = depths(jobs)
+        self.cpus = cpus or os.cpu_count()
+        self.memory_mb = memory_mb or total_memory_mb()
+        self.retries = retries
+        self.log_dir = log_dir
+        self.poll = poll
+        self.results = { name: JobResult(name) for name in self.jobs }
+        self._running = {}  # name -> (process, log file, start time)
+        self._start = None
+
+    def _needs(self, job: Job) -> tuple[int, int]:
+        return min(job.cpus, self.cpus), min(job.memory_mb, self.memory_mb)
+
+    def _free(self) -> tuple[int, int]:
+        cpus, memory = self.cpus, self.memory_mb
+        for name in self._running:
+            job_cpus, job_memory = self._needs(self.jobs[name])
+            cpus, memory = cpus - job_cpus, memory - job_memory
+        return cpus, memory
+
+    def _ready(self) -> list[Job]:
+        ready = [
+            job for name, job in self.jobs.items()
+            if self.results[name].status == "pending" and all(self.results[d].status == "done" for d in job.after)
+        ]
+        return sorted(ready, key=lambda job: -self.priority[job.name])
+
+    def _launch(self, job: Job) -> None:
+        result = self.results[job.name]
+        result.attempts += 1
+        result.status = "running"
+        result.started = time.perf_counter() - self._start
+        log = None
+        if self.log_dir is not None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            result.log = os.path.join(self.log_dir, f"{job.name}.{result.attempts}.log")
+            log = open(result.log, "w")
+        env = None if job.env is None else os.environ | { k: str(v) for k, v in job.env.items() }
+        cmd = job.cmd if isinstance(job.cmd, list) else ["bash", "-c", job.cmd]
+        process = subprocess.Popen(cmd, cwd=job.cwd, env=env, stdout=log, stderr=subprocess.STDOUT if log else None)
+        self._running[job.name] = (process, log, time.perf_counter())
+        print(f"[{result.started:8.1f} s] start {job.name} (attempt {result.attempts})")
+
+    def _collect(self) -> None:
+        for name, (process, log, start) in list(self._running.items()):
+            if process.poll() is None:
+                continue
+            del self._running[name]
+            if log is not None:
+                log.close()
+            result = self.results[name]
+            result.returncode = process.returncode
+            result.seconds = time.perf_counter() - start
+            if process.returncode == 0:
+                result.status = "done"
+            elif result.attempts <= self.retries:
+                result.status = "pending"
+            else:
+                result.status = "failed"
+                self._skip_dependents(name)
+            print(f"[{time.perf_counter() - self._start:8.1f} s] {name}: exit {process.returncode} after {result.seconds:.1f} s")
+
+    def _skip_dependents(self, name: str) -> None:
+        for job in self.jobs.values():
+            if name in job.after and self.results[job.name].status == "pending":
+                self.results[job.name].status = "skipped"
+                self._skip_dependents(job.name)
+
+    def run(self) -> dict:
+        """Run all jobs, return { name: `JobResult` }."""
+        self._start = time.perf_counter()
+        try:
+            while True:
+                self._collect()
+                cpus, memory = self._free()
+                for job in self._ready():
+                    job_cpus, job_memory = self._needs(job)
+                    if job_cpus <= cpus and job_memory <= memory:
+                        self._launch(job)
+                        cpus, memory = cpus - job_cpus, memory - job_memory
+                if not self._running:
+                    if not self._ready():
+                        break
+                    continue
+                time.sleep(self.poll)
+        finally:
+            for process, log, _ in self._running.values():
+                process.terminate()
+                process.wait()
+                if log is not None:
+                    log.close()
+        self.seconds = time.perf_counter() - self._start
+        return self.results
+
+    def report(self) -> pd.DataFrame:
+        return pd.DataFrame([vars(r) for r in self.results.values()])
+
+
+def plan(jobs: list[Job]) -> list[list[str]]:
+    """Jobs grouped into waves which could run at once with unlimited resources."""
+    done, waves = set(), []
+    while len(done) < len(jobs):
+        wave = [job.name for job in jobs if job.name not in done and all(d in done for d in job.after)]
+        waves.append(wave)
+        done.update(wave)
+    return waves
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("experiments", type=str, metavar="FILE", help="Experiments .json file")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count(), metavar="N", help="CPUs available to the jobs")
+    parser.add_argument("--memory-mb", type=int, default=total_memory_mb(), metavar="N", help="Memory available to the jobs")
+    parser.add_argument("--retries", type=int, default=1, metavar="N", help="Runs of a failed job after the first one")
+    parser.add_argument("--log-dir", type=str, default="schedule-logs", metavar="DIR", help="Output of the jobs")
+    parser.add_argument("--report", type=str, default="schedule.csv", metavar="FILE", help="Where to save wall times of the jobs")
+    parser.add_argument("--only", type=str, nargs="+", default=None, metavar="NAME", help="Run only these jobs (and what they need)")
+    parser.add_argument("--dry-run", action="store_true", default=False, help="Only print the dependency waves")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    jobs = load_experiments(args.experiments, create_dirs=not args.dry_run)
+    depths(jobs)  # validates the graph
+
+    if args.only:
+        by_name, needed, todo = { job.name: job for job in jobs }, set(), list(args.only)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo += by_name[name].after
+        jobs = [job for job in jobs if job.name in needed]
+
+    if args.dry_run:
+        for i, wave in enumerate(plan(jobs)):
+            print(f"wave {i}: {', '.join(wave)}")
+        return
+
+    scheduler = Scheduler(jobs, args.cpus, args.memory_mb, args.retries, args.log_dir)
+    scheduler.run()
+    df = scheduler.report()
+    print(df)
+    df.to_csv(args.report)
+    sequential = df["seconds"].sum()
+    print(f"{scheduler.seconds:.1f} s wall time, {sequential:.1f} s of jobs run one after another")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+MCTS variants on top of open_spiel's `MCTSBot`.
+
+`AnytimeMCTSBot` searches for a fixed wall-clock time per move instead of
+a fixed number of simulations, and records how many simulations fitted.
+
+`ReusingMCTSBot` keeps its tree between moves: the next search starts from
+the subtree of the actions played since, with all its statistics.
+"""
+import collections
+import math
+import time
+
+import numpy as np
+import pyspiel
+from open_spiel.python.algorithms import mcts
+
+# attributes needed to rebuild a bot (see `MCTSBot.__init__`)
+_BOT_ARGS = {
+    "game": "_game",
+    "uct_c": "uct_c",
+    "max_simulations": "max_simulations",
+    "evaluator": "evaluator",
+    "solve": "solve",
+    "random_state": "_random_state",
+    "child_selection_fn": "_child_selection_fn",
+    "dirichlet_noise": "_dirichlet_noise",
+    "verbose": "verbose",
+    "dont_return_chance_node": "dont_return_chance_node",
+}
+
+
+def bot_kwargs(bot: mcts.MCTSBot) -> dict:
+    """Return constructor arguments which recreate `bot`."""
+    return {arg: getattr(bot, attr) for arg, attr in _BOT_ARGS.items()}
+
+
+class AnytimeMCTSBot(mcts.MCTSBot):
+    """
+    MCTS which searches until the time budget of a move runs out.
+
+    Arguments
+    =========
+        time_budget: seconds per move
+        min_simulations: simulations done even if out of time
+        max_simulations: upper bound on simulations (None for no bound)
+        other arguments as `MCTSBot`
+    """
+
+    def __init__(self, game, uct_c, max_simulations, evaluator, time_budget: float,
+                 min_simulations: int = 1, **kwargs) -> None:
+        super().__init__(game, uct_c, max_simulations or np.iinfo(np.int64).max, evaluator, **kwargs)
+        self.time_budget = time_budget
+        self.min_simulations = min_simulations
+        self.simulations = []  # achieved simulations of every searched move
+        self._cancel = None
+
+    @classmethod
+    def from_bot(cls, bot: mcts.MCTSBot, time_budget: float, max_simulations: int = None, **kwargs):
+        """Create an anytime bot with the same game, evaluator and settings as `bot`."""
+        args = bot_kwargs(bot)
+        args["max_simulations"] = max_simulations
+        return cls(**args, time_budget=time_budget, **kwargs)
+
+    def step(self, state, cancel=None):
+        """As `MCTSBot.step`, `cancel` (`threading.Event`) stops the search early."""
+        self._cancel = cancel
+        try:
+            return self.step_with_policy(state)[1]
+        finally:
+            self._cancel = None
+
+    def _backpropagate(self, visit_path, returns, solved) -> None:
+        # same as the backup of `MCTSBot.mcts_search`
+        while visit_path:
+            # For chance nodes, walk up the tree to find the decision-maker.
+            decision_node_idx = -1
+            while visit_path[decision_node_idx].player == pyspiel.PlayerId.CHANCE:
+                decision_node_idx -= 1
+            target_return = returns[visit_path[decision_node_idx].player]
+            node = visit_path.pop()
+            node.total_reward += target_return
+            node.explore_count += 1
+
+            if solved and node.children:
+                player = node.children[0].player
+                if player == pyspiel.PlayerId.CHANCE:
+                    # Only back up chance nodes if all have the same outcome.
+                    outcome = node.children[0].outcome
+                    if outcome is not None and all(np.array_equal(c.outcome, outcome) for c in node.children):
+                        node.outcome = outcome
+                    else:
+                        solved = False
+                else:
+                    # If any have max utility (won?), or all children are solved,
+                    # choose the one best for the player choosing.
+                    best = None
+                    all_solved = True
+                    for child in node.children:
+                        if child.outcome is None:
+                            all_solved = False
+                        elif best is None or child.outcome[player] > best.outcome[player]:
+                            best = child
+                    if best is not None and (all_solved or best.outcome[player] == self.max_utility):
+                        node.outcome = best.outcome
+                    else:
+                        solved = False
+
+    def _out_of_time(self, deadline: float, done: int) -> bool:
+        if done < self.min_simulations:
+            return False
+        if self._cancel is not None and self._cancel.is_set():
+            return True
+        return time.perf_counter() >= deadline
+
+    def search_from(self, root, state, deadline: float) -> int:
+        """Run simulations from `root` (of `state`) until `deadline`, returns their count."""
+        done = 0
+        while done < self.max_simulations and not self._out_of_time(deadline, done):
+            visit_path, working_state = self._apply_tree_policy(root, state)
+            if working_state.is_terminal():
+                returns = working_state.returns()
+                visit_path[-1].outcome = returns
+                solved = self.solve
+            else:
+                returns = self.evaluator.evaluate(working_state)
+                solved = False
+            self._backpropagate(visit_path, returns, solved)
+            done += 1
+            if root.outcome is not None:
+                break
+        return done
+
+    def mcts_search(self, state):
+        deadline = time.perf_counter() + self.time_budget
+        root = mcts.SearchNode(None, state.current_player(), 1)
+        self.simulations.append(self.search_from(root, state, deadline))
+        return root
+
+
+class ReusingMCTSBot(AnytimeMCTSBot):
+    """
+    MCTS which re-roots the previous tree onto the current state.
+
+    The actions played since the last search (`state.history()`) are
+    followed down the old tree; if the state is not in it (e.g. a new game),
+    a fresh tree is built. Every search adds `max_simulations` simulations
+    (or runs for `time_budget` seconds) to the retained ones.
+
+    Arguments
+    =========
+        time_budget: seconds per move, None to only use `max_simulations`
+        max_nodes: retained nodes at most, deeper levels are pruned first
+        other arguments as `AnytimeMCTSBot`
+    """
+
+    def __init__(self, game, uct_c, max_simulations, evaluator, time_budget: float = None,
+                 max_nodes: int = 100_000, **kwargs) -> None:
+        if time_budget is None and max_simulations is None:
+            raise ValueError("Needs max_simulations or time_budget")
+        super().__init__(game, uct_c, max_simulations, evaluator, time_budget, **kwargs)
+        self.max_nodes = max_nodes
+        self.reused = []  # visits of the retained root at every searched move
+        self._root = None
+        self._history = None
+        self._num_actions = game.num_distinct_actions()
+
+    @classmethod
+    def from_bot(cls, bot: mcts.MCTSBot, time_budget: float = None, max_simulations: int = None, **kwargs):
+        """Create a reusing bot with the same settings as `bot` (and its `max_simulations` without a budget)."""
+        args = bot_kwargs(bot)
+        if time_budget is not None or max_simulations is not None:
+            args["max_simulations"] = max_simulations
+        return cls(**args, time_budget=time_budget, **kwargs)
+
+    def restart(self) -> None:
+        """Forget the retained tree."""
+        self._root = None
+        self._history = None
+
+    def _reroot(self, state):
+        history = state.history()
+        node = self._root
+        if node is None or history[:len(self._history)] != self._history:
+            return None
+        for action in history[len(self._history):]:
+            node = next((c for c in node.children if c.action == action), None)
+            if node is None:
+                return None
+        return node
+
+    def _prune(self, root) -> None:
+        # each simulation expands at most one node
+        if 1 + root.explore_count * self._num_actions <= self.max_nodes:
+            return
+        kept, queue = 1, collections.deque([root])
+        while queue:
+            node = queue.popleft()
+            if kept + len(node.children) > self.max_nodes:
+                node.children = []  # expanded again when visited
+                continue
+            kept += len(node.children)
+            queue.extend(node.children)
+
+    def mcts_search(self, state):
+        root = self._reroot(state)
+        if root is None:
+            root = mcts.SearchNode(None, state.current_player(), 1)
+        else:
+            self._prune(root)
+        self.reused.append(root.explore_count)
+
+        deadline = math.inf if self.time_budget is None else time.perf_counter() + self.time_budget
+        self.simulations.append(self.search_from(root, state, deadline))
+        self._root, self._history = root, state.history()
+        return root
@@ -0,0 +1,280 @@
+"""
+Successive-halving sweep over the hyperparameters of `train.py`.
+
+Configurations are drawn from a grid of `--lr`, `--model`, `--nn-width`,
+`--nn-depth`, `--max-simulations` and `--batch-size`. All of them train
+for `--min-steps` steps and are scored by a short evaluation against
+fixed MCTS levels, the best `1 / eta` continue from their checkpoint for
+`eta` times more steps, and so on up to `--max-steps`. Trainings and
+scorings of one rung run concurrently through `schedule.Scheduler`.
+
+The sweep can be resumed: a rung of a configuration is skipped when its
+score exists, and its training when it finished (a `done` file is written
+once `train.py` exits successfully, a killed training leaves checkpoints
+behind too).
+
+Layout
+======
+    DIR/sweep.json                 game, grid and drawn configurations
+    DIR/<config>/rung-<r>/         checkpoints and config.json of the rung
+    DIR/<config>/rung-<r>/done     the training of the rung finished
+    DIR/<config>/rung-<r>/score.json
+    DIR/results.csv                score of every configuration and rung
+
+Usage
+=====
+    python sweep.py run --game ttt --dir sweeps/ttt --configs 27 --min-steps 5 --max-steps 45 --eta 3 \\
+        --lr 0.001 0.0001 --model mlp conv2d --nn-width 64 256 --nn-depth 2 4
+    python sweep.py score --path sweeps/ttt/c000/rung-0 --levels 10 50 --games 20
+
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import shlex
+import sys
+
+import pandas as pd
+
+from schedule import Job, Scheduler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAME_FLAGS = { "ttt": "--ttt", "snakes": "--snakes", "nim": "--cards" }
+SPACE = ["lr", "model", "nn_width", "nn_depth", "max_simulations", "batch_size"]
+LATEST = -1  # number of the last checkpoint of a training (with `--checkpoint-freq` above its steps)
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+################################################################################
+##                            SCORING
+################################################################################
+
+def score_checkpoint(path: str, levels: list[int], games: int, uct_c: float = 1.4, seed: int = 0) -> dict:
+    """
+    Play the last checkpoint in `path` (run in NumPy) against MCTS with `levels` simulations.
+
+    Returns
+    =======
+        {"score": mean return, "levels": {simulations: mean return}, "games": games per level}
+    """
+    import pyspiel
+    from azero import load_mcts_bot
+
+    from evaluate import _MCTS_UNUSED_CFG, play_game  # also registers the games
+    from numpy_model import ensure_exported, load_numpy_bot
+
+    with open(os.path.join(path, "config.json"), "r") as f:
+        cfg = json.load(f)
+    random.seed(seed)
+    game = pyspiel.load_game(cfg["game"])
+    bot, _ = load_numpy_bot(cfg, ensure_exported(cfg, path, LATEST), is_eval=True)
+    by_level = {}
+    for simulations in levels:
+        mcts_cfg = dict(game=cfg["game"], uct_c=uct_c, max_simulations=simulations)
+        mcts_bot = load_mcts_bot(_MCTS_UNUSED_CFG | mcts_cfg, is_eval=True)
+        returns = []
+        for i in range(games):
+            players = [bot.step, mcts_bot.step] if i % 2 == 0 else [mcts_bot.step, bot.step]
+            state, _ = play_game(game, players)
+            returns.append(state.returns()[i % 2])
+        by_level[simulations] = sum(returns) / len(returns)
+    return dict(score=sum(by_level.values()) / len(by_level), levels=by_level, games=games)
+
+
+################################################################################
+##                            SWEEP
+################################################################################
+
+def rung_budgets(min_steps: int, max_steps: int, eta: int) -> list[int]:
+    """Total training steps after every rung, `min_steps * eta ** r` up to `max_steps`."""
+    budgets = [min_steps]
+    while budgets[-1] * eta <= max_steps:
+        budgets.append(budgets[-1] * eta)
+    return budgets
+
+
+def draw_configs(grid: dict, count: int, seed: int) -> list[dict]:
+    """Return `count` distinct configurations of the grid (all of them if there are fewer)."""
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if count < len(configs):
+        configs = random.Random(seed).sample(configs, count)
+    return configs
+
+
+class Sweep:
+    """
+    Successive halving of `train.py` configurations.
+
+    Arguments
+    =========
+        root: folder of the sweep
+        game: "ttt", "snakes" or "nim"
+        configs: { config id: train.py hyperparameters }
+        budgets: total training steps after every rung (see `rung_budgets`)
+        eta: 1 / eta of the configurations are promoted after every rung
+        levels, eval_games: scoring against MCTS (see `score_checkpoint`)
+        cpus, memory_mb, train_cpus, retries: resources of the jobs (see `schedule.Scheduler`)
+    """
+
+    def __init__(self, root: str, game: str, configs: dict, budgets: list[int], eta: int, levels: list[int],
+                 eval_games: int, cpus: int = None, memory_mb: int = None, train_cpus: int = 7,
+                 retries: int = 1) -> None:
+        self.root = os.path.abspath(root)
+        self.game = game
+        self.configs = configs
+        self.budgets = budgets
+        self.eta = eta
+        self.levels = levels
+        self.eval_games = eval_games
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+        self.train_cpus = train_cpus
+        self.retries = retries
+
+    def rung_dir(self, cid: str, rung: int) -> str:
+        return os.path.join(self.root, cid, f"rung-{rung}")
+
+    def _checkpoint(self, cid: str, rung: int) -> str:
+        return os.path.join(self.rung_dir(cid, rung), f"checkpoint-{LATEST}")
+
+    def _done(self, cid: str, rung: int) -> str:
+        return os.path.join(self.rung_dir(cid, rung), "done")
+
+    def score(self, cid: str, rung: int):
+        result = _read_json(os.path.join(self.rung_dir(cid, rung), "score.json"))
+        return None if result is None else result["score"]
+
+    def _jobs(self, cid: str, rung: int) -> list[Job]:
+        if self.score(cid, rung) is not None:
+            return []
+        path = self.rung_dir(cid, rung)
+        jobs = []
+        if not os.path.exists(self._done(cid, rung)):
+            steps = self.budgets[rung] - (self.budgets[rung - 1] if rung else 0)
+            # no numbered checkpoints, every step saves `checkpoint--1` (the last one the final weights)
+            cmd = [sys.executable, "train.py", GAME_FLAGS[self.game], "--max-steps", str(steps),
+                   "--checkpoint-freq", str(steps + 1), "--checkpoint-dir", path,
+                   "--runs-dir", os.path.join(self.root, "runs"),
+                   "--wandbproject", "sweep", "--wandbname", f"{cid}-rung-{rung}", "--offline"]
+            for name, value in self.configs[cid].items():
+                cmd += ["--" + name.replace("_", "-"), str(value)]
+            if rung:
+                cmd += ["--checkpoint", self._checkpoint(cid, rung - 1)]
+            cmd = f"{shlex.join(cmd)} && touch {shlex.quote(self._done(cid, rung))}"
+            jobs.append(Job(f"train-{cid}-{rung}", cmd, cpus=self.train_cpus, memory_mb=4000, cwd=HERE))
+        cmd = [sys.executable, "sweep.py", "score", "--path", path, "--games", str(self.eval_games),
+               "--levels", *map(str, self.levels), "--out", os.path.join(path, "score.json")]
+        jobs.append(Job(f"score-{cid}-{rung}", cmd, cpus=1, memory_mb=1500, after=[j.name for j in jobs], cwd=HERE))
+        return jobs
+
+    def run(self) -> pd.DataFrame:
+        """Run (or resume) all rungs, return the scores of all configurations and rungs."""
+        alive = list(self.configs)
+        rows = []
+        for rung, steps in enumerate(self.budgets):
+            jobs = [job for cid in alive for job in self._jobs(cid, rung)]
+            print(f"rung {rung}: {len(alive)} configurations, {steps} steps, {len(jobs)} jobs to run")
+            if jobs:
+                Scheduler(jobs, self.cpus, self.memory_mb, self.retries, os.path.join(self.root, "logs")).run()
+
+            scores = { cid: self.score(cid, rung) for cid in alive }
+            rows += [dict(config=cid, rung=rung, steps=steps, score=scores[cid], **self.configs[cid]) for cid in alive]
+            # failed configurations are dropped
+            ranked = sorted((cid for cid in alive if scores[cid] is not None), key=lambda cid: -scores[cid])
+            alive = ranked[:max(1, math.ceil(len(alive) / self.eta))]
+            if not alive:
+                break
+        return pd.DataFrame(rows)
+
+    def steps(self) -> tuple[int, int]:
+        """Return (training steps of the sweep, steps of training every configuration for the full budget)."""
+        spent = 0
+        for cid in self.configs:
+            for rung, steps in enumerate(self.budgets):
+                if os.path.exists(self._done(cid, rung)):
+                    spent += steps - (self.budgets[rung - 1] if rung else 0)
+        return spent, len(self.configs) * self.budgets[-1]
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run or resume a sweep", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    run.add_argument("--game", type=str, choices=list(GAME_FLAGS), default="ttt", help="Game to train on")
+    run.add_argument("--dir", type=str, required=True, metavar="DIR", help="Folder of the sweep")
+    run.add_argument("--configs", type=int, default=27, metavar="N", help="Configurations drawn from the grid")
+    run.add_argument("--min-steps", type=int, default=5, metavar="N", help="Training steps of the first rung")
+    run.add_argument("--max-steps", type=int, default=45, metavar="N", help="Training steps of the last rung")
+    run.add_argument("--eta", type=int, default=3, metavar="N", help="Keep 1/eta configurations, train eta times longer")
+    run.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of drawing the configurations")
+    run.add_argument("--lr", type=float, nargs="+", default=[1e-3, 1e-4], metavar="F", help="Learning rates")
+    run.add_argument("--model", type=str, nargs="+", default=["mlp", "conv2d"], choices=["mlp", "conv2d", "resnet"], help="Models")
+    run.add_argument("--nn-width", type=int, nargs="+", default=[64, 256], metavar="N", help="Hidden layer sizes")
+    run.add_argument("--nn-depth", type=int, nargs="+", default=[2, 4], metavar="N", help="Hidden layers")
+    run.add_argument("--max-simulations", type=int, nargs="+", default=[20, 50], metavar="N", help="MCTS simulations per move")
+    run.add_argument("--batch-size", type=int, nargs="+", default=[64, 256], metavar="N", help="Batch sizes")
+    run.add_argument("--levels", type=int, nargs="+", default=[10, 50], metavar="N", help="Simulations of the MCTS opponents")
+    run.add_argument("--eval-games", type=int, default=20, metavar="N", help="Scoring games per MCTS level")
+    run.add_argument("--cpus", type=int, default=None, metavar="N", help="CPUs available (default all)")
+    run.add_argument("--memory-mb", type=int, default=None, metavar="N", help="Memory available (default all)")
+    run.add_argument("--train-cpus", type=int, default=7, metavar="N", help="CPUs of one training")
+    run.add_argument("--retries", type=int, default=1, metavar="N", help="Runs of a failed job after the first one")
+
+    score = commands.add_parser("score", help="Score one checkpoint", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    score.add_argument("--path", type=str, required=True, metavar="DIR", help="Folder with config.json and checkpoints")
+    score.add_argument("--levels", type=int, nargs="+", default=[10, 50], metavar="N", help="Simulations of the MCTS opponents")
+    score.add_argument("--games", type=int, default=20, metavar="N", help="Games per MCTS level")
+    score.add_argument("--out", type=str, default=None, metavar="FILE", help="Where to write the score (.json)")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    if args.command == "score":
+        result = score_checkpoint(args.path, args.levels, args.games)
+        print(result)
+        if args.out:
+            _write_json(args.out, result)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    meta_path = os.path.join(args.dir, "sweep.json")
+    meta = _read_json(meta_path)
+    if meta is None:
+        grid = { name: getattr(args, name) for name in SPACE }
+        configs = draw_configs(grid, args.configs, args.seed)
+        meta = dict(game=args.game, grid=grid, configs={ f"c{i:03d}": c for i, c in enumerate(configs) })
+        _write_json(meta_path, meta)
+    else:
+        print(f"Resuming {meta_path} ({len(meta['configs'])} configurations of {meta['game']})")
+
+    sweep = Sweep(
+        args.dir, meta["game"], meta["configs"], rung_budgets(args.min_steps, args.max_steps, args.eta), args.eta,
+        args.levels, args.eval_games, args.cpus, args.memory_mb, args.train_cpus, args.retries,
+    )
+    df = sweep.run()
+    df.to_csv(os.path.join(args.dir, "results.csv"))
+    print(df.sort_values(["rung", "score"], ascending=False).head(10))
+    spent, exhaustive = sweep.steps()
+    print(f"{spent} training steps, {exhaustive} for training all configurations for {sweep.budgets[-1]} steps")
+
+
+if __name__ == "__main__":
+    main()
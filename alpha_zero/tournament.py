@@ -0,0 +1,325 @@
+"""
+Adaptive round-robin tournament between agents.
+
+Every pair of agents plays games (alternating who starts) until a sequential
+probability ratio test decides which of the two is stronger, or until
+`--max-games` is reached. Games are played by a pool of worker processes,
+and Bradley-Terry (Elo) ratings with confidence intervals are computed
+from all played games.
+
+Agents
+======
+    random                  uniformly random legal moves
+    mcts:N                  MCTS with random rollouts and N simulations
+    trained:DIR:CHECKPOINT  trained bot, DIR holds `config.json` and checkpoints
+    numpy:FILE              exported `.npz` model, `config.json` next to it
+
+With `--inference-server`, all workers evaluate each `numpy` agent through
+one batching server process instead of loading the model themselves.
+
+Usage
+=====
+    python tournament.py --ttt --agents random mcts:10 mcts:50 trained:ttt-mlp-big-50:-1 \\
+        --workers 4 --path eval/ttt/tournament.csv
+
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+from dataclasses import dataclass
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2' # disable tf logs and warnings
+
+import numpy as np
+import pandas as pd
+
+from evaluate import RANDOM_PLAYER, _MCTS_UNUSED_CFG, load_game, play_game
+
+
+@dataclass
+class Game:
+    first: str
+    second: str
+    result_from_first: int
+    moves: list
+
+
+################################################################################
+##                            AGENTS
+################################################################################
+
+def load_agent(spec: str, game_name: str, mcts_rate: float, server=None):
+    """Create a function mapping a state to an action from agent `spec`."""
+    kind, *params = spec.split(":")
+    if kind == "random":
+        return RANDOM_PLAYER
+    if kind == "mcts":
+        from azero import load_mcts_bot
+
+        (simuls,) = params
+        mcts_cfg = dict(game=game_name, uct_c=mcts_rate, max_simulations=int(simuls))
+        return load_mcts_bot(_MCTS_UNUSED_CFG | mcts_cfg, is_eval=True).step
+    if kind == "trained":
+        from azero import load_trained_bot
+
+        path, checkpoint = params
+        with open(os.path.join(path, "config.json"), "r") as f:
+            cfg = json.load(f)
+        bot, _ = load_trained_bot(cfg, path, int(checkpoint), is_eval=True)
+        return bot.step
+    if kind == "numpy":
+        from numpy_model import load_numpy_bot
+
+        (path,) = params
+        with open(os.path.join(os.path.dirname(path), "config.json"), "r") as f:
+            cfg = json.load(f)
+        bot, _ = load_numpy_bot(cfg, path if server is None else server.connect(), is_eval=True)
+        return bot.step
+    raise ValueError(f"Unknown agent {spec=}")
+
+
+_worker = {}
+
+
+def _init_worker(args, servers):
+    game, game_name = load_game(args)
+    _worker.update(game=game, game_name=game_name, mcts_rate=args.mcts_rate, agents={}, servers=servers)
+
+
+def _play(task):
+    first, second, seed = task
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    agents = _worker["agents"]
+    for spec in (first, second):
+        if spec not in agents:
+            agents[spec] = load_agent(spec, _worker["game_name"], _worker["mcts_rate"], _worker["servers"].get(spec))
+    state, actions = play_game(_worker["game"], [agents[first], agents[second]])
+    return Game(first, second, int(np.sign(state.returns()[0])), actions)
+
+
+################################################################################
+##                            STATISTICS
+################################################################################
+
+def _expected_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """
+    Log-likelihood ratio of H1 (Elo difference `elo1`) against H0 (`elo0`).
+
+    Draws count as half a win and half a loss.
+    """
+    s0, s1 = _expected_score(elo0), _expected_score(elo1)
+    win = math.log(s1 / s0)
+    loss = math.log((1 - s1) / (1 - s0))
+    return wins * win + losses * loss + draws * (win + loss) / 2
+
+
+def bradley_terry(names: list, games: list, iterations: int = 1000, tol: float = 1e-9):
+    """
+    Fit Bradley-Terry strengths to the played games.
+
+    Draws count as half a win for both sides. One virtual draw is added to
+    every played pairing so that unbeaten agents get a finite rating.
+
+    Returns
+    =======
+        DataFrame with Elo ratings (mean zero), their standard errors and
+        95% confidence intervals
+    """
+    idx = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    wins = np.zeros((n, n))
+    for g in games:
+        a, b = idx[g.first], idx[g.second]
+        score = (g.result_from_first + 1) / 2
+        wins[a, b] += score
+        wins[b, a] += 1 - score
+    played = wins + wins.T
+    prior = (played > 0) * 0.5
+    wins, played = wins + prior, played + 2 * prior
+
+    gamma = np.ones(n)
+    for _ in range(iterations):
+        denom = (played / (gamma[:, None] + gamma[None, :])).sum(axis=1)
+        new = np.where(denom > 0, wins.sum(axis=1) / np.maximum(denom, 1e-12), gamma)
+        new /= np.exp(np.log(new).mean())
+        if np.max(np.abs(new - gamma)) < tol:
+            gamma = new
+            break
+        gamma = new
+
+    # observed Fisher information of the log-likelihood (natural log scale)
+    p = gamma[:, None] / (gamma[:, None] + gamma[None, :])
+    info = played * p * p.T
+    hessian = np.diag(info.sum(axis=1)) - info
+    cov = np.linalg.pinv(hessian)
+    scale = 400 / math.log(10)
+    elo = np.log(gamma) * scale
+    stderr = np.sqrt(np.maximum(np.diag(cov), 0)) * scale
+    return pd.DataFrame({
+        "agent": names,
+        "elo": elo,
+        "stderr": stderr,
+        "ci_low": elo - 1.96 * stderr,
+        "ci_high": elo + 1.96 * stderr,
+        "games": played.sum(axis=1) - 2 * prior.sum(axis=1),
+    }).sort_values("elo", ascending=False)
+
+
+class Pairing:
+    """Sequential test whether agent `a` is stronger than agent `b`."""
+
+    def __init__(self, a: str, b: str, elo: float, alpha: float, beta: float, max_games: int) -> None:
+        self.a = a
+        self.b = b
+        self.elo = elo
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.max_games = max_games
+        self.wdl = [0, 0, 0]
+        self.pending = 0
+
+    @property
+    def played(self) -> int:
+        return sum(self.wdl)
+
+    @property
+    def llr(self) -> float:
+        return sprt_llr(*self.wdl, -self.elo, self.elo)
+
+    @property
+    def decided(self) -> bool:
+        return not self.lower < self.llr < self.upper or self.played >= self.max_games
+
+    def add(self, game: Game) -> None:
+        result = game.result_from_first if game.first == self.a else -game.result_from_first
+        self.wdl[1 - result] += 1
+        self.pending -= 1
+
+    def verdict(self) -> str:
+        if self.llr >= self.upper:
+            return f"{self.a} > {self.b}"
+        if self.llr <= self.lower:
+            return f"{self.b} > {self.a}"
+        return "undecided"
+
+
+################################################################################
+##                            PARSER
+################################################################################
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument("--path", type=str, metavar="PATH", help="Where to save played games (.csv)")
+    parser.add_argument("--ratings", type=str, default=None, metavar="PATH", help="Where to save the ratings (.csv)")
+
+    game = parser.add_mutually_exclusive_group()
+    game.add_argument("--ttt", action='store_true', help="Tic-Tac-Toe", default=False)
+    game.add_argument("--snakes", action='store_true', help="Multiplayer Snakes", default=False)
+    game.add_argument("--cards", action='store_true', help="Cards", default=False)
+
+    parser.add_argument("--agents", type=str, nargs="+", required=True, metavar="SPEC", help="Agents to compare (see module docs)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), metavar="N", help="Number of worker processes")
+    parser.add_argument("--batch", type=int, default=4, metavar="N", help="Max games of a pairing played at once")
+    parser.add_argument("--max-games", type=int, default=300, metavar="N", help="Max games per pairing")
+    parser.add_argument("--elo", type=float, default=50, metavar="F", help="SPRT tests elo difference -F against +F")
+    parser.add_argument("--alpha", type=float, default=0.05, metavar="F", help="SPRT type I error")
+    parser.add_argument("--beta", type=float, default=0.05, metavar="F", help="SPRT type II error")
+    parser.add_argument("--mcts-rate", type=float, default=1.4, metavar="F", help="MCTS exploration constant")
+    parser.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of the first game")
+    parser.add_argument("--inference-server", action='store_true', help="Serve numpy agents from one batching process", default=False)
+    parser.add_argument("--max-batch", type=int, default=64, metavar="N", help="Max rows per forward pass of the server")
+    parser.add_argument("--max-wait", type=float, default=0.002, metavar="S", help="Max seconds the server waits to fill a batch")
+
+    return parser
+
+
+################################################################################
+##                            MAIN
+################################################################################
+
+def run_tournament(args) -> tuple[list, list]:
+    pairings = [
+        Pairing(a, b, args.elo, args.alpha, args.beta, args.max_games)
+        for a, b in itertools.combinations(args.agents, 2)
+    ]
+    games: list[Game] = []
+    seeds = itertools.count(args.seed)
+
+    def schedule(pool, results):
+        # keep every worker busy, at most `batch` games of a pairing at once,
+        # pairings with the fewest games first
+        while sum(p.pending for p in pairings) < args.workers:
+            open_ = [
+                p for p in pairings
+                if not p.decided and p.pending < args.batch and p.played + p.pending < p.max_games
+            ]
+            if not open_:
+                break
+            p = min(open_, key=lambda p: p.played + p.pending)
+            first, second = (p.a, p.b) if (p.played + p.pending) % 2 == 0 else (p.b, p.a)
+            pool.apply_async(_play, ((first, second, next(seeds)),), callback=results.put, error_callback=results.put)
+            p.pending += 1
+
+    servers = {}
+    if args.inference_server:
+        from inference_server import InferenceServer
+
+        for spec in args.agents:
+            if spec.startswith("numpy:"):
+                servers[spec] = InferenceServer(spec.split(":", 1)[1], args.workers, args.max_batch, args.max_wait)
+                servers[spec].start()
+
+    try:
+        with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(args, servers)) as pool:
+            results = queue.Queue()
+            schedule(pool, results)
+            while any(p.pending for p in pairings):
+                game = results.get()
+                if isinstance(game, BaseException):
+                    raise game
+                games.append(game)
+                pairing = next(p for p in pairings if {p.a, p.b} == {game.first, game.second})
+                was_decided = pairing.decided
+                pairing.add(game)
+                if pairing.decided and not was_decided:
+                    print(f"played {len(games)} games, {pairing.a} vs {pairing.b}: {pairing.verdict()}, "
+                          f"{sum(not p.decided for p in pairings)} pairings open")
+                schedule(pool, results)
+    finally:
+        for spec, server in servers.items():
+            print(f"{spec} inference server: {server.stats}")
+            server.stop()
+
+    return games, pairings
+
+
+def main(arguments=None, namespace=None):
+    parser = make_parser()
+    args = parser.parse_args(args=arguments, namespace=namespace)
+
+    games, pairings = run_tournament(args)
+    for p in pairings:
+        w, d, l = p.wdl
+        print(f"{p.a} vs {p.b}: +{w} ={d} -{l} (llr={p.llr:.2f}) {p.verdict()}")
+
+    ratings = bradley_terry(args.agents, games)
+    print(ratings)
+    if args.ratings:
+        ratings.to_csv(args.ratings, index=False)
+    if args.path:
+        pd.DataFrame([vars(g) for g in games]).to_csv(args.path)
+
+
+if __name__ == "__main__":
+    main()
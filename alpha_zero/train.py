@@ -1,4 +1,5 @@
 import argparse
+import contextlib
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2' # disable tf logs and warnings
 
@@ -26,8 +27,18 @@ def make_parser():
     parser.add_argument("--nn-width", type=int, default=256, metavar="N", help="Hidden layer size")
     parser.add_argument("--nn-depth", type=int, default=3, metavar="N", help="Number of hidden layers in torso")
 
+    parser.add_argument("--trajectory-dir", type=str, default=None, metavar="DIR", help="Stream self-play trajectories to this folder")
+    parser.add_argument("--warm-start", type=str, default=None, metavar="DIR", help="Prefill replay buffer from trajectories stored in this folder")
+    parser.add_argument("--warm-start-size", type=int, default=None, metavar="N", help="Max samples to prefill (default: replay buffer size)")
+
+    parser.add_argument("--inference-server", action='store_true', help="Evaluate the networks of actors and evaluators in one batching process", default=False)
+    parser.add_argument("--max-batch", type=int, default=64, metavar="N", help="Max rows per forward pass of the server")
+    parser.add_argument("--max-wait", type=float, default=0.002, metavar="S", help="Max seconds the server waits to fill a batch")
+
     parser.add_argument("--wandbproject", type=str, default="test", metavar="STR", help="wandb project name")
     parser.add_argument("--wandbname", type=str, default=None, metavar="STR", help="Run name")
+    parser.add_argument("--runs-dir", type=str, default="./runs", metavar="DIR", help="Folder with local copies of runs (metrics and files)")
+    parser.add_argument("--offline", action='store_true', help="Do not contact W&B, push later with `metrics.py sync`", default=False)
     return parser
 
 
@@ -50,7 +61,9 @@ config = dict(
 
 def main():
     import azero
-    import wandb
+    from inference_server import serve_azero
+    from metrics import Run, patch_wandb
+    from trajectories import TrajectoryWriter, replay_buffer_hooks
 
     parser = make_parser()
     args = parser.parse_args()
@@ -68,7 +81,8 @@ def main():
     cfg["nn_depth"] = args.nn_depth
     cfg["uct_c"] = args.uct_c
 
-    wandb.init(config=cfg, project=args.wandbproject, name=args.wandbname)
+    run = Run(args.runs_dir, args.wandbproject, args.wandbname, cfg, upstream=not args.offline)
+    print(f"Run {run.id} stored in {run.dir}")
     if args.ttt:
         from games import TTT_NAME  # it registers the game
         cfg["game"] = TTT_NAME
@@ -81,12 +95,13 @@ def main():
         raise ValueError("Must provide which game to train on")
 
     print(f"\n\nconfig={cfg}\n\n")
-    with azero.spawn.main_handler():
-        azero.alpha_zero(azero.Config(**cfg), is_win_loose=True, checkpoint=args.checkpoint)
-
-    for _ in range(2): # first one symlinks to W&B directory, second saves now
-        wandb.save(os.path.join(args.checkpoint_dir, "*"))
-    wandb.finish()
+    writer = TrajectoryWriter(args.trajectory_dir) if args.trajectory_dir else None
+    az_config = azero.Config(**cfg)
+    server = serve_azero(az_config, args.max_batch, args.max_wait) if args.inference_server else contextlib.nullcontext()
+    with run, patch_wandb(run):
+        with azero.spawn.main_handler(), replay_buffer_hooks(writer, args.warm_start, args.warm_start_size), server:
+            azero.alpha_zero(az_config, is_win_loose=True, checkpoint=args.checkpoint)
+        run.save(os.path.join(args.checkpoint_dir, "*"))
 
 
 if __name__ == "__main__":
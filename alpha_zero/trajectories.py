@@ -0,0 +1,270 @@
+"""
+On-disk store of self-play trajectories.
+
+Samples which `azero` pushes into its in-memory replay buffer are streamed
+into sharded, append-only `.npy` files. Shards are memory-mappable, so the
+stored data can be reused to warm-start a new run (possibly with different
+network architecture) or to train purely from replay.
+
+Layout
+======
+    DIR/index.json                     shapes, dtypes and list of shards
+    DIR/shard-00000.observation.npy
+    DIR/shard-00000.legals_mask.npy
+    DIR/shard-00000.policy.npy
+    DIR/shard-00000.value.npy
+    DIR/shard-00000.trajectory.npy     id of the trajectory of each sample
+
+Shards are never rewritten: a new writer opened on an existing folder
+continues with a fresh shard. Only the first `size` rows (see `index.json`)
+of each shard are valid.
+
+"""
+import contextlib
+import json
+import os
+import sys
+
+import numpy as np
+
+FIELDS = ("observation", "legals_mask", "policy", "value")
+_DTYPES = {
+    "observation": np.float32,
+    "legals_mask": np.bool_,
+    "policy": np.float32,
+    "value": np.float32,
+    "trajectory": np.int64,
+}
+_INDEX = "index.json"
+
+
+def _load_index(path: str) -> dict:
+    index_path = os.path.join(path, _INDEX)
+    if not os.path.exists(index_path):
+        return {"shapes": None, "trajectories": 0, "shards": []}
+    with open(index_path, "r") as f:
+        return json.load(f)
+
+
+def _shard_file(path: str, shard: str, field: str) -> str:
+    return os.path.join(path, f"{shard}.{field}.npy")
+
+
+class TrajectoryWriter:
+    """
+    Append trajectories to sharded `.npy` files.
+
+    Arguments
+    =========
+        path: folder to write to (created if missing)
+        shard_size: number of samples per shard
+        flush_every: write the index after this many trajectories
+    """
+
+    def __init__(self, path: str, shard_size: int = 2**14, flush_every: int = 16) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.shard_size = shard_size
+        self.flush_every = flush_every
+        self._index = _load_index(path)
+        self._shard = None
+        self._fill = 0
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(s["size"] for s in self._index["shards"])
+
+    def _open_shard(self) -> None:
+        self._close_shard()
+        name = f"shard-{len(self._index['shards']):05d}"
+        shapes = self._index["shapes"]
+        self._shard = {
+            field: np.lib.format.open_memmap(
+                _shard_file(self.path, name, field),
+                mode="w+",
+                dtype=_DTYPES[field],
+                shape=(self.shard_size, *shapes.get(field, [])),
+            )
+            for field in _DTYPES
+        }
+        self._fill = 0
+        self._index["shards"].append({"name": name, "size": 0})
+
+    def _close_shard(self) -> None:
+        if self._shard is not None:
+            for arr in self._shard.values():
+                arr.flush()
+            self._shard = None
+
+    def append(self, observations, legals_masks, policies, values) -> None:
+        """
+        Store one trajectory.
+
+        Arguments
+        =========
+            observations: (T, obs_size) observation tensors
+            legals_masks: (T, num_actions) legal action masks
+            policies: (T, num_actions) MCTS policy targets
+            values: (T,) value targets
+        """
+        arrays = {
+            field: np.asarray(x, dtype=_DTYPES[field])
+            for field, x in zip(FIELDS, [observations, legals_masks, policies, values])
+        }
+        if self._index["shapes"] is None:
+            self._index["shapes"] = {f: list(a.shape[1:]) for f, a in arrays.items()}
+
+        count = len(arrays["value"])
+        start = 0
+        while start < count:
+            if self._shard is None or self._fill == self.shard_size:
+                self._open_shard()
+            take = min(count - start, self.shard_size - self._fill)
+            rows = slice(self._fill, self._fill + take)
+            for field, arr in arrays.items():
+                self._shard[field][rows] = arr[start:start + take]
+            self._shard["trajectory"][rows] = self._index["trajectories"]
+            self._fill += take
+            self._index["shards"][-1]["size"] = self._fill
+            start += take
+
+        self._index["trajectories"] += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Flush the open shard and atomically rewrite the index."""
+        if self._shard is not None:
+            for arr in self._shard.values():
+                arr.flush()
+        tmp = os.path.join(self.path, _INDEX + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, os.path.join(self.path, _INDEX))
+        self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._close_shard()
+
+
+class TrajectoryReader:
+    """
+    Read-only, memory-mapped view of a folder written by `TrajectoryWriter`.
+
+    Samples are addressed by a global index over all shards.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        index = _load_index(path)
+        if index["shapes"] is None:
+            raise ValueError(f"No trajectories stored in {path=}")
+        self.shapes = {f: tuple(s) for f, s in index["shapes"].items()}
+        self.num_trajectories = index["trajectories"]
+        self._shards = [
+            {
+                field: np.load(_shard_file(path, s["name"], field), mmap_mode="r")[:s["size"]]
+                for field in _DTYPES
+            }
+            for s in index["shards"] if s["size"] > 0
+        ]
+        sizes = [len(s["value"]) for s in self._shards]
+        self._offsets = np.cumsum([0] + sizes)
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def __getitem__(self, indices) -> dict:
+        """Gather samples (by global index) into a dict of arrays."""
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = np.searchsorted(self._offsets, indices, side="right") - 1
+        out = {
+            field: np.empty((*indices.shape, *self.shapes.get(field, ())), dtype=dtype)
+            for field, dtype in _DTYPES.items()
+        }
+        for shard_id in np.unique(shard_ids):
+            where = shard_ids == shard_id
+            local = indices[where] - self._offsets[shard_id]
+            for field, arr in self._shards[shard_id].items():
+                out[field][where] = arr[local]
+        return out
+
+    def sample(self, count: int, rng=None) -> dict:
+        """Uniformly sample `count` samples without replacement."""
+        rng = rng or np.random.default_rng()
+        return self[rng.choice(len(self), size=min(count, len(self)), replace=False)]
+
+    def tail(self, count: int) -> dict:
+        """Return the `count` most recently written samples."""
+        return self[np.arange(max(0, len(self) - count), len(self))]
+
+    def batches(self, batch_size: int, epochs: int = 1, rng=None):
+        """Yield shuffled batches for training purely from replay."""
+        rng = rng or np.random.default_rng()
+        for _ in range(epochs):
+            order = rng.permutation(len(self))
+            for start in range(0, len(order), batch_size):
+                yield self[np.sort(order[start:start + batch_size])]
+
+
+################################################################################
+##                            AZERO INTEGRATION
+################################################################################
+
+def _find_buffer_class():
+    import azero
+
+    module = sys.modules[azero.alpha_zero.__module__]
+    for owner in [module, getattr(module, "buffer_lib", None)]:
+        if owner is not None and hasattr(owner, "Buffer"):
+            return owner.Buffer
+    raise RuntimeError(f"Could not find replay buffer class in {module.__name__}")
+
+
+@contextlib.contextmanager
+def replay_buffer_hooks(writer: TrajectoryWriter = None, warm_start: str = None, warm_start_size: int = None):
+    """
+    Hook into the replay buffer of `azero` while training.
+
+    Every trajectory added to the replay buffer is also written to `writer`.
+    The first time the replay buffer receives samples, it is prefilled with
+    (at most `warm_start_size`) most recent samples stored in `warm_start`.
+
+    Arguments
+    =========
+        writer: where to stream the trajectories, or None
+        warm_start: folder with previously stored trajectories, or None
+        warm_start_size: how many samples to prefill (default: buffer size)
+    """
+    buffer_cls = _find_buffer_class()
+    original_extend = buffer_cls.extend
+
+    def extend(self, batch):
+        batch = list(batch)
+        # evaluation results share the buffer class, they hold plain floats
+        if batch and hasattr(batch[0], "observation"):
+            if warm_start is not None and not getattr(self, "_warm_started", False):
+                self._warm_started = True
+                size = warm_start_size or self.max_size
+                data = TrajectoryReader(warm_start).tail(size)
+                sample_cls = type(batch[0])
+                original_extend(self, [sample_cls(*row) for row in zip(*(data[f] for f in FIELDS))])
+            if writer is not None:
+                writer.append(*(np.array([getattr(x, f) for x in batch]) for f in FIELDS))
+        return original_extend(self, batch)
+
+    buffer_cls.extend = extend
+    try:
+        yield
+    finally:
+        buffer_cls.extend = original_extend
+        if writer is not None:
+            writer.close()
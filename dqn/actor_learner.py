@@ -0,0 +1,430 @@
+"""
+Actor/learner split of DQN training.
+
+Several actor processes play episodes with epsilon-greedy policies and
+push transitions through shared-memory rings to one learner process,
+which trains one `ArrayDQN` per player and periodically publishes the
+Q-network weights back to shared memory. Actors run the Q-network in
+NumPy, so only the learner needs TensorFlow.
+
+Usage
+=====
+    python actor_learner.py --game snakes --actors 4 --steps 200000 --config small
+
+"""
+import argparse
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+CONFIGS = {
+    'small': {
+        'name': 'DQN_small',
+        'batch_size': 32,
+        'learn_every': 10,
+        'update_target_network_every': 100,
+        'optimizer': 'adam',
+        'hidden_layers_sizes': [32, 32],
+    },
+    'medium': {
+        'name': 'DQN_medium',
+        'batch_size': 64,
+        'learn_every': 10,
+        'update_target_network_every': 100,
+        'optimizer': 'adam',
+        'hidden_layers_sizes': [256, 128, 256],
+    },
+    'large': {
+        'name': 'DQN_large',
+        'batch_size': 128,
+        'learn_every': 10,
+        'update_target_network_every': 100,
+        'optimizer': 'adam',
+        'hidden_layers_sizes': [1024, 512, 512, 512, 1024],
+    },
+}
+
+# epsilon schedule of `dqn.DQN`
+EPSILON_START = 1.0
+EPSILON_END = 0.1
+EPSILON_DECAY = int(1e6)
+
+
+def _as_array(raw, shape=None):
+    array = np.frombuffer(raw, dtype=np.float32)
+    return array if shape is None else array.reshape(shape)
+
+
+################################################################################
+##                            SHARED MEMORY
+################################################################################
+
+class SharedWeights:
+    """
+    Flat float32 copy of a MLP in shared memory, written by one process.
+
+    Readers use a sequence counter (odd while writing) instead of a lock,
+    so the learner never waits for actors.
+    """
+
+    def __init__(self, sizes: list, ctx=mp) -> None:
+        self.shapes = []
+        for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+            self.shapes += [(n_in, n_out), (n_out,)]
+        self._raw = ctx.RawArray('f', sum(int(np.prod(s)) for s in self.shapes))
+        self._version = ctx.RawValue('q', 0)
+
+    @property
+    def version(self) -> int:
+        return self._version.value
+
+    def write(self, arrays) -> None:
+        flat = _as_array(self._raw)
+        self._version.value += 1
+        offset = 0
+        for array in arrays:
+            flat[offset:offset + array.size] = array.ravel()
+            offset += array.size
+        self._version.value += 1
+
+    def read(self):
+        """Return (version, list of arrays), retrying while a write is in progress."""
+        flat = _as_array(self._raw)
+        while True:
+            version = self._version.value
+            if version % 2 == 0:
+                copy = flat.copy()
+                if self._version.value == version:
+                    break
+            time.sleep(0)
+        arrays, offset = [], 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            arrays.append(copy[offset:offset + size].reshape(shape))
+            offset += size
+        return version, arrays
+
+
+class TransitionRing:
+    """Single-producer single-consumer ring of transitions in shared memory."""
+
+    def __init__(self, capacity: int, state_size: int, num_actions: int, ctx=mp) -> None:
+        self.capacity = capacity
+        self.state_size = state_size
+        self.num_actions = num_actions
+        self._raw = {
+            'info_state': ctx.RawArray('f', capacity * state_size),
+            'next_info_state': ctx.RawArray('f', capacity * state_size),
+            'legal_actions_mask': ctx.RawArray('f', capacity * num_actions),
+            'action': ctx.RawArray('f', capacity),
+            'reward': ctx.RawArray('f', capacity),
+            'is_final_step': ctx.RawArray('f', capacity),
+            'player': ctx.RawArray('f', capacity),
+        }
+        self._head = ctx.Value('q', 0)  # written by the actor
+        self._tail = ctx.Value('q', 0)  # written by the learner
+        self._views = None
+
+    def _arrays(self):
+        # views are created lazily, in the process using them
+        if self._views is None:
+            shapes = {
+                'info_state': (self.capacity, self.state_size),
+                'next_info_state': (self.capacity, self.state_size),
+                'legal_actions_mask': (self.capacity, self.num_actions),
+            }
+            self._views = {k: _as_array(raw, shapes.get(k)) for k, raw in self._raw.items()}
+        return self._views
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+    def push(self, player, info_state, action, reward, next_info_state, is_final_step, legal_actions, stop) -> bool:
+        """Append one transition, waiting while the ring is full. Returns False if stopped."""
+        with self._head.get_lock():
+            head = self._head.value
+        while head - self._tail.value >= self.capacity:
+            if stop.is_set():
+                return False
+            time.sleep(0.001)
+        a, i = self._arrays(), head % self.capacity
+        a['player'][i] = player
+        a['info_state'][i] = info_state
+        a['action'][i] = action
+        a['reward'][i] = reward
+        a['next_info_state'][i] = next_info_state
+        a['is_final_step'][i] = is_final_step
+        a['legal_actions_mask'][i] = 0
+        a['legal_actions_mask'][i, legal_actions] = 1
+        with self._head.get_lock():  # publishes the written transition
+            self._head.value = head + 1
+        return True
+
+    def drain(self):
+        """Return all pending transitions as a dict of arrays (possibly empty)."""
+        with self._head.get_lock():
+            head = self._head.value
+        tail = self._tail.value
+        indices = np.arange(tail, head) % self.capacity
+        batch = {k: v[indices] for k, v in self._arrays().items()}
+        with self._tail.get_lock():
+            self._tail.value = head
+        return batch
+
+
+################################################################################
+##                            ACTOR
+################################################################################
+
+def _q_values(weights, info_state):
+    x = np.asarray(info_state, dtype=np.float32)
+    for i in range(0, len(weights), 2):
+        x = x @ weights[i] + weights[i + 1]
+        if i + 2 < len(weights):
+            x = np.maximum(x, 0)
+    return x
+
+
+def _actor(actor_id, game, weights, ring, env_steps, stop, seed):
+    from open_spiel.python import rl_environment
+
+    import games  # registers the games
+
+    rng = np.random.default_rng(seed)
+    env = rl_environment.Environment(game)
+    num_players = env.num_players
+    versions = [-1] * num_players
+    params = [None] * num_players
+    local_steps = 0
+
+    def push(player, prev, time_step):
+        info_state, action = prev
+        return ring.push(
+            player, info_state, action, time_step.rewards[player],
+            time_step.observations['info_state'][player], float(time_step.last()),
+            time_step.observations['legal_actions'][player], stop)
+
+    while not stop.is_set():
+        time_step = env.reset()
+        prev = [None] * num_players
+        while not time_step.last():
+            player = time_step.observations['current_player']
+            if prev[player] is not None and not push(player, prev[player], time_step):
+                return
+            if weights[player].version != versions[player]:
+                versions[player], params[player] = weights[player].read()
+
+            # epsilon-greedy as `dqn.DQN._epsilon_greedy`
+            info_state = time_step.observations['info_state'][player]
+            legal_actions = time_step.observations['legal_actions'][player]
+            decay = min(env_steps.value, EPSILON_DECAY) / EPSILON_DECAY
+            epsilon = EPSILON_END + (EPSILON_START - EPSILON_END) * (1 - decay)
+            if rng.random() < epsilon:
+                action = rng.choice(legal_actions)
+            else:
+                q = _q_values(params[player], info_state)
+                action = legal_actions[np.argmax(q[legal_actions])]
+
+            prev[player] = (info_state, action)
+            time_step = env.step([action])
+            local_steps += 1
+            if local_steps % 100 == 0:
+                with env_steps.get_lock():
+                    env_steps.value += 100
+
+        for player in range(num_players):
+            if prev[player] is not None and not push(player, prev[player], time_step):
+                return
+
+
+################################################################################
+##                            LEARNER
+################################################################################
+
+def _network_arrays(sess, agent):
+    layers = agent._q_network._layers
+    tensors = [t for layer in layers for t in (layer._weights, layer._bias)]
+    return sess.run(tensors)
+
+
+def train(game: str, cfg: dict, num_actors: int, num_steps: int, sync_every: int = 50,
+          ring_size: int = 4096, report_every: float = 10.0, eval_episodes: int = 0, seed: int = 0):
+    """
+    Train one DQN agent per player with `num_actors` actor processes.
+
+    As in `dqn.DQN`, every agent learns once per `cfg['learn_every']` of its
+    transitions. Raises `RuntimeError` if an actor process dies.
+
+    Arguments
+    =========
+        game: name of the game
+        cfg: DQN config (as in `train.py`)
+        num_actors: number of actor processes
+        num_steps: environment steps (over all actors) to train for
+        sync_every: learner updates between publishing weights to actors
+        ring_size: capacity of the transition ring of each actor
+        report_every: seconds between throughput reports
+        eval_episodes: episodes of each agent against random after training
+        seed: seed of the actors
+
+    Returns
+    =======
+        (list of throughput reports, mean rewards against random or None)
+    """
+    import tensorflow.compat.v1 as tf
+    from open_spiel.python import rl_environment
+
+    from open_spiel.python.algorithms import random_agent
+
+    import games  # registers the games
+    from evaluate import create_opponent_pairs, eval_agents
+    from train import make_agent
+
+    env = rl_environment.Environment(game)
+    info_state_size = env.observation_spec()['info_state'][0]
+    num_actions = env.action_spec()['num_actions']
+    num_players = env.num_players
+    cfg = dict(cfg, replay=cfg.get('replay', 'uniform'))
+    if cfg['replay'] == 'list':
+        raise ValueError("The learner needs an array replay ('uniform' or 'prioritized')")
+
+    ctx = mp.get_context('spawn')  # actors must not inherit the TF runtime
+    sizes = [info_state_size, *cfg['hidden_layers_sizes'], num_actions]
+    weights = [SharedWeights(sizes, ctx) for _ in range(num_players)]
+    rings = [TransitionRing(ring_size, info_state_size, num_actions, ctx) for _ in range(num_actors)]
+    stop = ctx.Event()
+    env_steps = ctx.Value('q', 0)
+    reports = []
+
+    with tf.Session() as sess:
+        agents = [make_agent(cfg, sess, p, info_state_size, num_actions) for p in range(num_players)]
+        sess.run(tf.global_variables_initializer())
+        for agent, w in zip(agents, weights):
+            w.write(_network_arrays(sess, agent))
+
+        actors = [
+            ctx.Process(target=_actor, args=(i, game, weights, rings[i], env_steps, stop, seed + i), daemon=True)
+            for i in range(num_actors)
+        ]
+        for actor in actors:
+            actor.start()
+
+        updates = 0
+        transitions = 0
+        added = [0] * num_players  # transitions of each agent
+        learns = [0] * num_players  # updates of each agent
+        losses = [None] * num_players  # last loss of each agent
+        start = last_time = time.perf_counter()
+        last_steps = last_updates = 0
+        try:
+            while env_steps.value < num_steps:
+                dead = [i for i, actor in enumerate(actors) if not actor.is_alive()]
+                if dead:
+                    codes = [actors[i].exitcode for i in dead]
+                    raise RuntimeError(f"Actors {dead} died (exit codes {codes})")
+
+                for ring in rings:
+                    batch = ring.drain()
+                    transitions += len(batch['action'])
+                    for p, agent in enumerate(agents):
+                        mine = batch['player'] == p
+                        if mine.any():
+                            added[p] += int(mine.sum())
+                            agent.replay_buffer.add_many(*(batch[k][mine] for k in (
+                                'info_state', 'action', 'reward', 'next_info_state',
+                                'is_final_step', 'legal_actions_mask')))
+
+                learned = False
+                for p, agent in enumerate(agents):
+                    if learns[p] * cfg['learn_every'] >= added[p]:
+                        continue
+                    loss = agent.learn()
+                    if loss is not None:
+                        losses[p] = float(loss)
+                        learns[p] += 1
+                        learned = True
+                if not learned:
+                    time.sleep(0.001)  # wait for transitions (and the replay buffers to fill)
+                    continue
+
+                updates += 1
+                if updates % cfg['update_target_network_every'] == 0:
+                    sess.run([agent._update_target_network for agent in agents])
+                if updates % sync_every == 0:
+                    for agent, w in zip(agents, weights):
+                        w.write(_network_arrays(sess, agent))
+
+                now = time.perf_counter()
+                if now - last_time >= report_every:
+                    steps = env_steps.value
+                    report = {
+                        'time': now - start,
+                        'env_steps': steps,
+                        'updates': updates,
+                        'transitions': transitions,
+                        'env_steps_per_sec': (steps - last_steps) / (now - last_time),
+                        'updates_per_sec': (updates - last_updates) / (now - last_time),
+                        'loss': list(losses),
+                    }
+                    reports.append(report)
+                    print(f"[{report['time']:7.1f}s] {report['env_steps_per_sec']:9.1f} env steps/s "
+                          f"{report['updates_per_sec']:7.1f} updates/s ({steps} steps, {updates} updates)")
+                    last_time, last_steps, last_updates = now, steps, updates
+        finally:
+            stop.set()
+            for actor in actors:
+                actor.join(timeout=5)
+                if actor.is_alive():
+                    actor.terminate()
+
+        elapsed = time.perf_counter() - start
+        print(f"Done in {elapsed:.1f}s: {env_steps.value / elapsed:.1f} env steps/s, {updates / elapsed:.1f} updates/s")
+
+        rewards = None
+        if eval_episodes > 0:
+            random_bots = [random_agent.RandomAgent(player_id=p, num_actions=num_actions) for p in range(num_players)]
+            pairs = create_opponent_pairs(agents, random_bots, num_players, 1)
+            rewards = eval_agents(env, pairs, eval_episodes)
+        return reports, rewards
+
+
+################################################################################
+##                            MAIN
+################################################################################
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--game", type=str, default="snakes", help="ttt, snakes or nim")
+    parser.add_argument("--config", type=str, default="small", choices=list(CONFIGS), help="DQN config")
+    parser.add_argument("--replay", type=str, default="uniform", choices=["uniform", "prioritized"], help="Replay memory of the learner")
+    parser.add_argument("--actors", type=int, default=max(1, mp.cpu_count() - 1), metavar="N", help="Actor processes")
+    parser.add_argument("--steps", type=int, default=200_000, metavar="N", help="Environment steps to train for")
+    parser.add_argument("--sync-every", type=int, default=50, metavar="N", help="Learner updates between weight syncs")
+    parser.add_argument("--report-every", type=float, default=10, metavar="S", help="Seconds between reports")
+    parser.add_argument("--eval-episodes", type=int, default=300, metavar="N", help="Episodes against random after training")
+    parser.add_argument("--path", type=str, default=None, metavar="PATH", help="Where to save throughput reports (.csv)")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    cfg = dict(CONFIGS[args.config], replay=args.replay)
+    reports, rewards = train(
+        args.game, cfg, args.actors, args.steps, args.sync_every,
+        report_every=args.report_every, eval_episodes=args.eval_episodes
+    )
+    if rewards is not None:
+        # pairs as in `create_opponent_pairs`: each agent vs. random, then both agents
+        print("Mean rewards of the first player:", rewards)
+
+    if args.path:
+        import pandas as pd
+
+        pd.DataFrame(reports).to_csv(args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+`dqn.DQN` storing its transitions in an array replay memory (see `replay.py`).
+"""
+import tensorflow.compat.v1 as tf
+from open_spiel.python.algorithms import dqn
+
+from replay import ArrayReplay, PrioritizedReplay
+
+REPLAYS = {
+    "uniform": ArrayReplay,
+    "prioritized": PrioritizedReplay,
+}
+
+
+class ArrayDQN(dqn.DQN):
+    """
+    DQN agent with a preallocated array replay memory.
+
+    Arguments
+    =========
+        replay: "uniform" or "prioritized"
+        replay_kwargs: passed to the replay memory (e.g. `alpha`, `beta`)
+        other arguments as `dqn.DQN`
+    """
+
+    def __init__(self, session, player_id, state_representation_size, num_actions,
+                 replay: str = "uniform", replay_kwargs: dict = None, **kwargs) -> None:
+        super().__init__(session, player_id, state_representation_size, num_actions, **kwargs)
+        capacity = self._kwargs["replay_buffer_capacity"]
+        self._replay_buffer = REPLAYS[replay](capacity, state_representation_size, num_actions, **(replay_kwargs or {}))
+
+        # same loss as `dqn.DQN`, weighted by importance sampling weights
+        self._weights_ph = tf.placeholder(shape=[None], dtype=tf.float32, name="weights_ph")
+        illegal_logits = (1 - self._legal_actions_mask_ph) * dqn.ILLEGAL_ACTION_LOGITS_PENALTY
+        max_next_q = tf.reduce_max(self._target_q_values + illegal_logits, axis=-1)
+        target = self._reward_ph + (1 - self._is_final_step_ph) * self._discount_factor * max_next_q
+        action_indices = tf.stack([tf.range(tf.shape(self._q_values)[0]), self._action_ph], axis=-1)
+        predictions = tf.gather_nd(self._q_values, action_indices)
+
+        loss_class = tf.losses.huber_loss if self._kwargs["loss_str"] == "huber" else tf.losses.mean_squared_error
+        self._td_error = target - predictions
+        self._weighted_loss = loss_class(labels=target, predictions=predictions, weights=self._weights_ph)
+        # reuses the optimizer (and its slots) of the parent
+        self._weighted_learn_step = self._optimizer.minimize(self._weighted_loss)
+        self._session.run(tf.variables_initializer(self._optimizer.variables()))
+
+    def add_transition(self, prev_time_step, prev_action, time_step):
+        """Write the transition directly into the replay arrays."""
+        assert prev_time_step is not None
+        self._replay_buffer.add(
+            prev_time_step.observations["info_state"][self.player_id],
+            prev_action,
+            time_step.rewards[self.player_id],
+            time_step.observations["info_state"][self.player_id],
+            float(time_step.last()),
+            time_step.observations["legal_actions"][self.player_id],
+        )
+
+    def learn(self):
+        """Compute the loss on a sampled batch and update the Q-network."""
+        if (len(self._replay_buffer) < self._batch_size or
+                len(self._replay_buffer) < self._min_buffer_size_to_learn):
+            return None
+
+        indices, batch, weights = self._replay_buffer.sample(self._batch_size)
+        loss, _, td_error = self._session.run(
+            [self._weighted_loss, self._weighted_learn_step, self._td_error],
+            feed_dict={
+                self._info_state_ph: batch["info_state"],
+                self._action_ph: batch["action"],
+                self._reward_ph: batch["reward"],
+                self._is_final_step_ph: batch["is_final_step"],
+                self._next_info_state_ph: batch["next_info_state"],
+                self._legal_actions_mask_ph: batch["legal_actions_mask"],
+                self._weights_ph: weights,
+            })
+        self._replay_buffer.update_priorities(indices, td_error)
+        return loss
@@ -0,0 +1,187 @@
+"""
+Replay memories made of preallocated contiguous arrays.
+
+Transitions are written in place into ring buffers (one array per field),
+so adding is O(1) and a batch is gathered with a single fancy index per
+field, instead of rebuilding it from a list of `Transition` tuples.
+
+`PrioritizedReplay` samples proportionally to TD errors through a sum
+tree (Schaul et al., 2015, https://arxiv.org/abs/1511.05952).
+"""
+import numpy as np
+
+FIELDS = ("info_state", "action", "reward", "next_info_state", "is_final_step", "legal_actions_mask")
+
+
+class ArrayReplay:
+    """
+    Ring buffer of transitions with uniform sampling.
+
+    Arguments
+    =========
+        capacity: maximal number of stored transitions
+        state_size: size of the (flat) info state
+        num_actions: number of distinct actions
+        seed: seed of sampling
+    """
+
+    def __init__(self, capacity: int, state_size: int, num_actions: int, seed: int = None) -> None:
+        self.capacity = capacity
+        self.info_state = np.zeros((capacity, state_size), dtype=np.float32)
+        self.action = np.zeros(capacity, dtype=np.int32)
+        self.reward = np.zeros(capacity, dtype=np.float32)
+        self.next_info_state = np.zeros((capacity, state_size), dtype=np.float32)
+        self.is_final_step = np.zeros(capacity, dtype=np.float32)
+        self.legal_actions_mask = np.zeros((capacity, num_actions), dtype=np.float32)
+
+        self._next = 0
+        self._size = 0
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the stored arrays."""
+        return sum(getattr(self, field).nbytes for field in FIELDS)
+
+    def add(self, info_state, action, reward, next_info_state, is_final_step, legal_actions) -> int:
+        """Store one transition, overwriting the oldest one when full. Returns its index."""
+        idx = self._next
+        self.info_state[idx] = info_state
+        self.action[idx] = action
+        self.reward[idx] = reward
+        self.next_info_state[idx] = next_info_state
+        self.is_final_step[idx] = is_final_step
+        self.legal_actions_mask[idx] = 0
+        self.legal_actions_mask[idx, legal_actions] = 1
+
+        self._next = (idx + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        return idx
+
+    def add_many(self, info_state, action, reward, next_info_state, is_final_step, legal_actions_mask):
+        """Store a batch of transitions (legal actions given as a mask). Returns their indices."""
+        n = min(len(action), self.capacity)
+        indices = (self._next + np.arange(n)) % self.capacity
+        self.info_state[indices] = info_state[-n:]
+        self.action[indices] = action[-n:]
+        self.reward[indices] = reward[-n:]
+        self.next_info_state[indices] = next_info_state[-n:]
+        self.is_final_step[indices] = is_final_step[-n:]
+        self.legal_actions_mask[indices] = legal_actions_mask[-n:]
+
+        self._next = (self._next + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        return indices
+
+    def batch(self, indices) -> dict:
+        """Return the fields of transitions at `indices`."""
+        return {field: getattr(self, field)[indices] for field in FIELDS}
+
+    def sample(self, num_samples: int):
+        """
+        Sample a batch of transitions.
+
+        Returns
+        =======
+            (indices, batch dict, importance sampling weights)
+        """
+        if num_samples > self._size:
+            raise ValueError(f"Cannot sample {num_samples} from {self._size} transitions")
+        indices = self._rng.integers(0, self._size, size=num_samples)
+        return indices, self.batch(indices), np.ones(num_samples, dtype=np.float32)
+
+    def update_priorities(self, indices, td_errors) -> None:
+        """Uniform sampling ignores priorities."""
+
+
+class SumTree:
+    """Binary tree over `capacity` leaves, each node holds the sum of its children."""
+
+    def __init__(self, capacity: int) -> None:
+        self.leaves = 1 << max(0, int(capacity - 1).bit_length())
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return self.tree[1]
+
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices) + self.leaves]
+
+    def update(self, indices, values) -> None:
+        nodes = np.asarray(indices) + self.leaves
+        self.tree[nodes] = values
+        nodes = np.unique(nodes >> 1)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes >> 1)
+
+    def find(self, values):
+        """Return leaves where the prefix sums reach `values` (vectorized descent)."""
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        while nodes[0] < self.leaves:
+            left = 2 * nodes
+            go_right = values > self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0)
+            nodes = left + go_right
+        return nodes - self.leaves
+
+
+class PrioritizedReplay(ArrayReplay):
+    """
+    Ring buffer sampling transitions with probability proportional to priority**alpha.
+
+    Arguments
+    =========
+        alpha: how much prioritization is used (0 is uniform)
+        beta: exponent of importance sampling weights (1 fully compensates)
+        epsilon: added to |TD error| so that no transition has zero priority
+        other arguments as `ArrayReplay`
+    """
+
+    def __init__(self, capacity: int, state_size: int, num_actions: int, seed: int = None,
+                 alpha: float = 0.6, beta: float = 0.4, epsilon: float = 1e-6) -> None:
+        super().__init__(capacity, state_size, num_actions, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self._tree = SumTree(capacity)
+        self._max_priority = 1.0
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self._tree.tree.nbytes
+
+    def add(self, *args, **kwargs) -> int:
+        idx = super().add(*args, **kwargs)
+        # new transitions are sampled at least once before their TD error is known
+        self._tree.update([idx], self._max_priority ** self.alpha)
+        return idx
+
+    def add_many(self, *args, **kwargs):
+        indices = super().add_many(*args, **kwargs)
+        self._tree.update(indices, np.full(len(indices), self._max_priority ** self.alpha))
+        return indices
+
+    def sample(self, num_samples: int):
+        if num_samples > self._size:
+            raise ValueError(f"Cannot sample {num_samples} from {self._size} transitions")
+        # one sample from each of `num_samples` equal segments of the total
+        total = self._tree.total
+        bounds = np.linspace(0, total, num_samples + 1)
+        values = self._rng.uniform(bounds[:-1], bounds[1:])
+        indices = np.minimum(self._tree.find(values), self._size - 1)
+
+        probs = self._tree[indices] / total
+        weights = (self._size * probs) ** -self.beta
+        weights /= weights.max()
+        return indices, self.batch(indices), weights.astype(np.float32)
+
+    def update_priorities(self, indices, td_errors) -> None:
+        priorities = np.abs(td_errors) + self.epsilon
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+        self._tree.update(indices, priorities ** self.alpha)
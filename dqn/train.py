@@ -8,9 +8,38 @@ import pandas as pd
 import numpy as np
 import tensorflow.compat.v1 as tf
 
+from array_dqn import ArrayDQN
 from evaluate import eval_agents, create_opponent_pairs
 
 
+def make_agent(cfg, sess, player_id, info_state_size, num_actions):
+    """
+    Create a DQN agent for one configuration.
+
+    `cfg['replay']` selects the replay memory: "list" (open_spiel's default),
+    "uniform" or "prioritized" (preallocated arrays, see `replay.py`).
+    """
+    kwargs = dict(
+        session=sess,
+        player_id=player_id,
+        state_representation_size=info_state_size,
+        num_actions=num_actions,
+        hidden_layers_sizes=cfg['hidden_layers_sizes'],
+        batch_size=cfg['batch_size'],
+        optimizer_str=cfg['optimizer'],
+        learn_every=cfg['learn_every'],
+        update_target_network_every=cfg['update_target_network_every'])
+    if 'replay_buffer_capacity' in cfg:
+        kwargs['replay_buffer_capacity'] = cfg['replay_buffer_capacity']
+
+    replay = cfg.get('replay', 'list')
+    if replay == 'list':
+        return dqn.DQN(**kwargs)
+    agent = ArrayDQN(replay=replay, replay_kwargs=cfg.get('replay_kwargs'), **kwargs)
+    print(f"{cfg['name']} (player {player_id}): {replay} replay uses {agent.replay_buffer.nbytes / 2**20:.1f} MiB")
+    return agent
+
+
 def train_eval(game_config, agents_config):
     env = rl_environment.Environment(game_config['game'])
     info_state_size = env.observation_spec()['info_state'][0]
@@ -24,16 +53,7 @@ def train_eval(game_config, agents_config):
         agents = []
         for cfg in agents_config:
             agents.extend([
-                dqn.DQN(
-                    session=sess,
-                    player_id=idx,
-                    state_representation_size=info_state_size,
-                    num_actions=num_actions,
-                    hidden_layers_sizes=cfg['hidden_layers_sizes'],
-                    batch_size=cfg['batch_size'],
-                    optimizer_str=cfg['optimizer'],
-                    learn_every=cfg['learn_every'],
-                    update_target_network_every=cfg['update_target_network_every']) for idx in range(num_players)
+                make_agent(cfg, sess, idx, info_state_size, num_actions) for idx in range(num_players)
             ])
         sess.run(tf.global_variables_initializer())
 
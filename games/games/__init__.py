@@ -1,8 +1,19 @@
 from .tic_tac_toe import register_pyspiel as register_ttt
 from .snakes import register_pyspiel as register_snakes
+from .snakes import register_pyspiel_multi as register_multi_snakes
 
 TTT_NAME = "ttt"
 register_ttt(5, 5, 3, TTT_NAME)
 
 SNAKES_NAME = "snakes"
 register_snakes(5, 5, SNAKES_NAME)
+
+SNAKES4_NAME = "snakes4"
+register_multi_snakes(30, 30, 4, SNAKES4_NAME, max_moves=300)
+
+SNAKES8_NAME = "snakes8"
+register_multi_snakes(40, 40, 8, SNAKES8_NAME, max_moves=400)
+
+from ._replay import Replay, load_replays
+from ._serialize import serialize_states, deserialize_states
+from ._vector_env import VectorEnv, VectorStep
@@ -0,0 +1,117 @@
+"""
+Bots thinking in the background of the interactive (pygame) loop.
+
+The bot runs in a worker thread, so the main loop keeps pumping events
+and rendering while the bot computes its move. A thread (not a process)
+is used, as bots usually hold unpicklable objects (TF sessions, search
+trees).
+"""
+import inspect
+import queue
+import random
+import threading
+import time
+
+
+def random_action(state):
+    return random.choice(state.legal_actions())
+
+
+class BotWorker:
+    """
+    Compute moves of `play_fn` in a background thread.
+
+    Arguments
+    =========
+        play_fn: function state -> action; if it accepts a `cancel`
+            keyword, it receives a `threading.Event` which is set when
+            the move is no longer needed and should stop early
+        time_budget: seconds per move, after which the move is cancelled
+            and `fallback` is played (None for no limit); needs a
+            `play_fn` accepting `cancel`, as a move which cannot be
+            stopped would keep thinking and delay all later moves
+        fallback: function state -> action used when out of time
+    """
+
+    def __init__(self, play_fn, time_budget: float = None, fallback=random_action) -> None:
+        self._play_fn = play_fn
+        self.time_budget = time_budget
+        self._fallback = fallback
+        try:
+            self._pass_cancel = "cancel" in inspect.signature(play_fn).parameters
+        except (TypeError, ValueError):  # builtins, some extension types
+            self._pass_cancel = False
+        if time_budget is not None and not self._pass_cancel:
+            raise ValueError("time_budget needs a play_fn accepting a `cancel` keyword "
+                             "(e.g. `search.AnytimeMCTSBot.step`)")
+
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._job_id = 0
+        self._job = None  # (id, state, started, cancel event)
+        self._result = None  # (id, action or exception)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job_id, state, _, cancel = job
+            if cancel.is_set():
+                continue
+            try:
+                kwargs = {"cancel": cancel} if self._pass_cancel else {}
+                result = self._play_fn(state, **kwargs)
+            except Exception as e:  # re-raised in the main thread
+                result = e
+            with self._lock:
+                if job_id == self._job_id:
+                    self._result = (job_id, result)
+
+    @property
+    def busy(self) -> bool:
+        """Whether a move was requested and not yet collected."""
+        return self._job is not None
+
+    def start(self, state) -> None:
+        """Start thinking about `state` (a copy is taken), cancelling any previous move."""
+        self.cancel()
+        with self._lock:
+            self._job_id += 1
+            self._job = (self._job_id, state.clone(), time.monotonic(), threading.Event())
+            self._result = None
+        # the worker gets its own copy, the fallback may still need the other one
+        self._jobs.put(self._job[:1] + (state.clone(),) + self._job[2:])
+
+    def poll(self):
+        """Return the action if it is ready (or the time is up), otherwise None."""
+        if self._job is None:
+            return None
+        job_id, state, started, cancel = self._job
+        with self._lock:
+            result = self._result
+        if result is not None and result[0] == job_id:
+            self._job = None
+            if isinstance(result[1], Exception):
+                raise result[1]
+            return result[1]
+        if self.time_budget is not None and time.monotonic() - started >= self.time_budget:
+            self.cancel()
+            return self._fallback(state)
+        return None
+
+    def cancel(self) -> None:
+        """Abandon the current move, its result (if any) is discarded."""
+        if self._job is not None:
+            self._job[3].set()
+            with self._lock:
+                self._job_id += 1
+            self._job = None
+
+    def close(self) -> None:
+        self.cancel()
+        self._jobs.put(None)
+        self._thread.join(timeout=1)
@@ -0,0 +1,29 @@
+"""
+Packing of small codes into bytes, shared by `pack`/`unpack` of the games.
+"""
+import numpy as np
+
+
+def pack2(codes) -> np.ndarray:
+    """Pack codes in 0..3 along the last axis, four per byte (first code in the lowest bits)."""
+    codes = np.asarray(codes, dtype=np.uint8)
+    n = codes.shape[-1]
+    padded = np.zeros(codes.shape[:-1] + (-(-n // 4) * 4,), dtype=np.uint8)
+    padded[..., :n] = codes
+    quads = padded.reshape(codes.shape[:-1] + (-1, 4))
+    return quads[..., 0] | quads[..., 1] << 2 | quads[..., 2] << 4 | quads[..., 3] << 6
+
+
+def unpack2(data, n: int) -> np.ndarray:
+    """Inverse of `pack2`, returns the first `n` codes along the last axis."""
+    data = np.asarray(data, dtype=np.uint8)
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+    codes = (data[..., None] >> shifts) & 3
+    return codes.reshape(data.shape[:-1] + (-1,))[..., :n]
+
+
+def as_rows(data, size: int) -> np.ndarray:
+    """View bytes (or an array of packed rows) as a (N, size) uint8 array."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = np.frombuffer(data, dtype=np.uint8)
+    return np.asarray(data, dtype=np.uint8).reshape(-1, size)
@@ -0,0 +1,367 @@
+"""
+Perft: enumerate the game tree of a registered game to a fixed depth.
+
+Every position up to `depth` plies is visited once per path, counting
+nodes, terminal positions and the returns of terminal positions at every
+depth. The same tree is walked by several implementations ("engines"):
+
+    pyspiel   pyspiel states, `clone` and `apply_action` (as the bots see the game)
+    packed    pyspiel states copied through `pack` / `unpack_state`
+    engine    the bare `TTT` / `Snakes` / `MultiSnakes` engine, applied in place and undone
+              by `restore` (or a copy for `MultiSnakes`)
+    multi     `MultiSnakes` with 2 players on a `Snakes` game, fruit spawned as by `Snakes`
+
+and their counts must agree; counts can also be saved and compared with
+a later run, e.g. before and after rewriting an engine. Fruit of Snakes
+is random, so the global `random` is seeded from the path (the actions
+played so far) before every move and all engines see the same fruit.
+
+Usage
+=====
+    $ python -m games._perft --game ttt --depth 4
+    $ python -m games._perft --game snakes --depth 8 --engines pyspiel engine
+    $ python -m games._perft --game snakes --depth 10 --engines engine multi   # Snakes vs. MultiSnakes
+    $ python -m games._perft --game ttt --depth 5 --save ttt-5.json   # before a rewrite
+    $ python -m games._perft --game ttt --depth 5 --compare ttt-5.json
+"""
+import argparse
+import collections
+import copy
+import json
+import random
+import sys
+import time
+
+import pyspiel
+
+from .snakes._game import PLAYER1, PLAYER2, Snakes
+from .snakes._multi import FRUIT, MultiSnakes
+from .snakes._pyspiel import _MAX_MOVES
+from .tic_tac_toe._game import TTT
+
+_MULT = 1_000_003
+_MOD = 2**61 - 1
+
+
+################################################################################
+##                            ENGINES
+################################################################################
+
+class _PyspielWalker:
+    """Positions as pyspiel states, children are clones."""
+
+    def __init__(self, game) -> None:
+        self.game = game
+
+    def reset(self) -> None:
+        self.stack = [self.game.new_initial_state()]
+
+    def _copy(self, state):
+        return state.clone()
+
+    def push(self, action: int, seed: int) -> None:
+        # copy before seeding, copies of Snakes states spawn fruit of their own
+        child = self._copy(self.stack[-1])
+        random.seed(seed)
+        child.apply_action(action)
+        self.stack.append(child)
+
+    def pop(self) -> None:
+        self.stack.pop()
+
+    def legal_actions(self) -> list:
+        return self.stack[-1].legal_actions()
+
+    def is_terminal(self) -> bool:
+        return self.stack[-1].is_terminal()
+
+    def returns(self) -> list:
+        return self.stack[-1].returns()
+
+
+class _PackedWalker(_PyspielWalker):
+    """As `_PyspielWalker`, children are copied through packing."""
+
+    def _copy(self, state):
+        return self.game.unpack_state(state.pack())
+
+
+class _TTTWalker:
+    """The `TTT` engine in place, as `_TTTState` of the pyspiel wrapper."""
+
+    def __init__(self, game) -> None:
+        engine = game.new_initial_state()._game
+        self.size = engine._rows, engine._cols, engine.to_connect
+
+    def reset(self) -> None:
+        self.engine = TTT(*self.size)
+        self.game_over = False
+        self.snapshots = []
+
+    def push(self, action: int, seed: int) -> None:
+        self.snapshots.append((self.game_over, self.engine.snapshot()))
+        random.seed(seed)
+        self.engine.apply_action(divmod(action, self.size[1]))
+        self.game_over = self.engine.is_full()
+
+    def pop(self) -> None:
+        self.game_over, snapshot = self.snapshots.pop()
+        self.engine.restore(snapshot)
+
+    def legal_actions(self) -> list:
+        return [row * self.size[1] + col for row, col in self.engine.legal_actions()]
+
+    def is_terminal(self) -> bool:
+        return self.game_over
+
+    def returns(self) -> list:
+        scores = self.engine.returns()
+        if not self.game_over or scores[0] == scores[1]:
+            return [0, 0]
+        p1 = 1 if scores[0] > scores[1] else -1
+        return [p1, -p1]
+
+
+class _SnakesWalker:
+    """The `Snakes` engine in place, as `_SnakeState` of the pyspiel wrapper."""
+
+    def __init__(self, game) -> None:
+        engine = game.new_initial_state()._game
+        self.size = engine.width, engine.height
+
+    def reset(self) -> None:
+        self.engine = Snakes(*self.size)
+        self.player = 0
+        self.move_num = 0
+        self.snapshots = []
+
+    def push(self, action: int, seed: int) -> None:
+        self.snapshots.append((self.player, self.move_num, self.engine.snapshot()))
+        random.seed(seed)
+        if self.player == 0:
+            self.engine.make_move(PLAYER1, action)
+            self.player = 1
+        else:
+            self.move_num += 1
+            self.engine.make_move(PLAYER2, action)
+            self.engine.step()
+            self.player = 0
+
+    def pop(self) -> None:
+        self.player, self.move_num, snapshot = self.snapshots.pop()
+        self.engine.restore(snapshot)
+
+    def legal_actions(self) -> list:
+        return [0, 1, 2, 3]
+
+    def is_terminal(self) -> bool:
+        return self.engine.is_game_over() or self.move_num >= _MAX_MOVES
+
+    def returns(self) -> list:
+        winner = self.engine.winner()
+        p1 = 0 if winner is None else 1 if winner == PLAYER1 else -1
+        return [p1, -p1]
+
+
+class _MultiSnakesWalker:
+    """
+    The `MultiSnakes` engine in place, as `_MultiSnakeState` of the pyspiel wrapper.
+
+    On a `Snakes` game the engine plays with 2 players and the walker spawns
+    the fruit itself as `Snakes` does (one `random.choice` of the free cells
+    in row-major order), so the tree must equal the one of `_SnakesWalker`.
+    """
+
+    def __init__(self, game) -> None:
+        engine = game.new_initial_state()._game
+        self.size = engine.width, engine.height
+        self.as_snakes = isinstance(engine, Snakes)
+        if self.as_snakes:
+            self.num_players, self.num_fruits, self.max_moves = 2, 1, _MAX_MOVES
+        else:
+            self.num_players, self.num_fruits = engine.num_players, engine.num_fruits
+            self.max_moves = game.max_game_length() // engine.num_players
+
+    def reset(self) -> None:
+        self.engine = MultiSnakes(*self.size, self.num_players, 0 if self.as_snakes else self.num_fruits)
+        self._spawn_fruit()
+        self.player = 0
+        self.move_num = 0
+        self.snapshots = []
+
+    def _spawn_fruit(self) -> None:
+        engine = self.engine
+        if self.as_snakes and not engine.fruits and engine._free:
+            cell = random.choice(sorted(engine._free))
+            engine._take(cell, FRUIT)
+            engine.fruits.add(cell)
+
+    def push(self, action: int, seed: int) -> None:
+        self.snapshots.append((self.player, self.move_num, copy.deepcopy(self.engine)))
+        random.seed(seed)
+        self.engine.make_move(self.player, action)
+        alive = self.engine.alive
+        later = [p for p in range(self.player + 1, self.num_players) if alive[p]]
+        if later:
+            self.player = later[0]
+            return
+        self.move_num += 1
+        self.engine.step()
+        if not self.engine.is_game_over():
+            self._spawn_fruit()
+        self.player = alive.index(True) if any(alive) else 0
+
+    def pop(self) -> None:
+        self.player, self.move_num, self.engine = self.snapshots.pop()
+
+    def legal_actions(self) -> list:
+        return [0, 1, 2, 3]
+
+    def is_terminal(self) -> bool:
+        return self.engine.is_game_over() or self.move_num >= self.max_moves
+
+    def returns(self) -> list:
+        if not self.is_terminal():
+            return [0.0] * self.num_players
+        return self.engine.returns()
+
+
+def make_walker(game, engine: str):
+    """Return the walker of `engine` ("pyspiel", "packed", "engine" or "multi") for a pyspiel game."""
+    if engine == "pyspiel":
+        return _PyspielWalker(game)
+    if engine == "packed":
+        if not hasattr(game, "unpack_state"):
+            raise ValueError(f"{game} cannot be packed")
+        return _PackedWalker(game)
+    if engine == "engine":
+        state = game.new_initial_state()
+        if isinstance(getattr(state, "_game", None), TTT):
+            return _TTTWalker(game)
+        if isinstance(getattr(state, "_game", None), Snakes):
+            return _SnakesWalker(game)
+        if isinstance(getattr(state, "_game", None), MultiSnakes):
+            return _MultiSnakesWalker(game)
+        raise ValueError(f"No engine walker for {game}")
+    if engine == "multi":
+        if not isinstance(getattr(game.new_initial_state(), "_game", None), Snakes):
+            raise ValueError(f"{game} is not a Snakes game")
+        return _MultiSnakesWalker(game)
+    raise ValueError(f"Unknown engine {engine}")
+
+
+################################################################################
+##                            PERFT
+################################################################################
+
+def perft(walker, depth: int, seed: int = 0) -> list[dict]:
+    """
+    Walk the tree of `walker` to `depth` plies.
+
+    Returns
+    =======
+        for every depth 0..`depth`, counts of "nodes", "terminals" and of
+        the returns of terminal positions (keys "returns <r1> <r2> ...")
+    """
+    levels = [collections.Counter(nodes=0, terminals=0) for _ in range(depth + 1)]
+    random.seed(seed)
+    walker.reset()
+
+    def visit(d, path):
+        level = levels[d]
+        level["nodes"] += 1
+        if walker.is_terminal():
+            level["terminals"] += 1
+            level["returns " + " ".join(f"{r:+g}" for r in walker.returns())] += 1
+            return
+        if d == depth:
+            return
+        for action in walker.legal_actions():
+            child = (path * _MULT + action + 1) % _MOD
+            walker.push(action, child)
+            visit(d + 1, child)
+            walker.pop()
+
+    visit(0, seed)
+    return [dict(level) for level in levels]
+
+
+def diff(levels: list[dict], reference: list[dict]) -> list[str]:
+    """Return a line for every count differing from `reference`."""
+    lines = []
+    for d in range(max(len(levels), len(reference))):
+        ours = levels[d] if d < len(levels) else {}
+        theirs = reference[d] if d < len(reference) else {}
+        for key in sorted(set(ours) | set(theirs)):
+            if ours.get(key, 0) != theirs.get(key, 0):
+                lines.append(f"depth {d}, {key}: {ours.get(key, 0)} != {theirs.get(key, 0)} (reference)")
+    return lines
+
+
+def print_levels(levels: list[dict]) -> None:
+    print(f"{'depth':>5} {'nodes':>12} {'terminals':>10}  outcomes")
+    for d, level in enumerate(levels):
+        outcomes = ", ".join(f"{k[len('returns '):]}: {v}" for k, v in sorted(level.items()) if k.startswith("returns"))
+        print(f"{d:>5} {level['nodes']:>12,} {level['terminals']:>10,}  {outcomes}")
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--game", type=str, default="ttt", metavar="NAME", help="Registered pyspiel game")
+    parser.add_argument("--depth", type=int, default=4, metavar="N", help="Plies to enumerate")
+    parser.add_argument("--engines", type=str, nargs="+", default=["pyspiel", "packed", "engine"],
+                        choices=["pyspiel", "packed", "engine", "multi"], help="Implementations walking the tree, compared to the first")
+    parser.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of the fruit of every path")
+    parser.add_argument("--save", type=str, default=None, metavar="FILE", help="Write the counts of the first engine (.json)")
+    parser.add_argument("--compare", type=str, default=None, metavar="FILE", help="Compare the counts with a saved run (.json)")
+    return parser
+
+
+def main(arguments=None, namespace=None):
+    args = make_parser().parse_args(args=arguments, namespace=namespace)
+    game = pyspiel.load_game(args.game)
+
+    results, ok = {}, True
+    for engine in args.engines:
+        try:
+            walker = make_walker(game, engine)
+        except ValueError as e:
+            print(f"skipping {engine}: {e}")
+            continue
+        start = time.perf_counter()
+        levels = perft(walker, args.depth, args.seed)
+        seconds = time.perf_counter() - start
+        nodes = sum(level["nodes"] for level in levels)
+        print(f"\n{args.game} {engine}: {nodes:,} nodes in {seconds:.2f} s ({nodes / seconds:,.0f} nodes/s)")
+        print_levels(levels)
+        results[engine] = levels
+
+    engines = list(results)
+    for engine in engines[1:]:
+        lines = diff(results[engine], results[engines[0]])
+        ok &= not lines
+        print(f"\n{engine} vs. {engines[0]}: " + ("same tree" if not lines else f"{len(lines)} differences"))
+        for line in lines[:20]:
+            print("  " + line)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            saved = json.load(f)
+        if (saved["game"], saved["depth"], saved["seed"]) != (args.game, args.depth, args.seed):
+            raise ValueError(f"{args.compare} is a run of {saved['game']} to depth {saved['depth']} (seed {saved['seed']})")
+        for engine in engines:
+            lines = diff(results[engine], saved["levels"])
+            ok &= not lines
+            print(f"\n{engine} vs. {args.compare}: " + ("same tree" if not lines else f"{len(lines)} differences"))
+            for line in lines[:20]:
+                print("  " + line)
+
+    if args.save and engines:
+        with open(args.save, "w") as f:
+            json.dump(dict(game=args.game, depth=args.depth, seed=args.seed, levels=results[engines[0]]), f, indent=2)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Random access replay of recorded games.
+
+A game is reconstructed once from its actions, storing a compact snapshot
+of the state every `keyframe_every` plies. Seeking to a ply restores the
+nearest preceding keyframe and applies at most `keyframe_every - 1`
+actions, so any position is reachable in O(keyframe_every) steps.
+
+Fruit of Snakes spawns at random, so the actions alone do not determine
+the game. Evaluations record the fruit of every position (the `fruits`
+column, see `alpha_zero/evaluate.py`) and the replay puts the fruit where
+it was, raising if the recorded game cannot be rebuilt. Without recorded
+fruit, spawns draw from `random` seeded by the ply: the replay is then a
+different game (`faithful` is False) which may end before all recorded
+actions are played, and it is cut there with a warning. Restored states
+have an empty `history()`.
+
+Usage
+=====
+    from games import load_replays
+
+    for row, replay in load_replays("ttt", "alpha_zero/eval/ttt/cnn.csv"):
+        last = replay.positions(range(max(0, len(replay) - 5), len(replay)))
+"""
+import ast
+import contextlib
+import csv
+import random
+import warnings
+from typing import Iterable, Iterator
+
+import pyspiel
+
+
+@contextlib.contextmanager
+def _seeded(seed: int, ply: int):
+    """Seed `random` for one ply, restoring the global state afterwards."""
+    outer = random.getstate()
+    random.seed(seed * 1_000_003 + ply)
+    try:
+        yield
+    finally:
+        random.setstate(outer)
+
+
+class Replay:
+    """
+    Keyframed reconstruction of one game.
+
+    Arguments
+    =========
+        game: pyspiel game (or its registered name)
+        actions: recorded actions, in order
+        keyframe_every: number of plies between stored snapshots
+        seed: seed of fruit spawns which were not recorded
+        fruits: recorded fruit (y, x) or None of every position, before the
+            first and after every action (Snakes only)
+    """
+
+    def __init__(self, game, actions: Iterable[int], keyframe_every: int = 16, seed: int = 0,
+                 fruits: list = None) -> None:
+        if keyframe_every < 1:
+            raise ValueError(f"{keyframe_every=} must be positive")
+        self.game = pyspiel.load_game(game) if isinstance(game, str) else game
+        self.actions = list(actions)
+        self.keyframe_every = keyframe_every
+        self.seed = seed
+        self.fruits = None if fruits is None else [None if f is None else tuple(f) for f in fruits]
+        if self.fruits is not None and len(self.fruits) != len(self.actions) + 1:
+            raise ValueError(f"{len(self.fruits)} fruits recorded for {len(self.actions)} actions")
+
+        self._keyframes = []
+        self.players = []  # player to move before each ply
+
+        state = self._initial_state()
+        self.faithful = self.fruits is not None or not hasattr(state, "fruit")
+        if not self.faithful:
+            warnings.warn("Fruit was not recorded, the replay is not the played game")
+        for ply, action in enumerate(self.actions):
+            if state.is_terminal():
+                if self.faithful:
+                    raise ValueError(f"Game is over after {ply} plies, {len(self.actions)} actions given")
+                warnings.warn(f"Replayed game is over after {ply} plies, {len(self.actions)} actions given, "
+                              "dropping the rest")
+                del self.actions[ply:]
+                break
+            if ply % keyframe_every == 0:
+                self._keyframes.append(state.snapshot())
+            self.players.append(state.current_player())
+            self._apply(state, ply)
+        if len(self.actions) % keyframe_every == 0:
+            self._keyframes.append(state.snapshot())
+        self.returns = state.returns() if state.is_terminal() else None
+
+        self.ply = 0
+        self._state = None
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def _initial_state(self):
+        with _seeded(self.seed, -1):
+            state = self.game.new_initial_state()
+        if self.fruits is not None:
+            state.set_fruit(self.fruits[0])
+        return state
+
+    def _apply(self, state, ply: int) -> None:
+        fruit = getattr(state, "fruit", None)
+        with _seeded(self.seed, ply):
+            state.apply_action(self.actions[ply])
+        if self.fruits is None:
+            return
+        recorded = self.fruits[ply + 1]
+        # uneaten fruit stays where it is, eaten fruit respawns where it was recorded
+        if state.fruit == fruit and fruit != recorded:
+            raise ValueError(f"Replay diverged at ply {ply}: fruit on {fruit}, recorded {recorded}")
+        state.set_fruit(recorded)
+
+    def _check(self, ply: int) -> int:
+        if ply < 0:
+            ply += len(self) + 1
+        if not 0 <= ply <= len(self):
+            raise IndexError(f"{ply=} out of range [0, {len(self)}]")
+        return ply
+
+    def state_at(self, ply: int):
+        """Return a new state after the first `ply` actions (negative counts from the end)."""
+        ply = self._check(ply)
+        key = ply // self.keyframe_every
+        state = self._initial_state()
+        state.restore(self._keyframes[key])
+        for i in range(key * self.keyframe_every, ply):
+            self._apply(state, i)
+        return state
+
+    ############################################################################
+    ##                            CURSOR
+    ############################################################################
+
+    @property
+    def state(self):
+        """State at the cursor, do not modify it."""
+        if self._state is None:
+            self._state = self.state_at(self.ply)
+        return self._state
+
+    def seek(self, ply: int):
+        """Move the cursor to `ply` and return the state there."""
+        self.ply = self._check(ply)
+        self._state = None
+        return self.state
+
+    def forward(self):
+        """Step the cursor one ply forward, returns the new state."""
+        if self.ply >= len(self):
+            raise IndexError("Already at the end of the game")
+        if self._state is not None:
+            self._apply(self._state, self.ply)
+        self.ply += 1
+        return self.state
+
+    def backward(self):
+        """Step the cursor one ply back, returns the new state."""
+        if self.ply == 0:
+            raise IndexError("Already at the start of the game")
+        return self.seek(self.ply - 1)
+
+    ############################################################################
+    ##                            BATCHES
+    ############################################################################
+
+    def positions(self, plies: Iterable[int]) -> Iterator[tuple[int, object]]:
+        """
+        Yield (ply, state) for every requested ply, in increasing order.
+
+        Consecutive plies share one forward pass, each state is a new object.
+        """
+        state, at = None, None
+        for ply in sorted({self._check(p) for p in plies}):
+            if state is None or ply // self.keyframe_every != at // self.keyframe_every:
+                state, at = self.state_at(ply), ply
+            for i in range(at, ply):
+                self._apply(state, i)
+            at = ply
+            yield ply, state.clone()
+
+    def last_positions(self, plies: int, player: int = None):
+        """
+        Return (ply, state) of the final `plies` positions.
+
+        With `player` given, keep only positions where `player` is to move,
+        and only if `player` lost the game.
+        """
+        if player is not None and (self.returns is None or self.returns[player] >= 0):
+            return []
+        candidates = range(max(0, len(self) - plies), len(self))
+        if player is not None:
+            candidates = [p for p in candidates if self.players[p] == player]
+        return list(self.positions(candidates))
+
+
+def load_replays(game, path: str, column: str = "moves", **kwargs) -> list[tuple[dict, Replay]]:
+    """
+    Reconstruct all games of an evaluation csv.
+
+    Arguments
+    =========
+        game: pyspiel game (or its registered name)
+        path: csv file with a column of action lists
+        column: name of that column
+        kwargs: passed to `Replay`, recorded fruit is read from a `fruits` column
+
+    Returns
+    =======
+        list of (csv row, replay)
+    """
+    game = pyspiel.load_game(game) if isinstance(game, str) else game
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return [
+        (row, Replay(game, ast.literal_eval(row[column]), fruits=_fruits(row), **kwargs))
+        for row in rows
+    ]
+
+
+def _fruits(row: dict):
+    """Recorded fruit of an evaluation csv row, None if missing (older evaluations, TTT)."""
+    return ast.literal_eval(row["fruits"]) if row.get("fruits") else None
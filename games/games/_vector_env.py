@@ -0,0 +1,294 @@
+"""
+Many environments of a registered game stepped by worker processes.
+
+Every worker owns a contiguous slice of the environments and writes
+their observations, legal actions, rewards and done flags into shared
+memory, so a step only sends a short command per worker and nothing
+is pickled. Finished episodes are reset right away (auto-reset), their
+last observations are kept in `final_observations`.
+
+Games are sequential, an action is played by the current player of its
+environment. With an `opponent`, the workers play all other players
+themselves and the caller only ever acts as `player`.
+
+Usage
+=====
+    with VectorEnv("snakes", num_envs=64, num_workers=4, opponent=random_action) as env:
+        step = env.reset()
+        env.step_async(actions)   # one action per environment
+        ...                       # e.g. learn meanwhile
+        step = env.step_wait()
+
+    $ python -m games._vector_env   # steps per second
+"""
+import collections
+import multiprocessing as mp
+import os
+import random
+
+import numpy as np
+import pyspiel
+
+VectorStep = collections.namedtuple("VectorStep", [
+    "observations",  # (N, observation size) float32, for the current player
+    "legal_actions_mask",  # (N, num actions) bool, of the current player
+    "current_player",  # (N,) int32
+    "rewards",  # (N, num players) float32, returns of episodes finished by this step
+    "dones",  # (N,) bool, the episode finished (and the environment was reset)
+    "final_observations",  # (N, num players, observation size) float32, last state of finished episodes
+])
+
+
+################################################################################
+##                            SHARED MEMORY
+################################################################################
+
+def _fields(game, num_envs: int) -> dict:
+    obs_size = int(np.prod(game.observation_tensor_shape()))
+    players, actions = game.num_players(), game.num_distinct_actions()
+    return {
+        "observations": (np.float32, (num_envs, obs_size)),
+        "legal_actions_mask": (np.bool_, (num_envs, actions)),
+        "current_player": (np.int32, (num_envs,)),
+        "rewards": (np.float32, (num_envs, players)),
+        "dones": (np.bool_, (num_envs,)),
+        "final_observations": (np.float32, (num_envs, players, obs_size)),
+        "actions": (np.int64, (num_envs,)),
+    }
+
+
+class _SharedArrays:
+    """Named arrays in shared memory, views are created in the process using them."""
+
+    def __init__(self, fields: dict, ctx) -> None:
+        self.fields = fields
+        self._raw = {
+            name: ctx.RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            for name, (dtype, shape) in fields.items()
+        }
+        self._views = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_views"] = None
+        return state
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if self._views is None:
+            self._views = {
+                name: np.frombuffer(self._raw[name], dtype=dtype).reshape(shape)
+                for name, (dtype, shape) in self.fields.items()
+            }
+        return self._views[name]
+
+
+################################################################################
+##                            WORKER
+################################################################################
+
+def _worker(game_name, start, stop, arrays, conn, opponent, player, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    game = pyspiel.load_game(game_name)
+    states = [None] * (stop - start)
+    obs, mask, current = arrays["observations"], arrays["legal_actions_mask"], arrays["current_player"]
+    rewards, dones, final = arrays["rewards"], arrays["dones"], arrays["final_observations"]
+
+    def advance(state):
+        # the opponent moves until it is the turn of `player`
+        while opponent is not None and not state.is_terminal() and state.current_player() != player:
+            state.apply_action(opponent(state))
+
+    def reset(i):
+        state = states[i - start] = game.new_initial_state()
+        advance(state)
+        observe(i, state)
+
+    def observe(i, state):
+        p = state.current_player()
+        current[i] = p
+        obs[i] = state.observation_tensor(p)
+        mask[i] = False
+        mask[i, state.legal_actions(p)] = True
+
+    def step(i, action):
+        state = states[i - start]
+        state.apply_action(action)
+        advance(state)
+        dones[i] = state.is_terminal()
+        if not dones[i]:
+            rewards[i] = 0
+            observe(i, state)
+            return
+        rewards[i] = state.returns()
+        for p in range(game.num_players()):
+            final[i, p] = state.observation_tensor(p)
+        reset(i)
+
+    while True:
+        command = conn.recv()
+        if command == "close":
+            conn.close()
+            return
+        try:
+            if command == "reset":
+                rewards[start:stop], dones[start:stop] = 0, False
+                for i in range(start, stop):
+                    reset(i)
+            else:
+                for i, action in zip(range(start, stop), arrays["actions"][start:stop].tolist()):
+                    step(i, action)
+            conn.send(None)
+        except Exception as e:  # re-raised in the main process
+            conn.send(e)
+
+
+################################################################################
+##                            VECTOR ENV
+################################################################################
+
+class VectorEnv:
+    """
+    `num_envs` environments of a game, stepped by `num_workers` processes.
+
+    Arguments
+    =========
+        game_name: registered pyspiel game, e.g. "ttt" or "snakes"
+        num_envs: number of environments
+        num_workers: number of processes (at most `num_envs`), None for one per CPU
+        opponent: picklable function state -> action playing all players
+            but `player` inside the workers, None to act for every player
+        player: the player of the caller when playing against `opponent`
+        seed: seed of the workers (fruit, opponent), worker `w` uses `seed + w`
+        ctx: multiprocessing context, `spawn` by default
+    """
+
+    def __init__(self, game_name: str, num_envs: int, num_workers: int = None, opponent=None, player: int = 0,
+                 seed: int = 0, ctx=None) -> None:
+        ctx = ctx or mp.get_context("spawn")
+        game = pyspiel.load_game(game_name)
+        self.num_envs = num_envs
+        self.num_players = game.num_players()
+        self.num_actions = game.num_distinct_actions()
+        self._arrays = _SharedArrays(_fields(game, num_envs), ctx)
+        self._waiting = False
+
+        num_workers = min(num_workers or os.cpu_count(), num_envs)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int).tolist()
+        self._conns, self._workers = [], []
+        for w, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            conn, child = ctx.Pipe()
+            worker = ctx.Process(
+                target=_worker, args=(game_name, start, stop, self._arrays, child, opponent, player, seed + w),
+                daemon=True,
+            )
+            worker.start()
+            child.close()
+            self._conns.append(conn)
+            self._workers.append(worker)
+
+    def _send(self, command: str) -> None:
+        if self._waiting:
+            raise RuntimeError("Previous step was not collected by step_wait")
+        for conn in self._conns:
+            conn.send(command)
+        self._waiting = True
+
+    def _wait(self) -> VectorStep:
+        errors = []
+        for conn, worker in zip(self._conns, self._workers):
+            try:
+                errors.append(conn.recv())
+            except (EOFError, OSError):
+                worker.join(timeout=5)
+                raise RuntimeError(f"Worker {worker.name} died (exit code {worker.exitcode})") from None
+        self._waiting = False
+        for error in errors:
+            if error is not None:
+                raise error
+        return VectorStep(*(self._arrays[name].copy() for name in VectorStep._fields))
+
+    def reset(self) -> VectorStep:
+        """Start new episodes in all environments."""
+        self._send("reset")
+        return self._wait()
+
+    def step_async(self, actions) -> None:
+        """Start playing `actions` (one per environment), collect the result with `step_wait`."""
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs,):
+            raise ValueError(f"Expected {self.num_envs} actions, got shape {actions.shape}")
+        if self._waiting:
+            raise RuntimeError("Previous step was not collected by step_wait")
+        # checked before any environment is stepped, workers play whole slices
+        in_range = (actions >= 0) & (actions < self.num_actions)
+        legal = in_range & self._arrays["legal_actions_mask"][np.arange(self.num_envs), np.where(in_range, actions, 0)]
+        if not legal.all():
+            i = int(np.argmin(legal))
+            raise ValueError(f"Illegal action {actions[i]} in environment {i}")
+        self._arrays["actions"][:] = actions
+        self._send("step")
+
+    def step_wait(self) -> VectorStep:
+        """Wait for the step started by `step_async`."""
+        if not self._waiting:
+            raise RuntimeError("step_wait called without step_async")
+        return self._wait()
+
+    def step(self, actions) -> VectorStep:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self) -> None:
+        # also called by `__exit__` after a failure, must not raise over it
+        for conn in self._conns:
+            try:
+                if self._waiting:
+                    conn.recv()
+                conn.send("close")
+            except (EOFError, OSError):  # the worker died
+                pass
+            conn.close()
+        self._waiting = False
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._conns, self._workers = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    #     $ python -m games._vector_env
+    import time
+
+    def _sample(mask, rng):
+        # uniformly random legal action of every environment
+        return (rng.random(mask.shape) * mask).argmax(axis=1)
+
+    rng = np.random.default_rng(0)
+    for name in ["ttt", "snakes"]:
+        game = pyspiel.load_game(name)
+        states = [game.new_initial_state() for _ in range(64)]
+        start = time.perf_counter()
+        for _ in range(200):
+            for i, state in enumerate(states):
+                state.apply_action(random.choice(state.legal_actions()))
+                state.observation_tensor(0 if state.is_terminal() else state.current_player())
+                if state.is_terminal():
+                    states[i] = game.new_initial_state()
+        print(f"{name}: in process {64 * 200 / (time.perf_counter() - start):,.0f} steps/s")
+
+        for workers in sorted({1, os.cpu_count()}):
+            with VectorEnv(name, num_envs=64, num_workers=workers) as env:
+                step = env.reset()
+                start = time.perf_counter()
+                for _ in range(200):
+                    step = env.step(_sample(step.legal_actions_mask, rng))
+                seconds = time.perf_counter() - start
+            print(f"{name}: {workers} workers {64 * 200 / seconds:,.0f} steps/s")
@@ -0,0 +1,119 @@
+"""
+Headless recording of games into image sequences or animated files.
+
+Renderers draw into an offscreen `pygame.Surface` (no window needed) and
+redraw only the cells which changed since the previous frame.
+
+Usage
+=====
+    python -m games._video --game ttt --csv alpha_zero/eval/ttt/cnn.csv --rows 0 1 --out videos/
+"""
+import argparse
+import ast
+import csv
+import os
+
+import pygame
+
+
+class FrameWriter:
+    """
+    Write frames either as an image sequence or as an animated file.
+
+    Arguments
+    =========
+        path: `.gif` file (needs Pillow), a pattern such as
+            `frames/%05d.png`, or a folder (frames saved as `%05d.png`)
+        fps: frames per second of animated files
+    """
+
+    def __init__(self, path: str, fps: float = 4) -> None:
+        self.path = path
+        self.fps = fps
+        self.count = 0
+        self._frames = None
+
+        if path.lower().endswith(".gif"):
+            self._frames = []
+            self._pattern = None
+        elif "%" in path:
+            self._pattern = path
+        else:
+            self._pattern = os.path.join(path, "%05d.png")
+        os.makedirs(os.path.dirname(self._pattern or path) or ".", exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, surface: pygame.Surface) -> None:
+        if self._frames is not None:
+            self._frames.append((surface.get_size(), pygame.image.tobytes(surface, "RGB")))
+        else:
+            pygame.image.save(surface, self._pattern % self.count)
+        self.count += 1
+
+    def close(self) -> None:
+        if not self._frames:
+            return
+        try:
+            from PIL import Image
+        except ImportError as e:
+            raise ImportError("Writing .gif files requires Pillow (pip install pillow)") from e
+
+        images = [Image.frombytes("RGB", size, data) for size, data in self._frames]
+        # one palette for all frames, the last frame holds most of the colours
+        palette = images[-1].quantize(colors=64, dither=Image.Dither.NONE)
+        images = [image.quantize(palette=palette, dither=Image.Dither.NONE) for image in images]
+        images[0].save(
+            self.path, save_all=True, append_images=images[1:],
+            duration=int(1000 / self.fps), loop=0
+        )
+        self._frames = []
+
+
+def record(replay, renderer, writer: FrameWriter) -> int:
+    """
+    Play a `Replay` from its start, writing a frame whenever the board changes.
+
+    Returns
+    =======
+        number of written frames
+    """
+    renderer.draw(replay.seek(0))
+    writer.write(renderer.surface)
+    for _ in range(len(replay)):
+        if renderer.draw(replay.forward()):
+            writer.write(renderer.surface)
+    return writer.count
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--game", type=str, required=True, choices=["ttt", "snakes"], help="Registered game name")
+    parser.add_argument("--csv", type=str, required=True, metavar="FILE", help="Evaluation csv with a `moves` column")
+    parser.add_argument("--rows", type=int, nargs="*", default=None, metavar="N", help="Rows to render (default all)")
+    parser.add_argument("--out", type=str, required=True, metavar="DIR", help="Output folder")
+    parser.add_argument("--format", type=str, default="gif", choices=["gif", "png"], help="Animated file or image sequence")
+    parser.add_argument("--fps", type=float, default=4, metavar="F", help="Frames per second")
+    parser.add_argument("--seed", type=int, default=0, metavar="N", help="Seed of fruit spawns not recorded in the csv (snakes)")
+    return parser
+
+
+if __name__ == "__main__":
+    from . import snakes, tic_tac_toe, SNAKES_NAME, TTT_NAME
+    from ._replay import _fruits
+
+    args = make_parser().parse_args()
+    render_game = {TTT_NAME: tic_tac_toe.render_game, SNAKES_NAME: snakes.render_game}[args.game]
+    with open(args.csv, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for idx in args.rows if args.rows is not None else range(len(rows)):
+        actions = ast.literal_eval(rows[idx]["moves"])
+        name = f"{idx:05d}.gif" if args.format == "gif" else os.path.join(f"{idx:05d}", "%05d.png")
+        path = os.path.join(args.out, name)
+        kwargs = {"seed": args.seed, "fruits": _fruits(rows[idx])} if args.game == SNAKES_NAME else {}
+        frames = render_game(args.game, actions, path, fps=args.fps, **kwargs)
+        print(f"row {idx}: {frames} frames -> {path}")
@@ -1,3 +1,6 @@
 from ._pyspiel import register_pyspiel
+from ._multi_pyspiel import register_pyspiel_multi
 from ._game import Snakes
+from ._multi import MultiSnakes
 from ._interactive import play_pygame
+from ._render import render_game
@@ -2,6 +2,8 @@ import numpy as np
 from collections import deque
 import random
 
+from .._bits import as_rows, pack2, unpack2
+
 # directions
 NO_DIR = (0, 0)
 UP = (-1, 0)
@@ -23,6 +25,14 @@ PLAYER2_HEAD = -2
 FRUIT = 3
 PLAYERS = [PLAYER1, PLAYER2]
 
+# packing: velocity 0 is NO_DIR, else action + 1; body chains are actions
+_VELOCITY_CODE = { d: i for i, d in enumerate([NO_DIR] + ACTION_TO_DIR) }
+_DIRS = np.array(ACTION_TO_DIR)
+_DIR_CODE = np.zeros((3, 3), dtype=np.uint8)
+for _a, (_dy, _dx) in enumerate(ACTION_TO_DIR):
+    _DIR_CODE[_dy + 1, _dx + 1] = _a
+_NO_FRUIT = 255
+
 # helpers
 def _is_empty(x):
     return x == EMPTY
@@ -118,6 +128,19 @@ class Snakes:
         self.fruit = random.choice(positions)
         self.board[self.fruit] = FRUIT
 
+    def set_fruit(self, fruit) -> None:
+        """Move the fruit to `fruit` (y, x), or remove it (None), e.g. to replay a recorded game."""
+        if fruit is not None:
+            fruit = tuple(fruit)
+            y, x = fruit
+            if not (0 <= y < self.height and 0 <= x < self.width) or self.board[fruit] not in (EMPTY, FRUIT):
+                raise ValueError(f"Cannot put the fruit on {fruit}")
+        if self.fruit is not None and self.board[self.fruit] == FRUIT:
+            self.board[self.fruit] = EMPTY
+        self.fruit = fruit
+        if fruit is not None:
+            self.board[fruit] = FRUIT
+
     def _is_collision(self, y, x, ignore=None):
         if ignore is None:
             ignore = {}
@@ -163,6 +186,127 @@ class Snakes:
         self.board[snake[0]] = _head
         return False
 
+    def snapshot(self) -> tuple:
+        """Return compact immutable copy of the game, see `restore`."""
+        return (
+            self.board.astype(np.int8).tobytes(),
+            self.fruit,
+            tuple(self.velocities[p] for p in PLAYERS),
+            tuple(self.alive[p] for p in PLAYERS),
+            tuple(tuple(self.snakes[p]) for p in PLAYERS),
+        )
+
+    def restore(self, snapshot: tuple) -> None:
+        """Set the game to the position captured by `snapshot`."""
+        board, self.fruit, velocities, alive, snakes = snapshot
+        self.board = np.frombuffer(board, dtype=np.int8).reshape(self.height, self.width).astype(self.board.dtype)
+        self.velocities = dict(zip(PLAYERS, velocities))
+        self.alive = dict(zip(PLAYERS, alive))
+        self.snakes = { p: deque(body) for p, body in zip(PLAYERS, snakes) }
+
+    ############################################################################
+    ##                            PACKING
+    ############################################################################
+
+    @staticmethod
+    def _length_dtype(width: int, height: int):
+        return np.dtype(np.uint8 if width * height < 256 else "<u2")
+
+    @staticmethod
+    def packed_size(width: int, height: int) -> int:
+        """
+        Bytes of a packed game: fruit (y, x), then for every snake flags
+        (alive, head drawn, velocity), head (y + 1, x + 1), length and
+        the body as a chain of directions, 2 bits per segment.
+        """
+        chain = -(-(width * height - 1) // 4)
+        return 2 + NUM_PLAYERS * (3 + Snakes._length_dtype(width, height).itemsize + chain)
+
+    def _head_drawn(self, player: int) -> bool:
+        # a crashed head is not on the board
+        y, x = self.snakes[player][0]
+        return 0 <= y < self.height and 0 <= x < self.width and self.board[y, x] == player * 2
+
+    @staticmethod
+    def pack_many(games: list) -> np.ndarray:
+        """Pack games of the same size into a (N, `packed_size`) uint8 array."""
+        width, height = games[0].width, games[0].height
+        n, cells = len(games), width * height
+        parts = [np.array([g.fruit or (_NO_FRUIT, _NO_FRUIT) for g in games], dtype=np.uint8).reshape(n, 2)]
+
+        for p in PLAYERS:
+            flags = np.array([
+                g.alive[p] | g._head_drawn(p) << 1 | _VELOCITY_CODE[g.velocities[p]] << 2 for g in games
+            ], dtype=np.uint8)
+            heads = np.array([g.snakes[p][0] for g in games]) + 1
+            lengths = np.array([len(g.snakes[p]) for g in games], dtype=Snakes._length_dtype(width, height))
+            # all bodies as one array, a segment after the head is the direction from the previous one
+            segments = np.array([c for g in games for c in g.snakes[p]])
+            index = np.arange(len(segments)) - np.repeat(np.cumsum(lengths, dtype=np.int64) - lengths, lengths)
+            owner = np.repeat(np.arange(n), lengths)
+            tail = np.flatnonzero(index > 0)
+            deltas = segments[tail] - segments[tail - 1]
+            chains = np.zeros((n, cells - 1), dtype=np.uint8)
+            chains[owner[tail], index[tail] - 1] = _DIR_CODE[deltas[:, 0] + 1, deltas[:, 1] + 1]
+            parts += [flags.reshape(n, 1), heads.astype(np.uint8), lengths.view(np.uint8).reshape(n, -1), pack2(chains)]
+        return np.concatenate(parts, axis=1)
+
+    @classmethod
+    def unpack_many(cls, data, width: int, height: int) -> list["Snakes"]:
+        """Inverse of `pack_many`, `data` are packed rows (array or concatenated bytes)."""
+        data = as_rows(data, cls.packed_size(width, height))
+        length_dtype = cls._length_dtype(width, height)
+        n, cells = len(data), width * height
+        chain_bytes = -(-(cells - 1) // 4)
+
+        offset, players = 2, []
+        for p in PLAYERS:
+            flags = data[:, offset]
+            heads = data[:, offset + 1:offset + 3].astype(np.int64) - 1
+            offset += 3
+            lengths = np.ascontiguousarray(data[:, offset:offset + length_dtype.itemsize]).view(length_dtype)[:, 0]
+            offset += length_dtype.itemsize
+            codes = unpack2(data[:, offset:offset + chain_bytes], cells - 1)
+            offset += chain_bytes
+            # positions of all segments at once: head + running sum of directions
+            bodies = np.concatenate([heads[:, None], heads[:, None] + np.cumsum(_DIRS[codes], axis=1)], axis=1)
+            players.append((flags.tolist(), bodies, lengths.tolist()))
+
+        boards = np.full((n, height, width), EMPTY)
+        fruits = data[:, :2].tolist()
+        has_fruit = np.flatnonzero(data[:, 0] != _NO_FRUIT)
+        boards[has_fruit, data[has_fruit, 0], data[has_fruit, 1]] = FRUIT
+        for p, (_, bodies, lengths) in zip(PLAYERS, players):
+            owner, index = np.nonzero(np.arange(cells) < np.array(lengths)[:, None])
+            owner, index = owner[index > 0], index[index > 0]
+            boards[owner, bodies[owner, index, 0], bodies[owner, index, 1]] = p
+        for p, (flags, bodies, _) in zip(PLAYERS, players):
+            drawn = np.flatnonzero(np.array(flags) & 2)
+            boards[drawn, bodies[drawn, 0, 0], bodies[drawn, 0, 1]] = p * 2
+
+        games = []
+        for i in range(n):
+            game = cls.__new__(cls)
+            game.width, game.height = width, height
+            game.board = boards[i]
+            game.fruit = None if fruits[i][0] == _NO_FRUIT else tuple(fruits[i])
+            game.velocities, game.alive, game.snakes = {}, {}, {}
+            for p, (flags, bodies, lengths) in zip(PLAYERS, players):
+                game.alive[p] = bool(flags[i] & 1)
+                game.velocities[p] = ([NO_DIR] + ACTION_TO_DIR)[flags[i] >> 2]
+                game.snakes[p] = deque(map(tuple, bodies[i, :lengths[i]].tolist()))
+            games.append(game)
+        return games
+
+    def pack(self) -> bytes:
+        """Return the game as `packed_size` bytes, see `unpack`."""
+        return self.pack_many([self]).tobytes()
+
+    def unpack(self, data: bytes) -> None:
+        """Set the game to the packed position (of a game of the same size)."""
+        other = self.unpack_many(data, self.width, self.height)[0]
+        self.__dict__.update(other.__dict__)
+
     def is_game_over(self):
         return not all(self.alive.values())
 
@@ -3,6 +3,7 @@ import pygame
 import time
 import pyspiel
 from ._pyspiel import register_pyspiel
+from .._async_bot import BotWorker
 
 
 BLACK = (0, 0, 0)
@@ -14,6 +15,7 @@ PURPLE = (255, 0, 255)
 
 
 CELL_SIZE = 50
+FPS = 30
 COLORS = {
     EMPTY: BLACK,
     FRUIT: PURPLE,
@@ -25,7 +27,7 @@ COLORS = {
 
 
 class _InteractiveSnakes:
-    def __init__(self, game_name: str, player1, player2) -> None:
+    def __init__(self, game_name: str, player1, player2, time_budget=None) -> None:
         game = pyspiel.load_game(game_name)
         self.state = game.new_initial_state()
 
@@ -36,6 +38,8 @@ class _InteractiveSnakes:
         self.game = game
         self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
         self._players = [player1, player2]
+        self._workers = [None if p is None else BotWorker(p, time_budget) for p in self._players]
+        self._human_actions = [None, None]
 
     def is_terminal(self):
         return self.state.is_terminal()
@@ -54,50 +58,94 @@ class _InteractiveSnakes:
 
         pygame.display.update()
 
-    def next_move(self) -> None:
-        self.render()
-        human_actions = self._human_player()
-        for ac, p in zip(human_actions, self._players):
-            if p is None:
-                action = ac
-            else:
-                action = p(self.state)
-            print(["UP", "LEFT", "DOWN", "RIGHT"][action])
-            self.state.apply_action(action)
-        self.render()
+    def think(self):
+        """Let the bot on move start thinking, if it is not already."""
+        worker = self._workers[self.state.current_player()]
+        if worker is not None and not worker.busy:
+            worker.start(self.state)
+
+    def _tick_action(self, player):
+        """Action of `player` for the current tick, None if not known yet."""
+        worker = self._workers[player]
+        if worker is None:
+            return self._human_actions[player]
+        self.think()
+        return worker.poll()
+
+    def next_move(self) -> bool:
+        """Play one tick (both players) if ready, returns whether it was played."""
+        player = self.state.current_player()
+        action = self._tick_action(player)
+        if action is None:
+            return False
+        print(["UP", "LEFT", "DOWN", "RIGHT"][action])
+        self.state.apply_action(action)
+        if player == 1:
+            self.render()
+            return True
+        return self.next_move()
 
     def _human_player(self):
-        actions = [None, None]
-
         MAPPING = {
-            pygame.K_w: ("W", 0),
-            pygame.K_a: ("A", 0),
-            pygame.K_s: ("S", 0),
-            pygame.K_d: ("D", 0),
-
-            pygame.K_UP: ("W", 1),
-            pygame.K_LEFT: ("A", 1),
-            pygame.K_DOWN: ("S", 1),
-            pygame.K_RIGHT: ("D", 1),
+            pygame.K_w: (0, 0),
+            pygame.K_a: (1, 0),
+            pygame.K_s: (2, 0),
+            pygame.K_d: (3, 0),
+
+            pygame.K_UP: (0, 1),
+            pygame.K_LEFT: (1, 1),
+            pygame.K_DOWN: (2, 1),
+            pygame.K_RIGHT: (3, 1),
         }
 
         for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                raise RuntimeError("Closing the window during the game")
             if event.type == pygame.KEYDOWN and event.key in MAPPING:
                 action, player = MAPPING[event.key]
                 if self._players[player] is None:
-                    actions[player] = action
-        return actions
-
-
-def play_pygame(game: str, player1=None, player2=None, delay=0.05):
-    ip = _InteractiveSnakes(game, player1, player2)
+                    # the last key pressed before the tick counts
+                    self._human_actions[player] = action
+
+    def close(self):
+        for worker in self._workers:
+            if worker is not None:
+                worker.close()
+
+
+def play_pygame(game: str, player1=None, player2=None, delay=0.05, time_budget=None, fps=FPS):
+    """
+    Play snakes in a pygame window.
+
+    Arguments
+    =========
+        game: name of the registered pyspiel game
+        player1, player2: functions state -> action, None for human
+            (WASD for the first player, arrows for the second)
+        delay: seconds between two ticks of the game
+        time_budget: seconds per move of a bot, then a random move is played
+            (bots must accept a `cancel` keyword, see `BotWorker`)
+        fps: frame rate of rendering and input handling
+    """
+    ip = _InteractiveSnakes(game, player1, player2, time_budget)
     print("Initiated", ip)
     ip.render()
-    time.sleep(delay)
-    while not ip.is_terminal():
-        print(ip.state._game)
-        ip.next_move()
-        time.sleep(delay)
+    clock = pygame.time.Clock()
+    next_tick = time.monotonic() + delay
+    try:
+        while not ip.is_terminal():
+            ip._human_player()
+            # bots think during the whole tick, the state is stepped on time
+            if time.monotonic() >= next_tick and ip.next_move():
+                print(ip.state._game)
+                next_tick += delay
+                if next_tick < time.monotonic():  # a bot was late, do not catch up in a burst
+                    next_tick = time.monotonic() + delay
+            elif not ip.is_terminal():
+                ip.think()
+            clock.tick(fps)
+    finally:
+        ip.close()
     print(ip.state)
     print(ip.state.returns())
 
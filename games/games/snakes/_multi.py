@@ -0,0 +1,253 @@
+"""
+Snakes for N players on large boards.
+
+The rules are those of `Snakes` (which is the 2-player case): players
+move one after another, eating a fruit grows the snake, moving into a
+wall or a snake kills the moving snake, and a snake whose head ends on
+another snake (e.g. a head-on crash) dies as well. Dead snakes are
+removed from the board and the game ends when fewer than two survive.
+
+The board is an occupancy index: `owner[cell]` is the player occupying
+a cell (cells are `y * width + x`), `EMPTY` or `FRUIT`. A move, its
+collision check and the check against the other snakes are O(1) instead
+of scanning whole snakes, and fruit spawns on a uniformly random free
+cell kept in a list with O(1) insertion and removal.
+"""
+import random
+from collections import deque
+
+import numpy as np
+
+from ._game import ACTION_TO_DIR, ACTIONS, NO_DIR
+
+EMPTY = -1
+FRUIT = -2
+MAX_PLAYERS = 8
+
+
+def spawn_positions(width: int, height: int) -> list[tuple[int, int]]:
+    """Initial heads: the corners (as `Snakes`), then the middles of the sides."""
+    return [
+        (0, 0), (height - 1, width - 1), (0, width - 1), (height - 1, 0),
+        (0, width // 2), (height - 1, width // 2), (height // 2, 0), (height // 2, width - 1),
+    ]
+
+
+class MultiSnakes:
+    """
+    N-player Snakes.
+
+    Arguments
+    =========
+        width: width of the board
+        height: height of the board
+        num_players: number of snakes, 2 to `MAX_PLAYERS`
+        num_fruits: fruits kept on the board
+    """
+
+    def __init__(self, width: int, height: int, num_players: int = 4, num_fruits: int = 1) -> None:
+        if not 2 <= num_players <= MAX_PLAYERS:
+            raise ValueError(f"Between 2 and {MAX_PLAYERS} players are supported, got {num_players}")
+        self.width = width
+        self.height = height
+        self.num_players = num_players
+        self.num_fruits = num_fruits
+
+        cells = width * height
+        self.owner = [EMPTY] * cells
+        self._free = list(range(cells))
+        self._slot = list(range(cells))  # index of a cell in `_free`, -1 if not free
+        self.fruits = set()
+        self.velocities = [NO_DIR] * num_players
+        self.alive = [True] * num_players
+        self.snakes = []
+        for p, (y, x) in enumerate(spawn_positions(width, height)[:num_players]):
+            cell = y * width + x
+            self._take(cell, p)
+            self.snakes.append(deque([cell]))
+        self._spawn_fruits()
+
+    ############################################################################
+    ##                            OCCUPANCY
+    ############################################################################
+
+    def _take(self, cell: int, value: int) -> None:
+        """Occupy a free cell."""
+        i = self._slot[cell]
+        last = self._free.pop()
+        if last != cell:
+            self._free[i] = last
+            self._slot[last] = i
+        self._slot[cell] = -1
+        self.owner[cell] = value
+
+    def _release(self, cell: int) -> None:
+        self._slot[cell] = len(self._free)
+        self._free.append(cell)
+        self.owner[cell] = EMPTY
+
+    def _spawn_fruits(self) -> None:
+        while len(self.fruits) < self.num_fruits and self._free:
+            cell = random.choice(self._free)
+            self._take(cell, FRUIT)
+            self.fruits.add(cell)
+
+    def _target(self, player: int, action: int):
+        """Cell the head of `player` moves to with `action`, -1 outside of the board."""
+        dy, dx = ACTION_TO_DIR[action]
+        y, x = divmod(self.snakes[player][0], self.width)
+        y, x = y + dy, x + dx
+        return y * self.width + x if 0 <= y < self.height and 0 <= x < self.width else -1
+
+    def safe_actions(self, player: int) -> list[int]:
+        """Actions not moving into a wall or a snake right now (the own tail is safe)."""
+        tail = self.snakes[player][-1] if len(self.snakes[player]) > 1 else None
+        safe = []
+        for action in ACTIONS:
+            cell = self._target(player, action)
+            if cell >= 0 and (self.owner[cell] < 0 or cell == tail):
+                safe.append(action)
+        return safe
+
+    ############################################################################
+    ##                            GAME
+    ############################################################################
+
+    def make_move(self, player: int, action: int):
+        assert 0 <= player < self.num_players
+        assert action in ACTIONS
+        self.velocities[player] = ACTION_TO_DIR[action]
+
+    def _move_player(self, player: int):
+        """As `Snakes._move_player`, return the cell of the crash or None."""
+        velocity = self.velocities[player]
+        if velocity == NO_DIR:
+            return None
+        snake = self.snakes[player]
+        cell = self._target(player, ACTION_TO_DIR.index(velocity))
+
+        # eating, the snake grows without a collision check
+        if cell in self.fruits:
+            self.fruits.remove(cell)
+            self.owner[cell] = player
+            snake.appendleft(cell)
+            return None
+
+        # otherwise the tail is freed before checking collisions
+        snake.appendleft(cell)
+        self._release(snake.pop())
+        if cell < 0 or self.owner[cell] != EMPTY:
+            self.alive[player] = False
+            return cell
+        self._take(cell, player)
+        return None
+
+    def _remove(self, player: int) -> None:
+        for cell in self.snakes[player]:
+            if cell >= 0 and self.owner[cell] == player:
+                self._release(cell)
+
+    def step(self):
+        assert not self.is_game_over()
+        moving = [p for p in range(self.num_players) if self.alive[p]]
+        crashes = { p: self._move_player(p) for p in moving }
+
+        # a head on a cell where another snake crashed (into it) dies too
+        crashed_at = {}
+        for p, cell in crashes.items():
+            if cell is not None and cell >= 0:
+                crashed_at.setdefault(cell, set()).add(p)
+        for p in moving:
+            if self.alive[p] and crashed_at.get(self.snakes[p][0], set()) - {p}:
+                self.alive[p] = False
+
+        for p in moving:
+            if not self.alive[p]:
+                self._remove(p)
+        if not self.is_game_over():
+            self._spawn_fruits()
+
+    def is_game_over(self):
+        return sum(self.alive) < 2
+
+    def winner(self):
+        if not self.is_game_over() or not any(self.alive):
+            return None
+        return self.alive.index(True)
+
+    def returns(self) -> list[float]:
+        """
+        Zero-sum returns: the `s` surviving snakes split `(N - s) / (N - 1)`,
+        every dead snake gets `-1 / (N - 1)`; all zero if all or none survive.
+        """
+        n, s = self.num_players, sum(self.alive)
+        if s in (0, n):
+            return [0.0] * n
+        return [(n - s) / (s * (n - 1)) if a else -1 / (n - 1) for a in self.alive]
+
+    ############################################################################
+    ##                            VIEWS
+    ############################################################################
+
+    def positions(self, player: int) -> list[tuple[int, int]]:
+        """Cells of a snake as (y, x), head first."""
+        return [divmod(cell, self.width) for cell in self.snakes[player] if cell >= 0]
+
+    def planes(self, player: int) -> np.ndarray:
+        """
+        Observation of `player`, shape (2 * N + 1, height, width): bodies of
+        all players, their heads and fruits; players ordered from `player` on.
+        """
+        n = self.num_players
+        owner = np.array(self.owner).reshape(self.height, self.width)
+        planes = np.zeros((2 * n + 1, self.height, self.width), dtype=np.float32)
+        for k in range(n):
+            q = (player + k) % n
+            planes[k] = owner == q
+            if self.alive[q]:
+                y, x = divmod(self.snakes[q][0], self.width)
+                planes[k, y, x] = 0
+                planes[n + k, y, x] = 1
+        planes[2 * n] = owner == FRUIT
+        return planes
+
+    def to_str(self):
+        """Board with heads as `A`, `B`, ..., bodies as `a`, `b`, ... and fruits as `*`."""
+        chars = [" "] * len(self.owner)
+        for cell, value in enumerate(self.owner):
+            if value == FRUIT:
+                chars[cell] = "*"
+            elif value >= 0:
+                chars[cell] = chr(ord("a") + value)
+        for p, snake in enumerate(self.snakes):
+            if self.alive[p]:
+                chars[snake[0]] = chr(ord("A") + p)
+        lines = ["┏" + "━" * self.width + "┓"]
+        for y in range(self.height):
+            lines.append("┃" + "".join(chars[y * self.width:(y + 1) * self.width]) + "┃")
+        lines.append("┗" + "━" * self.width + "┛")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.height, self.width}, {self.num_players} players)\n{self.to_str()}"
+
+
+if __name__ == "__main__":
+    #     $ python -m games.snakes._multi
+    import time
+
+    random.seed(0)
+    for num_players, size in [(4, 30), (8, 40)]:
+        steps, start, lengths = 0, time.perf_counter(), []
+        for _ in range(20):
+            game = MultiSnakes(size, size, num_players, num_fruits=size)
+            while not game.is_game_over() and steps < 10**6:
+                for p in range(num_players):
+                    if game.alive[p]:
+                        game.make_move(p, random.choice(game.safe_actions(p) or ACTIONS))
+                game.step()
+                steps += 1
+            lengths.append(max(len(s) for s in game.snakes))
+        seconds = time.perf_counter() - start
+        print(f"{num_players} players on {size}x{size}: {steps / seconds:,.0f} steps/s, "
+              f"longest snakes {np.mean(lengths):.0f} cells on average")
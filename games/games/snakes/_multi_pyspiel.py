@@ -0,0 +1,147 @@
+import numpy as np
+import pyspiel
+from ._game import ACTIONS
+from ._multi import MultiSnakes
+
+
+def register_pyspiel_multi(width: int, height: int, num_players: int, name: str, max_moves: int = 100,
+                           num_fruits: int = 1):
+    """
+    Register N-player Snakes (see `MultiSnakes`) as a pyspiel game.
+
+    Players choose their moves one after another (dead players are
+    skipped), the snakes move once all alive players chose.
+
+    Arguments
+    =========
+        width: width of the game plan
+        height: height of the game plan
+        num_players: number of snakes
+        name: name of the pyspiel game
+        max_moves: moves of every snake until the game is over
+        num_fruits: fruits kept on the board
+
+    Returns
+    =======
+        nothing
+    """
+    _GAME_TYPE = pyspiel.GameType(
+        short_name=name,
+        long_name=name,
+
+        dynamics=pyspiel.GameType.Dynamics.SEQUENTIAL,
+        chance_mode=pyspiel.GameType.ChanceMode.SAMPLED_STOCHASTIC,
+        information=pyspiel.GameType.Information.IMPERFECT_INFORMATION,
+        utility=pyspiel.GameType.Utility.ZERO_SUM,
+        reward_model=pyspiel.GameType.RewardModel.TERMINAL,
+
+        max_num_players=num_players,
+        min_num_players=num_players,
+
+        provides_information_state_string=True,
+        provides_information_state_tensor=False,
+        provides_observation_string=True,
+        provides_observation_tensor=True,
+        parameter_specification={}
+    )
+
+    _GAME_INFO = pyspiel.GameInfo(
+        num_distinct_actions=len(ACTIONS),
+        max_chance_outcomes=0,
+        num_players=num_players,
+        min_utility=-1.0,
+        max_utility=1.0,
+        utility_sum=0.0,
+        max_game_length=max_moves * num_players
+    )
+
+    class _MultiSnakeGame(pyspiel.Game):
+        def __init__(self, params=None):
+            super().__init__(_GAME_TYPE, _GAME_INFO, params or dict())
+
+        def new_initial_state(self):
+            """Returns a state corresponding to the start of a game."""
+            return _MultiSnakeState(self)
+
+        def make_py_observer(self, iig_obs_type=None, params=None):
+            """Returns an object used for observing game state."""
+            _iig = iig_obs_type or pyspiel.IIGObservationType(perfect_recall=False)
+            return _MultiSnakeObserver(_iig, params)
+
+    class _MultiSnakeState(pyspiel.State):
+        def __init__(self, game):
+            super().__init__(game)
+            self._game = MultiSnakes(width, height, num_players, num_fruits)
+            self.player = 0
+            self._move_num = 0
+
+        def current_player(self):
+            if self.is_terminal():
+                return pyspiel.PlayerId.TERMINAL
+            return self.player
+
+        def _legal_actions(self, player):
+            del player
+            return ACTIONS
+
+        def _apply_action(self, action: int):
+            assert not self._game.is_game_over()
+            self._game.make_move(self.player, action)
+            # the next alive player, or all snakes move
+            alive = self._game.alive
+            later = [p for p in range(self.player + 1, num_players) if alive[p]]
+            if later:
+                self.player = later[0]
+                return
+            self._move_num += 1
+            self._game.step()
+            self.player = self._game.alive.index(True) if any(self._game.alive) else 0
+
+        def is_terminal(self):
+            return self._game.is_game_over() or self._move_num >= max_moves
+
+        def returns(self):
+            if not self.is_terminal():
+                return [0.0] * num_players
+            return self._game.returns()
+
+        def _action_to_string(self, player, action):
+            return f"{player}:{'WASD'[action]}"
+
+        def __str__(self):
+            return str(self._game)
+
+    class _MultiSnakeObserver:
+        def __init__(self, iig_obs_type, params):
+            """Initializes an empty observation tensor."""
+            if params:
+                raise ValueError(f"Observation parameters not supported; passed {params}")
+            # dimensions, players ordered from the observing one:
+            #   0 .. N-1   - bodies
+            #   N .. 2N-1  - heads
+            #   2N         - fruit
+            shape = (2 * num_players + 1, height, width)
+            self.tensor = np.zeros(np.prod(shape), np.float32)
+            self.dict = { "observation": np.reshape(self.tensor, shape) }
+
+        def set_from(self, state: _MultiSnakeState, player):
+            """Updates `tensor` and `dict` to reflect `state` from PoV of `player`."""
+            self.dict["observation"][:] = state._game.planes(player)
+
+        def string_from(self, state, player):
+            """Observation of `state` from the PoV of `player`, as a string."""
+            return str(state)
+
+    pyspiel.register_game(_GAME_TYPE, _MultiSnakeGame)
+
+
+if __name__ == "__main__":
+    register_pyspiel_multi(12, 12, 4, "snakes-4")
+    game = pyspiel.load_game("snakes-4")
+
+    state = game.new_initial_state()
+    while not state.is_terminal():
+        action = np.random.choice(state._game.safe_actions(state.current_player()) or ACTIONS)
+        state.apply_action(action)
+    print(state)
+    print(state.returns())
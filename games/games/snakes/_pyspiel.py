@@ -1,6 +1,8 @@
+import base64
 import numpy as np
 import pyspiel
-from ._game import Snakes, ACTIONS, PLAYER1, PLAYER2, PLAYER1_HEAD, PLAYER2_HEAD, FRUIT
+from ._game import Snakes, ACTIONS, ACTION_TO_DIR, PLAYER1, PLAYER2, PLAYER1_HEAD, PLAYER2_HEAD, FRUIT
+from ._vector import random_rollouts
 
 
 _MAX_MOVES = 100
@@ -62,16 +64,29 @@ def register_pyspiel(width: int, height: int, name: str):
             """Returns a state corresponding to the start of a game."""
             return _SnakeState(self)
 
+        def unpack_state(self, data):
+            """Returns a state from `_SnakeState.pack` (without action history)."""
+            state = _SnakeState(self)
+            state.unpack(data)
+            return state
+
+        def deserialize_state(self, data):
+            """Returns a state from `serialize` (base64 text) or `games.serialize_states` (bytes)."""
+            from .._serialize import deserialize_state
+            if isinstance(data, str):
+                data = base64.b64decode(data)
+            return deserialize_state(self, data)
+
         def make_py_observer(self, iig_obs_type=None, params=None):
             """Returns an object used for observing game state."""
             _iig = iig_obs_type or pyspiel.IIGObservationType(perfect_recall=False)
             return _SnakeObserver(_iig, params)
 
     class _SnakeState(pyspiel.State):
-        def __init__(self, game):
+        def __init__(self, game, engine=None):
             super().__init__(game)
             self._game_over = False
-            self._game = Snakes(width, height)
+            self._game = Snakes(width, height) if engine is None else engine
             self.player = 0
             self._move_num = 0
 
@@ -108,6 +123,41 @@ def register_pyspiel(width: int, height: int, name: str):
                 p1 = -1
             return [p1, -p1]
 
+        @property
+        def fruit(self):
+            """Position (y, x) of the fruit, None if there is none."""
+            return self._game.fruit
+
+        def set_fruit(self, fruit):
+            """Move the fruit to a recorded position, see `Snakes.set_fruit`."""
+            self._game.set_fruit(fruit)
+
+        def snapshot(self):
+            return self.player, self._move_num, self._game.snapshot()
+
+        def restore(self, snapshot):
+            self.player, self._move_num, game = snapshot
+            self._game.restore(game)
+
+        def pack(self):
+            return bytes([self.player, self._move_num]) + self._game.pack()
+
+        def serialize(self):
+            """Versioned binary state (see `games.serialize_states`) as base64 text, without action history."""
+            from .._serialize import serialize_state
+            return base64.b64encode(serialize_state(self)).decode("ascii")
+
+        def rollout_returns(self, num_rollouts, rng):
+            """Returns of `num_rollouts` random playouts from this state, shape (num_rollouts, 2)."""
+            first_action = None
+            if self.player == 1:
+                first_action = ACTION_TO_DIR.index(self._game.velocities[PLAYER1])
+            return random_rollouts(self._game, num_rollouts, rng, _MAX_MOVES - self._move_num, first_action)
+
+        def unpack(self, data):
+            self.player, self._move_num = data[0], data[1]
+            self._game.unpack(data[2:])
+
         def _action_to_string(self, player, action):
             return f"{player}:{'WASD'[action]}"
 
@@ -0,0 +1,60 @@
+import numpy as np
+import pygame
+from .._replay import Replay
+from .._video import FrameWriter, record
+from ._interactive import CELL_SIZE, COLORS
+
+
+class SnakesRenderer:
+    """Offscreen renderer redrawing only the cells which changed."""
+
+    def __init__(self, height: int, width: int, cell_size: int = CELL_SIZE) -> None:
+        self.cell_size = cell_size
+        self.surface = pygame.Surface((width * cell_size, height * cell_size))
+        self._board = None
+
+    def draw(self, state) -> list:
+        """Update the surface to `state`, return the list of dirty rects."""
+        board = state._game.board
+        if self._board is None:
+            changed = np.argwhere(np.ones_like(board, dtype=bool))
+        else:
+            changed = np.argwhere(board != self._board)
+
+        dirty = []
+        for y, x in changed:
+            rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+            self.surface.fill(COLORS[board[y, x]], rect)
+            dirty.append(rect)
+        self._board = board.copy()
+        return dirty
+
+
+def render_game(game: str, actions: list, path: str, fps: float = 4, cell_size: int = CELL_SIZE, seed: int = 0,
+                fruits: list = None) -> int:
+    """
+    Render a recorded game without opening a window.
+
+    Fruit spawns are random: pass the recorded `fruits` (see `Replay`) to
+    render the played game. Without them, fruit spawns from `seed`, the
+    video is a different game (with a warning) and ends where that game does.
+
+    Arguments
+    =========
+        game: name of the registered pyspiel game
+        actions: recorded actions (as in the `moves` column of evaluations)
+        path: `.gif` file, image pattern (`frames/%05d.png`) or a folder
+        fps: frames per second of animated files
+        cell_size: size of one cell in pixels
+        seed: seed of fruit spawns which were not recorded
+        fruits: recorded fruit of every position (the `fruits` column of evaluations)
+
+    Returns
+    =======
+        number of written frames
+    """
+    replay = Replay(game, actions, seed=seed, fruits=fruits)
+    snakes = replay.state._game
+    renderer = SnakesRenderer(snakes.height, snakes.width, cell_size)
+    with FrameWriter(path, fps) as writer:
+        return record(replay, renderer, writer)
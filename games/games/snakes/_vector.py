@@ -0,0 +1,129 @@
+"""
+Random playouts of many copies of one position at once.
+
+The copies step together: boards are one (K, cells) array and every
+snake is a ring buffer of cells per copy, so a move of all copies
+is a handful of fancy-indexed updates following `Snakes._move_player`
+and `Snakes.step`. Finished copies are dropped from the active set.
+"""
+import numpy as np
+
+from ._game import ACTION_TO_DIR, EMPTY, FRUIT, PLAYERS, Snakes
+
+_WALL = 4  # border around the board, a collision like a snake
+
+
+class _Copies:
+    """
+    K copies of a game as arrays, player `i` is `PLAYERS[i]`.
+
+    Boards get a border of `_WALL` cells and are flattened, so a position
+    is one index and a move adds the offset of its direction.
+    """
+
+    def __init__(self, game: Snakes, k: int) -> None:
+        self.stride = game.width + 2
+        self.capacity = game.height * game.width + 1
+        self.offsets = np.array([dy * self.stride + dx for dy, dx in ACTION_TO_DIR])
+        board = np.full((game.height + 2, self.stride), _WALL, dtype=np.int8)
+        board[1:-1, 1:-1] = game.board
+        self.board = np.repeat(board.reshape(1, -1), k, axis=0)
+        self.body = np.zeros((k, len(PLAYERS), self.capacity), dtype=np.int64)
+        self.head = np.zeros((k, len(PLAYERS)), dtype=np.int64)
+        self.length = np.zeros((k, len(PLAYERS)), dtype=np.int64)
+        for i, p in enumerate(PLAYERS):
+            self.body[:, i, :len(game.snakes[p])] = [self.cell(y, x) for y, x in game.snakes[p]]
+            self.length[:, i] = len(game.snakes[p])
+        self.alive = np.tile([game.alive[p] for p in PLAYERS], (k, 1))
+        self.fruit = np.full(k, -1 if game.fruit is None else self.cell(*game.fruit), dtype=np.int64)
+
+    def cell(self, y: int, x: int) -> int:
+        return (y + 1) * self.stride + x + 1
+
+    def move(self, idx, i: int, actions) -> None:
+        """As `Snakes._move_player` of player `i` in copies `idx`."""
+        player = PLAYERS[i]
+        head = self.head[idx, i]
+        old = self.body[idx, i, head]
+        new = old + self.offsets[actions]
+        head = (head - 1) % self.capacity
+        self.body[idx, i, head] = new
+        self.head[idx, i] = head
+
+        # eating: the snake grows, no collision check
+        eat = self.fruit[idx] == new
+        if eat.any():
+            e = idx[eat]
+            self.board[e, old[eat]] = player
+            self.board[e, new[eat]] = player * 2
+            self.length[e, i] += 1
+            self.fruit[e] = -1
+            idx, old, new, head = idx[~eat], old[~eat], new[~eat], head[~eat]
+
+        # otherwise the old head becomes body and the tail is freed before checking collisions
+        tail = self.body[idx, i, (head + self.length[idx, i]) % self.capacity]
+        self.board[idx, old] = player
+        self.board[idx, tail] = EMPTY
+        target = self.board[idx, new]
+        ok = (target == EMPTY) | (target == FRUIT)
+        self.alive[idx[~ok], i] = False
+        self.board[idx[ok], new[ok]] = player * 2
+
+    def head_in_body(self, idx, i: int, j: int):
+        """Whether the head of player `i` lies on the snake of player `j`, in copies `idx`."""
+        head = self.body[idx, i, self.head[idx, i]]
+        offsets = np.arange(self.capacity)
+        slots = (self.head[idx, j][:, None] + offsets) % self.capacity
+        hit = (self.body[idx[:, None], j, slots] == head[:, None]) & (offsets < self.length[idx, j][:, None])
+        return hit.any(axis=1)
+
+    def spawn_fruit(self, idx, rng) -> None:
+        """As `Snakes._spawn_fruit`, a uniformly random empty cell (if any)."""
+        empty = self.board[idx] == EMPTY
+        cell = (rng.random(empty.shape) * empty).argmax(axis=1)
+        has = empty.any(axis=1)
+        idx, cell = idx[has], cell[has]
+        self.fruit[idx] = cell
+        self.board[idx, cell] = FRUIT
+
+
+def random_rollouts(game: Snakes, num_rollouts: int, rng, max_steps: int, first_action: int = None) -> np.ndarray:
+    """
+    Play `num_rollouts` random continuations of `game`, both snakes pick uniformly random actions.
+
+    Arguments
+    =========
+        game: position to start from
+        num_rollouts: number of playouts
+        rng: numpy `Generator` or `RandomState`
+        max_steps: steps until the game is a draw
+        first_action: action already chosen by `PLAYERS[0]` for the first step
+
+    Returns
+    =======
+        (num_rollouts, 2) returns of `PLAYERS`, +1 for the only surviving snake
+    """
+    copies = _Copies(game, num_rollouts)
+    active = np.full(num_rollouts, not game.is_game_over())
+    for step in range(max_steps):
+        idx = np.flatnonzero(active)
+        if not len(idx):
+            break
+        actions = (rng.random((len(idx), len(PLAYERS))) * len(ACTION_TO_DIR)).astype(np.int64)
+        if step == 0 and first_action is not None:
+            actions[:, 0] = first_action
+
+        for i in range(len(PLAYERS)):
+            copies.move(idx, i, actions[:, i])
+        crashed = [copies.head_in_body(idx, i, 1 - i) for i in range(len(PLAYERS))]
+        for i, hit in enumerate(crashed):
+            copies.alive[idx[hit], i] = False
+
+        over = ~copies.alive[idx].all(axis=1)
+        active[idx[over]] = False
+        running = idx[~over]
+        copies.spawn_fruit(running[copies.fruit[running] < 0], rng)
+
+    first = copies.alive[:, 0].astype(int) - copies.alive[:, 1].astype(int)
+    # a draw if both (or neither) survived
+    return np.stack([first, -first], axis=1)
@@ -1,6 +1,7 @@
 from ._game import TTT
 from ._pyspiel import register_pyspiel
 from ._interactive import play_pygame
+from ._render import render_game
 
 
-__all__ = ["TTT", "register_pyspiel", "play_pygame"]
+__all__ = ["TTT", "register_pyspiel", "play_pygame", "render_game"]
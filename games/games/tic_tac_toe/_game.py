@@ -1,6 +1,8 @@
 import numpy as np
 from typing import Iterable
 
+from .._bits import as_rows, pack2, unpack2
+
 EMPTY = 2
 PLAYERS_STR = ['X', 'O', ' ']
 
@@ -81,6 +83,68 @@ class TTT:
 
         self._next_player = 1 - self._next_player
 
+    def snapshot(self) -> tuple:
+        """Return compact immutable copy of the game, see `restore`."""
+        return (self.board.astype(np.int8).tobytes(), self._next_player, tuple(self._scores), self._moves_played)
+
+    def restore(self, snapshot: tuple) -> None:
+        """Set the game to the position captured by `snapshot`."""
+        board, self._next_player, scores, self._moves_played = snapshot
+        self.board = np.frombuffer(board, dtype=np.int8).reshape(self._rows, self._cols).astype(self.board.dtype)
+        self._scores = list(scores)
+
+    ############################################################################
+    ##                            PACKING
+    ############################################################################
+
+    @staticmethod
+    def _score_dtype(rows: int, cols: int):
+        # every move completes at most 4 lines
+        return np.dtype(np.uint8 if 4 * rows * cols < 256 else "<u2")
+
+    @staticmethod
+    def packed_size(rows: int, cols: int) -> int:
+        """Bytes of a packed game: side to move, both scores, 2 bits per cell."""
+        return 1 + 2 * TTT._score_dtype(rows, cols).itemsize + -(-rows * cols // 4)
+
+    @staticmethod
+    def pack_many(games: list) -> np.ndarray:
+        """Pack games of the same size into a (N, `packed_size`) uint8 array."""
+        rows, cols = games[0]._rows, games[0]._cols
+        n = len(games)
+        header = np.array([g._next_player for g in games], dtype=np.uint8).reshape(n, 1)
+        scores = np.array([g._scores for g in games], dtype=TTT._score_dtype(rows, cols)).view(np.uint8).reshape(n, -1)
+        boards = pack2(np.stack([g.board.reshape(-1) for g in games]))
+        return np.concatenate([header, scores, boards], axis=1)
+
+    @classmethod
+    def unpack_many(cls, data, rows: int, cols: int, to_connect: int) -> list["TTT"]:
+        """Inverse of `pack_many`, `data` are packed rows (array or concatenated bytes)."""
+        dtype = cls._score_dtype(rows, cols)
+        data = as_rows(data, cls.packed_size(rows, cols))
+        scores = np.ascontiguousarray(data[:, 1:1 + 2 * dtype.itemsize]).view(dtype).tolist()
+        boards = unpack2(data[:, 1 + 2 * dtype.itemsize:], rows * cols).astype(int).reshape(-1, rows, cols)
+        moves = (boards != EMPTY).sum(axis=(1, 2)).tolist()
+
+        games = []
+        for next_player, score, board, moves_played in zip(data[:, 0].tolist(), scores, boards, moves):
+            game = cls(rows, cols, to_connect)
+            game._next_player = next_player
+            game._scores = score
+            game._moves_played = moves_played
+            game.board = board
+            games.append(game)
+        return games
+
+    def pack(self) -> bytes:
+        """Return the game as `packed_size` bytes, see `unpack`."""
+        return self.pack_many([self]).tobytes()
+
+    def unpack(self, data: bytes) -> None:
+        """Set the game to the packed position (of a game of the same size)."""
+        other = self.unpack_many(data, self._rows, self._cols, self.to_connect)[0]
+        self.__dict__.update(other.__dict__)
+
     def legal_actions(self) -> Iterable[tuple[int, int]]:
         """
         Return list of legal actions for current player.
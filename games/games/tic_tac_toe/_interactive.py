@@ -2,11 +2,13 @@ import time
 import pygame
 from ._game import EMPTY, PLAYERS_STR, TTT
 from ._pyspiel import register_pyspiel
+from .._async_bot import BotWorker
 import pyspiel
 
 
 CELL_SIZE = 100
 FONT_SIZE = 50
+FPS = 30
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
@@ -16,7 +18,7 @@ COLORS = [RED, BLUE, WHITE]
 
 
 class _InteractivePlay:
-    def __init__(self, game_name: str, player1 = None, player2 = None, delay = 0):
+    def __init__(self, game_name: str, player1 = None, player2 = None, delay = 0, time_budget = None):
         game = pyspiel.load_game(game_name)
         self.state = game.new_initial_state()
         self.rows = self.state._game._rows
@@ -30,6 +32,9 @@ class _InteractivePlay:
         self.font = pygame.font.Font(None, FONT_SIZE)
         self._delay = delay
         self._players = [player1, player2]
+        self._workers = [None if p is None else BotWorker(p, time_budget) for p in self._players]
+        self._click = None
+        self._hold_until = 0
         self.game = game
 
     def is_terminal(self):
@@ -61,43 +66,75 @@ class _InteractivePlay:
         # Update the display
         pygame.display.update()
 
-    def next_move(self) -> None:
-        self._update_display()
+    def next_move(self) -> bool:
+        """Play the next move if it is known, returns whether it was played."""
+        self._handle_events()
+        if time.monotonic() < self._hold_until:
+            return False
+
         player_to_play = self.state._game._next_player
         assert player_to_play in (0, 1)
-        play_fn = self._players[player_to_play]
+        worker = self._workers[player_to_play]
 
-        if play_fn is not None:
-            action = play_fn(self.state)
+        if worker is not None:
+            if not worker.busy:
+                worker.start(self.state)
+            action = worker.poll()
         else:
-            action = self._get_human_action()
+            action, self._click = self._click, None
+            if action is not None and action not in self.state.legal_actions():
+                action = None
 
+        if action is None:
+            return False
         self.state.apply_action(action)
         self._update_display()
-        if self._delay > 0:
-            time.sleep(self._delay)
-
-    def _get_human_action(self):
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    raise RuntimeError("Closing the window during the game")
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = event.pos
-                    row = y // CELL_SIZE
-                    col = x // CELL_SIZE
-
-                    # Check if the click was within the grid
-                    if row < self.rows and col < self.cols:
-                        if self.state.board[row, col] == EMPTY:
-                            action = self.state.pos2action((row, col))
-                            return action
-
-
-def play_pygame(game: str, player1=None, player2=None, delay=0):
-    igame = _InteractivePlay(game, player1, player2, delay)
-    while not igame.is_terminal():
-        igame.next_move()
+        self._hold_until = time.monotonic() + self._delay
+        return True
+
+    def _handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                raise RuntimeError("Closing the window during the game")
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                x, y = event.pos
+                row = y // CELL_SIZE
+                col = x // CELL_SIZE
+
+                # Check if the click was within the grid, clicks made while
+                # the bot thinks are kept for the next human move
+                if row < self.rows and col < self.cols:
+                    if self.state.board[row, col] == EMPTY:
+                        self._click = self.state.pos2action((row, col))
+
+    def close(self):
+        for worker in self._workers:
+            if worker is not None:
+                worker.close()
+
+
+def play_pygame(game: str, player1=None, player2=None, delay=0, time_budget=None, fps=FPS):
+    """
+    Play tic-tac-toe in a pygame window.
+
+    Arguments
+    =========
+        game: name of the registered pyspiel game
+        player1, player2: functions state -> action, None for human (mouse)
+        delay: seconds to pause after each move
+        time_budget: seconds per move of a bot, then a random move is played
+            (bots must accept a `cancel` keyword, see `BotWorker`)
+        fps: frame rate of rendering and input handling
+    """
+    igame = _InteractivePlay(game, player1, player2, delay, time_budget)
+    igame._update_display()
+    clock = pygame.time.Clock()
+    try:
+        while not igame.is_terminal():
+            igame.next_move()
+            clock.tick(fps)
+    finally:
+        igame.close()
     print(igame.state)
     print(igame.state.returns())
 
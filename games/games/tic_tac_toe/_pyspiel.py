@@ -1,6 +1,8 @@
+import base64
 import numpy as np
 import pyspiel
 from ._game import PLAYERS_STR, TTT, EMPTY
+from ._vector import random_rollouts
 
 
 def register_pyspiel(rows: int, cols: int, to_connect: int, name: str):
@@ -65,16 +67,29 @@ def register_pyspiel(rows: int, cols: int, to_connect: int, name: str):
             """Returns a state corresponding to the start of a game."""
             return _TTTState(self)
 
+        def unpack_state(self, data):
+            """Returns a state from `_TTTState.pack` (without action history)."""
+            state = _TTTState(self)
+            state.unpack(data)
+            return state
+
+        def deserialize_state(self, data):
+            """Returns a state from `serialize` (base64 text) or `games.serialize_states` (bytes)."""
+            from .._serialize import deserialize_state
+            if isinstance(data, str):
+                data = base64.b64decode(data)
+            return deserialize_state(self, data)
+
         def make_py_observer(self, iig_obs_type=None, params=None):
             """Returns an object used for observing game state."""
             _iig = iig_obs_type or pyspiel.IIGObservationType(perfect_recall=False)
             return TTTObserver(_iig, params)
 
     class _TTTState(pyspiel.State):
-        def __init__(self, game):
+        def __init__(self, game, engine=None):
             super().__init__(game)
             self._game_over = False
-            self._game = TTT(rows, cols, to_connect)
+            self._game = TTT(rows, cols, to_connect) if engine is None else engine
 
         def current_player(self):
             if self._game_over:
@@ -109,6 +124,31 @@ def register_pyspiel(rows: int, cols: int, to_connect: int, name: str):
         def _action_to_string(self, player, action):
             return f"{PLAYERS_STR[player]}{self.action2pos(action)}"
 
+        def snapshot(self):
+            return self._game_over, self._game.snapshot()
+
+        def restore(self, snapshot):
+            self._game_over, game = snapshot
+            self._game.restore(game)
+
+        def pack(self):
+            return bytes([self._game_over]) + self._game.pack()
+
+        def serialize(self):
+            """Versioned binary state (see `games.serialize_states`) as base64 text, without action history."""
+            from .._serialize import serialize_state
+            return base64.b64encode(serialize_state(self)).decode("ascii")
+
+        def rollout_returns(self, num_rollouts, rng):
+            """Returns of `num_rollouts` random playouts from this state, shape (num_rollouts, 2)."""
+            scores = random_rollouts(self._game, num_rollouts, rng)
+            p1 = np.sign(scores[:, 0] - scores[:, 1])
+            return np.stack([p1, -p1], axis=1)
+
+        def unpack(self, data):
+            self._game_over = bool(data[0])
+            self._game.unpack(data[1:])
+
         @property
         def board(self):
             return self._game.board
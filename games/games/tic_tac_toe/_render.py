@@ -0,0 +1,87 @@
+import numpy as np
+import pygame
+from .._replay import Replay
+from .._video import FrameWriter, record
+from ._interactive import BLACK, CELL_SIZE, COLORS, FONT_SIZE, SYMBOLS, WHITE
+
+
+class TTTRenderer:
+    """
+    Offscreen renderer redrawing only the cells which changed.
+
+    Rendered symbols are cached, so each glyph is rasterised only once.
+    """
+
+    def __init__(self, rows: int, cols: int, cell_size: int = CELL_SIZE, font_size: int = FONT_SIZE) -> None:
+        pygame.font.init()
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.width = cols * cell_size + 2 * cell_size
+        self.height = rows * cell_size
+        self.surface = pygame.Surface((self.width, self.height))
+        self.surface.fill(WHITE)
+        self.font = pygame.font.Font(None, font_size)
+        self._glyphs = {}
+        self._board = None
+        self._score = None
+
+    def _glyph(self, text, color) -> pygame.Surface:
+        key = (text, color)
+        if key not in self._glyphs:
+            self._glyphs[key] = self.font.render(str(text), True, color)
+        return self._glyphs[key]
+
+    def _blit_centered(self, text, color, cx, cy):
+        glyph = self._glyph(text, color)
+        self.surface.blit(glyph, glyph.get_rect(center=(cx, cy)))
+
+    def draw(self, state) -> list:
+        """Update the surface to `state`, return the list of dirty rects."""
+        board = state.board
+        if self._board is None:
+            changed = np.argwhere(np.ones_like(board, dtype=bool))
+        else:
+            changed = np.argwhere(board != self._board)
+
+        cs = self.cell_size
+        dirty = []
+        for row, col in changed:
+            rect = pygame.Rect(col * cs, row * cs, cs, cs)
+            self.surface.fill(WHITE, rect)
+            pygame.draw.rect(self.surface, BLACK, rect, width=1)
+            self._blit_centered(SYMBOLS[board[row, col]], COLORS[board[row, col]], rect.centerx, rect.centery)
+            dirty.append(rect)
+        self._board = board.copy()
+
+        score = f"{state._game._scores[0]}-{state._game._scores[1]}"
+        if score != self._score:
+            rect = pygame.Rect(self.width - cs, 0, cs, self.height)
+            self.surface.fill(BLACK, rect)
+            self._blit_centered(score, WHITE, rect.centerx, rect.centery)
+            dirty.append(rect)
+            self._score = score
+        return dirty
+
+
+def render_game(game: str, actions: list, path: str, fps: float = 4, cell_size: int = CELL_SIZE) -> int:
+    """
+    Render a recorded game without opening a window.
+
+    Arguments
+    =========
+        game: name of the registered pyspiel game
+        actions: recorded actions (as in the `moves` column of evaluations)
+        path: `.gif` file, image pattern (`frames/%05d.png`) or a folder
+        fps: frames per second of animated files
+        cell_size: size of one cell in pixels
+
+    Returns
+    =======
+        number of written frames
+    """
+    replay = Replay(game, actions)
+    ttt = replay.state._game
+    renderer = TTTRenderer(ttt._rows, ttt._cols, cell_size)
+    with FrameWriter(path, fps) as writer:
+        return record(replay, renderer, writer)
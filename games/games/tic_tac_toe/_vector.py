@@ -0,0 +1,90 @@
+"""
+Random playouts of many copies of one position at once.
+
+A random playout of TTT fills the empty cells in a random order, so all
+playouts are drawn as one array of move times. A move scores in a
+direction iff some line of `to_connect` cells in that direction has one
+owner and this move is its last one, which is checked for all lines of
+all playouts together.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from ._game import EMPTY, TTT
+
+# same directions as `TTT.apply_action`, as (dy, dx)
+_DIRECTIONS = [(0, 1), (1, 0), (1, 1), (-1, 1)]
+
+
+@lru_cache(maxsize=None)
+def _lines(rows: int, cols: int, to_connect: int):
+    """Return (cells of every line of `to_connect` cells, shape (L, to_connect); direction of every line)."""
+    cells, directions = [], []
+    for d, (dy, dx) in enumerate(_DIRECTIONS):
+        for y in range(rows):
+            for x in range(cols):
+                end_y, end_x = y + dy * (to_connect - 1), x + dx * (to_connect - 1)
+                if 0 <= end_y < rows and 0 <= end_x < cols:
+                    cells.append([(y + dy * i) * cols + x + dx * i for i in range(to_connect)])
+                    directions.append(d)
+    return np.array(cells, dtype=np.int64).reshape(-1, to_connect), np.array(directions, dtype=np.int64)
+
+
+def playout_scores(game: TTT, times) -> np.ndarray:
+    """
+    Final scores of playouts filling the empty cells of `game`.
+
+    Arguments
+    =========
+        game: position to start from
+        times: (K, E) ply at which each of the E empty cells (in row-major order) is played
+
+    Returns
+    =======
+        (K, 2) scores of both players at the end
+    """
+    times = np.asarray(times)
+    k, size = len(times), game._rows * game._cols
+    board = game.board.reshape(-1)
+    empty = np.flatnonzero(board == EMPTY)
+
+    owner = np.repeat(board[None], k, axis=0)
+    owner[:, empty] = (game._next_player + times) % 2
+    played = np.full((k, size), -1)
+    played[:, empty] = times
+
+    cells, directions = _lines(game._rows, game._cols, game.to_connect)
+    line_owner = owner[:, cells]
+    line_played = played[:, cells]
+    complete = (line_owner == line_owner[..., :1]).all(axis=-1) & (line_played.max(axis=-1) >= 0)
+
+    # a move scores once per direction, even if it completes several lines in it
+    rollout, line = np.nonzero(complete)
+    last = cells[line, line_played[rollout, line].argmax(axis=-1)]
+    scored = np.zeros((k, size, len(_DIRECTIONS)), dtype=bool)
+    scored[rollout, last, directions[line]] = True
+    points = scored.sum(axis=-1)
+
+    scores = np.stack([(points * (owner == p)).sum(axis=-1) for p in (0, 1)], axis=-1)
+    return scores + np.asarray(game._scores)
+
+
+def random_rollouts(game: TTT, num_rollouts: int, rng) -> np.ndarray:
+    """
+    Play `num_rollouts` uniformly random playouts of `game` to the end.
+
+    Arguments
+    =========
+        game: position to start from
+        num_rollouts: number of playouts
+        rng: numpy `Generator` or `RandomState`
+
+    Returns
+    =======
+        (num_rollouts, 2) final scores
+    """
+    num_empty = int((game.board == EMPTY).sum())
+    # argsort of uniform keys is a uniform random permutation
+    times = rng.random((num_rollouts, num_empty)).argsort(axis=1)
+    return playout_scores(game, times)